@@ -0,0 +1,150 @@
+# RAG_Chatbot/api/routers/batch.py
+import json
+from fastapi import APIRouter, HTTPException, status, Path, Depends, Request
+from fastapi.responses import StreamingResponse
+from typing import Any, AsyncIterator, Dict, List, Set, Tuple
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from api.schemas.batch import BatchQuestionsRequest, BatchJobStatusResponse
+from core.config import settings
+from core.progress import batch_progress
+from database.database import get_async_db, async_session
+from database import crud as db_crud
+from database.models import FileProcessingStatusEnum
+from workflow.batch import start_batch_job, stored_question_event
+
+router = APIRouter()
+
+TERMINAL_QUESTION_STATUSES = {FileProcessingStatusEnum.COMPLETED.value, FileProcessingStatusEnum.FAILED.value}
+
+def _jsonl(data: Dict[str, Any]) -> str:
+    return json.dumps(data, ensure_ascii=False) + "\n"
+
+async def _stored_results(job_id: str, sent: Set[int]) -> Tuple[List[str], str]:
+    """Lines for the questions that finished since `sent` was last updated, and the job's overall status."""
+    async with async_session() as db:
+        job = await db_crud.get_batch_job_from_db(db, job_id)
+    lines = []
+    for row in job.questions:
+        if row.position not in sent and row.status.value in TERMINAL_QUESTION_STATUSES:
+            sent.add(row.position)
+            lines.append(_jsonl(stored_question_event(row)))
+    return lines, job.overall_status.value
+
+async def _batch_results(request: Request, job_id: str, questions: int) -> AsyncIterator[str]:
+    """One line per finished question as it finishes, then the job's summary."""
+    sent: Set[int] = set()
+    # Subscribed before the stored results are read, so no result falls between the two
+    with batch_progress.subscribe(job_id) as subscription:
+        yield _jsonl({"type": "job", "job_id": job_id, "questions": questions, "overall_status": FileProcessingStatusEnum.PENDING.value})
+        lines, overall_status = await _stored_results(job_id, sent)
+        for line in lines:
+            yield line
+        if len(sent) == questions:
+            yield _jsonl({"type": "summary", "job_id": job_id, "overall_status": overall_status})
+            return
+
+        while True:
+            event = await subscription.get(timeout=settings.UPLOAD_EVENTS_HEARTBEAT_SECONDS)
+            if event is None:
+                # The job goes on without the client; its results stay at /batch/results/{job_id}
+                if await request.is_disconnected():
+                    return
+                yield _jsonl({"type": "keep-alive"})
+                continue
+            if subscription.lagged:
+                # The client fell behind and events were dropped: send what finished in the meantime from the database
+                while not subscription.queue.empty():
+                    subscription.queue.get_nowait()
+                subscription.lagged = False
+                lines, overall_status = await _stored_results(job_id, sent)
+                for line in lines:
+                    yield line
+                if len(sent) == questions:
+                    # The summary may have been among the dropped events
+                    yield _jsonl({"type": "summary", "job_id": job_id, "overall_status": overall_status})
+                    return
+                continue
+            if event["type"] == "question" and event["status"] in TERMINAL_QUESTION_STATUSES and event["position"] not in sent:
+                sent.add(event["position"])
+                yield _jsonl(event)
+            elif event["type"] == "summary":
+                yield _jsonl(event)
+                return
+
+@router.post(
+    "/batch/questions",
+    summary="Answer a batch of questions (Internal Use)",
+    description=(
+        "Runs every question through the RAG pipeline as a standalone question, outside any thread: nothing is added "
+        "to a conversation and no memories are extracted, but the memories of `user_id` are searched. Up to "
+        "`BATCH_QA_CONCURRENCY` questions are answered at a time, and retrievals are shared across the batch. "
+        "The response streams JSON lines (`application/x-ndjson`): a `job` line with the `job_id` (also in the "
+        "`X-Job-Id` header), a `question` line per question as it finishes (`position` in the request, `status`, "
+        "`answer` or `error`, `retrieval_loops`, `seconds`), in completion order, and a last `summary` line. "
+        "`keep-alive` lines are sent while nothing finishes. The job keeps running if the client disconnects: "
+        "follow it at `/batch/status/{job_id}` and fetch the answers from `/batch/results/{job_id}`."
+    ),
+    response_class=StreamingResponse,
+)
+async def answer_question_batch_internal(
+    request: Request,
+    batch_request: BatchQuestionsRequest,
+    db: AsyncSession = Depends(get_async_db),
+):
+    questions = [question.strip() for question in batch_request.questions]
+    if not questions or not all(questions):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Provide at least one question, and no empty questions.")
+    if len(questions) > settings.BATCH_QA_MAX_QUESTIONS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"At most {settings.BATCH_QA_MAX_QUESTIONS} questions per batch; split larger sets into several batches.",
+        )
+
+    job = await db_crud.create_batch_job_in_db(db, batch_request.user_id, questions)
+    job_id = job.id
+    await db.close()  # Not held for the lifetime of the stream
+
+    # Results published before the stream subscribes are picked up from the database
+    start_batch_job(job_id, batch_request.user_id, questions)
+    print(f"Started batch job {job_id}: {len(questions)} question(s) for user {batch_request.user_id}.")
+
+    return StreamingResponse(
+        _batch_results(request, job_id, len(questions)),
+        media_type="application/x-ndjson",
+        headers={"X-Job-Id": job_id, "Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@router.get(
+    "/batch/status/{job_id}",
+    response_model=BatchJobStatusResponse,
+    summary="Get the status of a batch of questions (Internal Use)",
+    description="Overall status and throughput (questions done, failed, per minute) of a job started at `/batch/questions`.",
+)
+async def get_batch_job_status_internal(
+    job_id: str = Path(..., description="The ID of the batch job to check."),
+    db: AsyncSession = Depends(get_async_db),
+):
+    job = await db_crud.get_batch_job_from_db(db, job_id)
+    if not job:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Job ID {job_id} not found.")
+    return BatchJobStatusResponse.model_validate(job)
+
+@router.get(
+    "/batch/results/{job_id}",
+    summary="Get the answers of a batch of questions (Internal Use)",
+    description=(
+        "JSON lines (`application/x-ndjson`), one per question in request order, with the same fields as the "
+        "`question` lines of `/batch/questions`. Questions not answered yet have status `pending` or `processing`."
+    ),
+    response_class=StreamingResponse,
+)
+async def get_batch_job_results_internal(
+    job_id: str = Path(..., description="The ID of the batch job."),
+    db: AsyncSession = Depends(get_async_db),
+):
+    job = await db_crud.get_batch_job_from_db(db, job_id)
+    if not job:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Job ID {job_id} not found.")
+    lines = [_jsonl(stored_question_event(row)) for row in job.questions]
+    return StreamingResponse(iter(lines), media_type="application/x-ndjson", headers={"X-Job-Id": job_id})
@@ -1,37 +1,51 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Path, Body, Query, Response
-from sqlmodel import Session
-from typing import List
+from sqlmodel.ext.asyncio.session import AsyncSession
+from typing import List, Literal, Optional
 
 from langchain_core.messages import HumanMessage, AIMessage, BaseMessage
+from langmem.short_term import RunningSummary
 
 from database import crud, models
-from database.database import get_db
+from database.database import get_async_db, async_session
 
 from api.schemas import chat as chat_schemas
 
-from workflow.graph import graph as compiled_rag_graph
-from utils.helper import generate_thead_title
+from workflow.graph import get_graph, checkpointer as graph_checkpointer
+from workflow.instrumentation import node_timings
+from core.admission import AdmissionRejected, chat_admission
+from core.mem0_client import get_memory_client
+from core.post_response import post_response_pipeline
+from core.profiling import ProfilingCallbackHandler, current_profile
+from core.metrics import RETRIEVAL_LOOPS
+from core.config import settings
+from utils.tokens import TOKEN_COUNT_KEY
 
 router = APIRouter()
 
+# Cursor of the next page of a list endpoint; absent on the last page
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+def _page_limit(description: str):
+    return Query(settings.PAGE_SIZE_DEFAULT, ge=1, le=settings.PAGE_SIZE_MAX, description=description)
+
 # --- User Endpoints ---
 @router.post("/users", response_model=chat_schemas.UserResponseSchema, status_code=status.HTTP_201_CREATED, tags=["Users"])
-def create_new_user(
+async def create_new_user(
     user_in: chat_schemas.UserCreateRequestSchema,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     try:
-        created_user = crud.create_user(db, models.UserCreate(user_id=user_in.user_id, email=user_in.email))
+        created_user = await crud.create_user(db, models.UserCreate(user_id=user_in.user_id, email=user_in.email))
         return created_user
     except ValueError as e:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
 
 @router.get("/users/{user_id}", response_model=chat_schemas.UserResponseSchema, tags=["Users"])
-def get_user_details(
+async def get_user_details(
     user_id: str = Path(..., description="The string ID of the user to retrieve"),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    db_user = crud.get_user_by_user_id(db, user_id=user_id)
+    db_user = await crud.get_user_by_user_id(db, user_id=user_id)
     if not db_user:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
     return db_user
@@ -42,137 +56,243 @@ class ThreadCreateWithUserSchema(chat_schemas.ThreadCreateRequestSchema):
     user_id: str
 
 @router.post("/threads", response_model=chat_schemas.ThreadResponseSchema, status_code=status.HTTP_201_CREATED, tags=["Threads"])
-def create_new_thread(
+async def create_new_thread(
     thread_in: ThreadCreateWithUserSchema, # Expects user_id in body
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    db_user = crud.get_user_by_user_id(db, user_id=thread_in.user_id)
+    db_user = await crud.get_user_by_user_id(db, user_id=thread_in.user_id)
     if not db_user:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"User with id '{thread_in.user_id}' not found.")
     
-    created_thread = crud.create_thread_for_user(db, user_id=thread_in.user_id, title=thread_in.title)
+    created_thread = await crud.create_thread_for_user(db, user_id=thread_in.user_id, title=thread_in.title)
     return created_thread
 
 @router.get("/threads", response_model=List[chat_schemas.ThreadResponseSchema], tags=["Threads"])
-def get_all_threads_for_a_user(
+async def get_all_threads_for_a_user(
+    response: Response,
     user_id: str = Query(..., description="The string ID of the user whose threads to retrieve"),
-    db: Session = Depends(get_db)
+    limit: int = _page_limit("Maximum number of threads to return"),
+    cursor: Optional[str] = Query(None, description=f"Value of the {NEXT_CURSOR_HEADER} header of the previous page"),
+    preview: bool = Query(False, description="Include the start of each thread's last message"),
+    db: AsyncSession = Depends(get_async_db)
 ):
-    db_user = crud.get_user_by_user_id(db, user_id=user_id)
+    db_user = await crud.get_user_by_user_id(db, user_id=user_id)
     if not db_user:
    
         return []
-    
-    threads = crud.get_threads_for_user(db, user_id=user_id)
+
+    try:
+        threads, next_cursor = await crud.get_threads_for_user(db, user_id=user_id, limit=limit, cursor=cursor, with_preview=preview)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
     return threads
 
 @router.get("/threads/{thread_id}", response_model=chat_schemas.ThreadResponseSchema, tags=["Threads"])
-def get_single_thread(
+async def get_single_thread(
     thread_id: str = Path(..., description="The ID of the thread to retrieve"),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    db_thread = crud.get_thread_by_id(db, thread_id=thread_id)
+    db_thread = await crud.get_thread_by_id(db, thread_id=thread_id)
     if not db_thread:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Thread not found")
    
     return db_thread
 
 @router.patch("/threads/{thread_id}", response_model=chat_schemas.ThreadResponseSchema, tags=["Threads"])
-def update_thread_title(
+async def update_thread_title(
     thread_id: str = Path(..., description="The ID of the thread to update"),
     thread_update_in: chat_schemas.ThreadUpdateRequestSchema = Body(...),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    db_thread = crud.get_thread_by_id(db, thread_id=thread_id)
+    db_thread = await crud.get_thread_by_id(db, thread_id=thread_id)
     if not db_thread:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Thread not found")
 
-    updated_thread = crud.update_thread(db, thread_id=thread_id, thread_update=models.ThreadUpdate(title=thread_update_in.title))
+    updated_thread = await crud.update_thread(db, thread_id=thread_id, thread_update=models.ThreadUpdate(title=thread_update_in.title))
     return updated_thread
 
 @router.delete("/threads/{thread_id}", status_code=status.HTTP_204_NO_CONTENT, tags=["Threads"])
-def delete_a_thread(
+async def delete_a_thread(
     thread_id: str = Path(..., description="The ID of the thread to delete"),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    db_thread = crud.get_thread_by_id(db, thread_id=thread_id)
+    db_thread = await crud.get_thread_by_id(db, thread_id=thread_id)
     if not db_thread:
         return Response(status_code=status.HTTP_204_NO_CONTENT)
 
-    if not crud.delete_thread(db, thread_id=thread_id):
+    if not await crud.delete_thread(db, thread_id=thread_id):
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Failed to delete thread")
+    await graph_checkpointer.adelete_thread(thread_id)
     return Response(status_code=status.HTTP_204_NO_CONTENT)
 
 
 # --- Message Endpoints (Chat Interaction) ---
 @router.get("/threads/{thread_id}/messages", response_model=List[chat_schemas.MessageResponseSchema], tags=["Messages"])
-def get_messages_in_a_thread(
+async def get_messages_in_a_thread(
+    response: Response,
     thread_id: str = Path(..., description="The ID of the thread"),
-    db: Session = Depends(get_db)
+    limit: int = _page_limit("Maximum number of messages to return"),
+    cursor: Optional[str] = Query(None, description=f"Value of the {NEXT_CURSOR_HEADER} header of the previous page"),
+    order: Literal["asc", "desc"] = Query("asc", description="`desc` starts from the latest message"),
+    db: AsyncSession = Depends(get_async_db)
 ):
-    db_thread = crud.get_thread_by_id(db, thread_id=thread_id)
+    db_thread = await crud.get_thread_by_id(db, thread_id=thread_id)
     if not db_thread:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Thread not found")
 
-    messages = crud.get_messages_for_thread(db, thread_id=thread_id)
+    try:
+        messages, next_cursor = await crud.get_message_page(
+            db, thread_id=thread_id, limit=limit, cursor=cursor, newest_first=order == "desc"
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
     return messages
 
+def _to_graph_message(msg_model: models.Message) -> BaseMessage:
+    """Build the graph message for a stored row, carrying over its cached token count."""
+    message_constructor = HumanMessage if msg_model.role == "user" else AIMessage
+    response_metadata = {TOKEN_COUNT_KEY: msg_model.token_count} if msg_model.token_count is not None else {}
+    return message_constructor(content=msg_model.content, id=str(msg_model.id), response_metadata=response_metadata)
+
+async def _resolve_summary_watermark(db: AsyncSession, thread_id: str, running_summary: RunningSummary) -> Optional[int]:
+    """Map the last summarized graph message to its row id in the messages table.
+
+    Human messages carry their row id. Assistant replies kept in the checkpoint carry
+    the LLM run id instead, so they are resolved to the row that follows the last
+    summarized human message.
+    """
+    last_id = running_summary.last_summarized_message_id
+    if last_id is not None and last_id.isdigit():
+        return int(last_id)
+
+    row_ids = [int(message_id) for message_id in running_summary.summarized_message_ids if message_id.isdigit()]
+    if not row_ids:
+        return None
+    next_messages = await crud.get_messages_for_thread(db, thread_id, after_message_id=max(row_ids), limit=1)
+    return next_messages[0].id if next_messages else max(row_ids)
+
+async def _persist_running_summary(thread_id: str, running_summary: RunningSummary) -> None:
+    """Post-response bookkeeping: store the running summary and its watermark on the thread."""
+    async with async_session() as db:
+        watermark = await _resolve_summary_watermark(db, thread_id, running_summary)
+        if watermark is not None:
+            await crud.update_thread_summary(
+                db,
+                thread_id=thread_id,
+                summary=running_summary.summary,
+                summarized_until_message_id=watermark,
+            )
+
 # Schema for sending a message now needs user_id in the body
 class MessageCreateWithUserSchema(chat_schemas.MessageCreateRequestSchema):
     user_id: str 
 
-@router.post("/threads/{thread_id}/messages", response_model=chat_schemas.ChatResponseSchema, tags=["Messages"])
+@router.post(
+    "/threads/{thread_id}/messages",
+    response_model=chat_schemas.ChatResponseSchema,
+    tags=["Messages"],
+    responses={status.HTTP_429_TOO_MANY_REQUESTS: {"description": "Too many turns running or queued; retry after the `Retry-After` seconds."}},
+)
 async def send_message_and_get_rag_response(
     thread_id: str = Path(..., description="The ID of the thread to send the message to"),
     message_in: MessageCreateWithUserSchema = Body(...),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    db_thread = crud.get_thread_by_id(db, thread_id=thread_id)
-    if not db_thread:
+    # Admitted before the first query: a turn waiting for a slot holds no DB connection
+    # and has not stored its message yet, so a shed turn leaves nothing behind
+    try:
+        async with chat_admission.admit(message_in.user_id):
+            return await _run_chat_turn(thread_id, message_in, db)
+    except AdmissionRejected as e:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail=f"Too many messages are being answered right now, please retry in {e.retry_after} seconds.",
+            headers={"Retry-After": str(e.retry_after)},
+        )
+
+async def _run_chat_turn(thread_id: str, message_in: MessageCreateWithUserSchema, db: AsyncSession) -> chat_schemas.ChatResponseSchema:
+    # One query for the thread, whether it is checkpointed and the history to bootstrap it from
+    turn = await crud.get_thread_for_turn(db, thread_id=thread_id)
+    if not turn:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Thread not found")
+    db_thread, has_checkpoint, db_messages_models = turn
 
     if db_thread.user_id != message_in.user_id:
 
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="User not authorized to post messages to this thread.")
 
-    # 1. Save user's message
-    crud.create_message_in_thread(db, thread_id=thread_id, role="user", content=message_in.content)
-
-    # 2. Auto-update thread title
-    if db_thread.title == "New Chat":
-        current_messages_in_thread = crud.get_messages_for_thread(db, thread_id)
-        if len(current_messages_in_thread) == 1 and current_messages_in_thread[0].role == "user":
-            new_title = await generate_thead_title(message_in.content)
-            if new_title:
-                crud.update_thread(db, thread_id=thread_id, thread_update=models.ThreadUpdate(title=new_title))
-
-    # 3. Prepare messages for LangGraph
-    db_messages_models = crud.get_messages_for_thread(db, thread_id)
-    langgraph_history: List[BaseMessage] = []
-    for msg_model in db_messages_models:
-        role = "human" if msg_model.role == "user" else "ai"
-        message_constructor = HumanMessage if role == "human" else AIMessage
-        langgraph_history.append(message_constructor(content=msg_model.content, id=str(msg_model.id)))
-    
-    initial_graph_state= {
-        "user_id": message_in.user_id,
-        "messages": langgraph_history,
-        "retrieval_loop_count": 0
-    }
+    # 1. Save user's message; the history's tokens follow from the totals read before it
+    history_token_count = db_thread.token_count - db_thread.summarized_token_count
+    user_message = await crud.create_message_in_thread(db, thread_id=thread_id, role="user", content=message_in.content)
+    history_token_count += user_message.token_count
+    graph_config = {"configurable": {"thread_id": thread_id}, "callbacks": [node_timings]}
+    profile = current_profile.get()
+    if profile is not None:
+        graph_config["callbacks"].append(ProfilingCallbackHandler(profile))
+    needs_title = False
 
-    # 4. Invoke LangGraph
+    if has_checkpoint:
+        # 2a. The checkpoint already holds the conversation state: only append the new message
+        graph_input = {
+            "user_id": message_in.user_id,
+            "messages": [_to_graph_message(user_message)],
+            "history_token_count": history_token_count,
+            "retrieval_loop_count": 0
+        }
+    else:
+        # 2b. Bootstrap the thread state from the messages not yet folded into the thread summary
+        db_messages_models = [*db_messages_models, user_message]
+
+        # First message of the thread: its title is generated once the answer is out
+        if db_thread.title == "New Chat" and db_thread.summarized_until_message_id is None:
+            needs_title = len(db_messages_models) == 1 and db_messages_models[0].role == "user"
+
+        langgraph_history: List[BaseMessage] = [_to_graph_message(msg_model) for msg_model in db_messages_models]
+
+        running_summary = None
+        if db_thread.summary:
+            running_summary = RunningSummary(
+                summary=db_thread.summary,
+                summarized_message_ids=set(),
+                last_summarized_message_id=None,
+            )
+
+        graph_input = {
+            "user_id": message_in.user_id,
+            "messages": langgraph_history,
+            "running_summary": running_summary,
+            "history_token_count": history_token_count,
+            "retrieval_loop_count": 0
+        }
+
+    # 3. Invoke LangGraph (only the final state of the turn is checkpointed)
     try:
-        final_graph_state = await compiled_rag_graph.ainvoke(initial_graph_state)
+        final_graph_state = await get_graph().ainvoke(graph_input, graph_config, checkpoint_during=False)
         ai_response_message = final_graph_state["messages"][-1]
         if not isinstance(ai_response_message, AIMessage):
             raise HTTPException(status_code=500, detail="RAG pipeline did not return an AI message.")
         assistant_content = ai_response_message.content
+        RETRIEVAL_LOOPS.observe(final_graph_state.get("retrieval_loop_count", 0))
     except Exception as e:
         print(f"Error invoking RAG graph for thread {thread_id}: {e}")
+        # Drop a possibly half-finished checkpoint; the next turn re-bootstraps from the messages
+        await graph_checkpointer.adelete_thread(thread_id)
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Error generating AI response: {str(e)}")
 
-    # 5. Save AI's message
-    saved_assistant_message = crud.create_message_in_thread(db, thread_id=thread_id, role="assistant", content=assistant_content)
+    # 4. Save AI's message
+    saved_assistant_message = await crud.create_message_in_thread(db, thread_id=thread_id, role="assistant", content=assistant_content)
+
+    # 5. Deferred work: thread title, memory extraction and summary persistence
+    if needs_title:
+        post_response_pipeline.schedule_title(thread_id, message_in.content)
+    post_response_pipeline.schedule(get_memory_client().add, message_in.content, user_id=message_in.user_id, version="v2")
+    new_running_summary = final_graph_state.get("running_summary")
+    if new_running_summary and new_running_summary.summary != db_thread.summary:
+        post_response_pipeline.schedule(_persist_running_summary, thread_id, new_running_summary)
 
     return chat_schemas.ChatResponseSchema(
         assistant_message=assistant_content,
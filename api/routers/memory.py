@@ -4,7 +4,7 @@ from fastapi import APIRouter, HTTPException, status, Query, Path
 from typing import List
 
 from api.schemas import memories as memory_schemas # Alias to avoid name clash
-from core.mem0_client import mem0_client
+from core.mem0_client import get_memory_client
 
 router = APIRouter()
 
@@ -19,6 +19,7 @@ MEMORIES_PREFIX = "/memories"
 async def get_all_user_memories(
     user_id: str = Query(..., description="The ID of the user whose memories are to be retrieved.")
 ):
+    mem0_client = get_memory_client()
     if not mem0_client:
         raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Mem0 client not initialized. Check API key.")
     
@@ -50,6 +51,7 @@ async def get_all_user_memories(
 async def delete_single_memory(
     memory_id: str = Path(..., description="The ID of the memory to delete.")
 ):
+    mem0_client = get_memory_client()
     if not mem0_client:
         raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Mem0 client not initialized. Check API key.")
     
@@ -74,6 +76,7 @@ async def delete_single_memory(
 async def delete_all_user_memories(
     user_id: str = Path(..., description="The ID of the user whose memories are to be deleted.")
 ):
+    mem0_client = get_memory_client()
     if not mem0_client:
         raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Mem0 client not initialized. Check API key.")
     
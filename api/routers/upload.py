@@ -1,90 +1,68 @@
 # RAG_Chatbot/api/routers/upload.py
-from fastapi import APIRouter, UploadFile, File, HTTPException, status, BackgroundTasks, Path, Depends
-from typing import List, Optional
-from sqlmodel import Session
+import asyncio
+import functools
+import json
+import os
+import shutil
+import tarfile
+import tempfile
+import zipfile
+from fastapi import APIRouter, UploadFile, File, HTTPException, status, BackgroundTasks, Path, Depends, Request
+from fastapi.responses import StreamingResponse
+from typing import Any, AsyncIterator, Dict, List
+from sqlmodel.ext.asyncio.session import AsyncSession
 
 from api.schemas.documents import UploadFileResponse, JobStatusResponse
-from core.docs_processing import process_and_index_pdf
-from database.database import get_db
+from core.archive import DocumentArchive, is_archive
+from core.config import settings
+from core.ingestion import JobFile, process_upload_job
+from core.loader import CONTENT_TYPE_EXTENSIONS, is_supported_document
+from core.progress import upload_progress
+from database.database import get_async_db, async_session
 from database import crud as db_crud 
-from database.models import FileProcessingStatusEnum
+from database.models import FileProcessingStatusEnum, UploadJob
 
 router = APIRouter()
 
-async def _index_file_in_background_db(
-    job_id: str,
-    file_bytes: bytes, 
-    filename: str,
-):
-    """
-    Internal helper function to run the indexing process in a background task.
-    Updates the status in the database.
-    """
-    # Important: Each background task needs its own DB session
-    db: Session = next(get_db())
-    try:
-        print(f"Background task started for: job_id={job_id}, filename={filename}")
-        await db_crud.update_file_processing_status_in_db(
-            db, job_id, filename, FileProcessingStatusEnum.PROCESSING
-        )
-        
-        num_chunks_indexed = await process_and_index_pdf(file_bytes, filename, custom_metadata=None) # No custom_metadata from user
-        
-        await db_crud.update_file_processing_status_in_db(
-            db, 
-            job_id, 
-            filename, 
-            FileProcessingStatusEnum.COMPLETED,
-            message=f"Successfully indexed with {num_chunks_indexed} chunks.",
-            chunks_indexed=num_chunks_indexed
-        )
-        print(f"Background task: Successfully indexed {filename} (job: {job_id}) with {num_chunks_indexed} chunks.")
-    except Exception as e:
-        error_message = f"Error indexing {filename}: {str(e)}"
-        print(f"Background task: {error_message} (job: {job_id})")
-        await db_crud.update_file_processing_status_in_db(
-            db, 
-            job_id, 
-            filename, 
-            FileProcessingStatusEnum.FAILED,
-            message=error_message
-        )
-    finally:
-        db.close()
+TERMINAL_JOB_STATUSES = {FileProcessingStatusEnum.COMPLETED, FileProcessingStatusEnum.FAILED}
 
+def _document_filename(file: UploadFile, file_idx: int) -> str:
+    """The file's name, with an extension from its content type if the name has no known one ("" if unsupported)."""
+    filename = file.filename or f"unnamed_document_{file_idx}"
+    if is_supported_document(filename):
+        return filename
+    extension = CONTENT_TYPE_EXTENSIONS.get(file.content_type or "")
+    return filename + extension if extension else ""
 
 @router.post(
     "/upload", 
     response_model=UploadFileResponse,
     status_code=status.HTTP_202_ACCEPTED,
-    summary="Upload PDF files for asynchronous indexing (Internal Use)",
+    summary="Upload documents for asynchronous indexing (Internal Use)",
     description=(
-        "Accepts one or more PDF files. Processing and indexing are performed in the background. "
+        "Accepts one or more PDF, DOCX, HTML, Markdown or plain text files. Processing and indexing are performed in the background. "
         "Returns a `job_id` that can be used to check the status of the processing. "
         "This endpoint is intended for internal use and does not accept user-defined tags."
     )
 )
 async def upload_pdf_files_for_indexing_internal( # Renamed for clarity
     background_tasks: BackgroundTasks,
-    db: Session = Depends(get_db), # Inject DB session for main thread operations
-    files: List[UploadFile] = File(..., description="One or more PDF files to upload.")
+    db: AsyncSession = Depends(get_async_db), # Inject DB session for main thread operations
+    files: List[UploadFile] = File(..., description="One or more documents to upload.")
 ):
     files_to_schedule_names = []
     files_rejected_names = []
     
-    valid_files_for_job: List[dict] = []
+    valid_files_for_job: List[JobFile] = []
     for file_idx, file in enumerate(files):
-        original_filename = file.filename or f"unnamed_pdf_{file_idx}"
-        if file.content_type != "application/pdf":
-            files_rejected_names.append(original_filename)
+        original_filename = _document_filename(file, file_idx)
+        if not original_filename:
+            files_rejected_names.append(file.filename or f"unnamed_document_{file_idx}")
             continue
         
         try:
             file_bytes = await file.read() 
-            valid_files_for_job.append({
-                "filename": original_filename,
-                "bytes": file_bytes
-            })
+            valid_files_for_job.append(JobFile.from_bytes(original_filename, file_bytes))
             files_to_schedule_names.append(original_filename)
         except Exception as e:
             print(f"Error preparing file {original_filename} for upload: {e}")
@@ -93,23 +71,18 @@ async def upload_pdf_files_for_indexing_internal( # Renamed for clarity
     if not valid_files_for_job:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
-            detail="No valid PDF files provided or files could not be read.",
+            detail="No valid documents provided or files could not be read.",
             headers={"X-Files-Rejected": ",".join(files_rejected_names)} if files_rejected_names else None
         )
 
     # Create a job ID for this upload batch using the DB
-    job_db = await db_crud.create_upload_job_in_db(db, [f_info["filename"] for f_info in valid_files_for_job])
+    job_db = await db_crud.create_upload_job_in_db(db, [job_file.filename for job_file in valid_files_for_job])
     job_id = job_db.id
 
-    # Schedule background tasks for valid files
-    for file_info in valid_files_for_job:
-        background_tasks.add_task(
-            _index_file_in_background_db, 
-            job_id,
-            file_info["bytes"],
-            file_info["filename"],
-        )
-        print(f"Scheduled {file_info['filename']} for background indexing (Job ID: {job_id}).")
+    # One background task per job: Starlette runs background tasks one after another,
+    # so the files are indexed concurrently inside it instead
+    background_tasks.add_task(process_upload_job, job_id, valid_files_for_job)
+    print(f"Scheduled {len(valid_files_for_job)} file(s) for background indexing (Job ID: {job_id}).")
     
     message = f"Processing job {job_id} scheduled for {len(valid_files_for_job)} file(s)."
     if files_rejected_names:
@@ -123,18 +96,168 @@ async def upload_pdf_files_for_indexing_internal( # Renamed for clarity
         files_rejected=files_rejected_names
     )
 
+
+def _save_upload(upload: UploadFile) -> str:
+    """Copy an upload to a temporary file that outlives the request (the upload is closed after the response)."""
+    # The format is detected from the content (see DocumentArchive), not the name
+    with tempfile.NamedTemporaryFile(delete=False, prefix="upload_archive_") as archive_file:
+        shutil.copyfileobj(upload.file, archive_file, length=1024 * 1024)
+        return archive_file.name
+
+async def _process_archive_job(job_id: str, archive: DocumentArchive) -> None:
+    try:
+        await process_upload_job(job_id, [
+            JobFile(
+                filename=member.name, size=member.size, sequential=archive.sequential,
+                read=functools.partial(asyncio.to_thread, archive.read, member.name),
+            )
+            for member in archive.members
+        ])
+    finally:
+        archive.close()
+        os.remove(archive.path)
+
+@router.post(
+    "/upload/archive",
+    response_model=UploadFileResponse,
+    status_code=status.HTTP_202_ACCEPTED,
+    summary="Upload a zip or tar archive of documents for asynchronous indexing (Internal Use)",
+    description=(
+        "Accepts one `.zip`, `.tar`, `.tar.gz`, `.tgz`, `.tar.bz2` or `.tar.xz` archive. Every PDF, DOCX, HTML, Markdown "
+        "and plain text file in it (at any depth) is indexed in the background under one `job_id`, named by its path in the archive. "
+        "Members are read one at a time, without extracting the archive. Other formats, hidden files and files over "
+        "`INGEST_MAX_FILE_BYTES` are listed in `files_rejected`."
+    )
+)
+async def upload_archive_for_indexing_internal(
+    background_tasks: BackgroundTasks,
+    db: AsyncSession = Depends(get_async_db),
+    archive: UploadFile = File(..., description="A zip or tar archive of documents."),
+):
+    if not is_archive(archive.filename or ""):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Expected a .zip, .tar, .tar.gz, .tgz, .tar.bz2 or .tar.xz archive.",
+        )
+
+    archive_path = await asyncio.to_thread(_save_upload, archive)
+    try:
+        document_archive = await asyncio.to_thread(
+            DocumentArchive, archive_path, max_member_bytes=settings.INGEST_MAX_FILE_BYTES
+        )
+    except (zipfile.BadZipFile, tarfile.TarError) as e:
+        print(f"Could not read archive {archive.filename}: {e}")
+        os.remove(archive_path)
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Could not read the archive: not a valid zip or tar file.")
+
+    member_names = [member.name for member in document_archive.members]
+    try:
+        if not member_names:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="The archive contains no supported documents.")
+        job_db = await db_crud.create_upload_job_in_db(db, member_names)
+    except Exception:
+        document_archive.close()
+        os.remove(archive_path)
+        raise
+    job_id = job_db.id
+
+    # The background task owns the archive from here on and deletes it once the job is done
+    background_tasks.add_task(_process_archive_job, job_id, document_archive)
+    print(f"Scheduled {len(member_names)} archive member(s) of {archive.filename} for background indexing (Job ID: {job_id}).")
+
+    message = f"Processing job {job_id} scheduled for {len(member_names)} file(s)."
+    if document_archive.skipped:
+        message += f" {len(document_archive.skipped)} file(s) were skipped."
+
+    return UploadFileResponse(
+        job_id=job_id,
+        status="accepted",
+        message=message,
+        files_scheduled=member_names,
+        files_rejected=document_archive.skipped,
+    )
+
 @router.get(
     "/upload/status/{job_id}",
     response_model=JobStatusResponse,
     summary="Get the processing status of an upload job (Internal Use)",
-    description="Poll this endpoint with the `job_id` received from the `/upload` endpoint to track file indexing progress."
+    description=(
+        "Poll this endpoint with the `job_id` received from the `/upload` endpoint to track file indexing progress. "
+        "`/upload/events/{job_id}` pushes the same information as it happens."
+    )
 )
 async def get_upload_job_status_internal( 
     job_id: str = Path(..., description="The ID of the upload job to check."),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     job_status_db = await db_crud.get_upload_job_from_db(db, job_id)
     if not job_status_db:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Job ID {job_id} not found.")
 
-    return JobStatusResponse.from_orm(job_status_db)
\ No newline at end of file
+    return JobStatusResponse.from_orm(job_status_db)
+
+
+def _job_snapshot(job: UploadJob) -> Dict[str, Any]:
+    return JobStatusResponse.model_validate(job).model_dump(mode="json")
+
+def _sse(event: str, data: Dict[str, Any]) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+async def _job_events(request: Request, job_id: str) -> AsyncIterator[str]:
+    # Subscribed before the snapshot is read, so no update falls between the two
+    with upload_progress.subscribe(job_id) as subscription:
+        async with async_session() as db:
+            job = await db_crud.get_upload_job_from_db(db, job_id)
+        if job is None:
+            return
+        yield _sse("snapshot", _job_snapshot(job))
+        if job.overall_status in TERMINAL_JOB_STATUSES:
+            return
+
+        while True:
+            event = await subscription.get(timeout=settings.UPLOAD_EVENTS_HEARTBEAT_SECONDS)
+            if event is None:
+                if await request.is_disconnected():
+                    return
+                yield ": keep-alive\n\n"
+                continue
+            if subscription.lagged:
+                # The client fell behind and events were dropped: start over from the current state
+                while not subscription.queue.empty():
+                    subscription.queue.get_nowait()
+                subscription.lagged = False
+                async with async_session() as db:
+                    job = await db_crud.get_upload_job_from_db(db, job_id)
+                yield _sse("snapshot", _job_snapshot(job))
+                if job.overall_status in TERMINAL_JOB_STATUSES:
+                    return
+                continue
+            yield _sse(event["type"], event)
+            if event["type"] == "job" and event["overall_status"] in TERMINAL_JOB_STATUSES:
+                return
+
+@router.get(
+    "/upload/events/{job_id}",
+    summary="Stream the processing progress of an upload job (Internal Use)",
+    description=(
+        "Server-sent events instead of polling `/upload/status/{job_id}`. The stream opens with a `snapshot` event "
+        "(the job status as returned by the status endpoint), followed by `file` events (a file's status changed), "
+        "`progress` events (stage `parsed` with `pages`, `split` with `chunks_total`, `deduplicated`, `indexing` with "
+        "`chunks_indexed` and `chunks_total`; `split` and `deduplicated` also carry the `chunks_skipped` and `tokens_saved`) and `job` events (the overall status, after every file update). It closes once the job is completed or failed."
+    ),
+    response_class=StreamingResponse,
+)
+async def stream_upload_job_events_internal(
+    request: Request,
+    job_id: str = Path(..., description="The ID of the upload job to follow."),
+    db: AsyncSession = Depends(get_async_db)
+):
+    if not await db_crud.get_upload_job_from_db(db, job_id):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Job ID {job_id} not found.")
+    await db.close()  # Not held for the lifetime of the stream
+
+    return StreamingResponse(
+        _job_events(request, job_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},  # No proxy buffering of the stream
+    )
@@ -0,0 +1,69 @@
+from datetime import datetime, timezone
+from pydantic import BaseModel, Field as PydanticField, ConfigDict, model_validator
+from typing import List, Optional
+from database.models import FileProcessingStatusEnum
+
+class BatchQuestionsRequest(BaseModel):
+    user_id: str = PydanticField(..., description="Whose memories the answers draw on.")
+    questions: List[str] = PydanticField(..., json_schema_extra={'example': ["¿Cuántos días de vacaciones tengo?"]})
+
+class BatchQuestionResult(BaseModel):
+    position: int  # Index of the question in the request
+    question: str
+    status: FileProcessingStatusEnum
+    answer: Optional[str] = None
+    error: Optional[str] = None
+    retrieval_loops: Optional[int] = None
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+    model_config = ConfigDict(from_attributes=True)
+
+
+class BatchThroughput(BaseModel):
+    questions_total: int
+    questions_done: int  # Completed or failed
+    questions_failed: int
+    elapsed_seconds: Optional[float] = None  # From the first question started to the last one finished (or now)
+    questions_per_minute: Optional[float] = None
+
+    @classmethod
+    def from_questions(cls, questions: List[BatchQuestionResult]) -> "BatchThroughput":
+        done = [q for q in questions if q.finished_at is not None]
+        throughput = cls(
+            questions_total=len(questions),
+            questions_done=len(done),
+            questions_failed=sum(q.status == FileProcessingStatusEnum.FAILED for q in questions),
+        )
+        started = [q.started_at for q in questions if q.started_at is not None]
+        if not started:
+            return throughput
+        first_started = min(started)
+        if len(done) == len(questions):
+            end = max(q.finished_at for q in done)
+        else:
+            now = datetime.now(timezone.utc)
+            # Naive timestamps (SQLite) are UTC as well
+            end = now if first_started.tzinfo is not None else now.replace(tzinfo=None)
+        elapsed = (end - first_started).total_seconds()
+        throughput.elapsed_seconds = round(elapsed, 3)
+        if elapsed > 0:
+            throughput.questions_per_minute = round(len(done) * 60 / elapsed, 2)
+        return throughput
+
+
+class BatchJobStatusResponse(BaseModel):
+    job_id: str = PydanticField(..., alias='id')
+    user_id: str
+    overall_status: FileProcessingStatusEnum
+    created_at: datetime
+    updated_at: Optional[datetime]
+    throughput: Optional[BatchThroughput] = None
+    questions: List[BatchQuestionResult] = PydanticField(default_factory=list, exclude=True)  # Served by /batch/results
+
+    model_config = ConfigDict(from_attributes=True, populate_by_name=True)
+
+    @model_validator(mode="after")
+    def compute_throughput(self) -> "BatchJobStatusResponse":
+        self.throughput = BatchThroughput.from_questions(self.questions)
+        return self
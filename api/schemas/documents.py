@@ -1,5 +1,5 @@
-from datetime import datetime
-from pydantic import BaseModel, Field as PydanticField, ConfigDict 
+from datetime import datetime, timezone
+from pydantic import BaseModel, Field as PydanticField, ConfigDict, model_validator
 from typing import List, Optional, Dict, Any
 from database.models import FileProcessingStatusEnum
 
@@ -15,15 +15,77 @@ class FileStatusResponseItem(BaseModel):
     status: FileProcessingStatusEnum # Use the DB Enum
     message: Optional[str] = None
     chunks_indexed: Optional[int] = None
+    chunks_skipped: Optional[int] = None  # Boilerplate and duplicate chunks not indexed
+    tokens_saved: Optional[int] = None
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
 
     model_config = ConfigDict(from_attributes=True)
 
 
+class JobThroughput(BaseModel):
+    files_total: int
+    files_done: int  # Completed or failed
+    chunks_indexed: int
+    elapsed_seconds: Optional[float] = None  # From the first file started to the last one finished (or now)
+    files_per_minute: Optional[float] = None
+    chunks_per_second: Optional[float] = None
+
+    @classmethod
+    def from_files(cls, files: List[FileStatusResponseItem]) -> "JobThroughput":
+        done = [f for f in files if f.finished_at is not None]
+        throughput = cls(
+            files_total=len(files),
+            files_done=len(done),
+            chunks_indexed=sum(f.chunks_indexed or 0 for f in files),
+        )
+        started = [f.started_at for f in files if f.started_at is not None]
+        if not started:
+            return throughput
+        first_started = min(started)
+        if len(done) == len(files):
+            end = max(f.finished_at for f in done)
+        else:
+            now = datetime.now(timezone.utc)
+            # Naive timestamps (SQLite) are UTC as well
+            end = now if first_started.tzinfo is not None else now.replace(tzinfo=None)
+        elapsed = (end - first_started).total_seconds()
+        throughput.elapsed_seconds = round(elapsed, 3)
+        if elapsed > 0:
+            throughput.files_per_minute = round(len(done) * 60 / elapsed, 2)
+            throughput.chunks_per_second = round(throughput.chunks_indexed / elapsed, 2)
+        return throughput
+
+
+class JobSavings(BaseModel):
+    chunks_skipped: int
+    tokens_saved: int
+    share: float  # Of the chunks the job's files would have had without deduplication and boilerplate stripping
+
+    @classmethod
+    def from_files(cls, files: List[FileStatusResponseItem]) -> "JobSavings":
+        skipped = sum(f.chunks_skipped or 0 for f in files)
+        total = skipped + sum(f.chunks_indexed or 0 for f in files)
+        return cls(
+            chunks_skipped=skipped,
+            tokens_saved=sum(f.tokens_saved or 0 for f in files),
+            share=round(skipped / total, 4) if total else 0.0,
+        )
+
+
 class JobStatusResponse(BaseModel):
     job_id: str = PydanticField(..., alias='id')
     overall_status: FileProcessingStatusEnum 
     created_at: datetime 
     updated_at: Optional[datetime] 
     files: List[FileStatusResponseItem]
+    throughput: Optional[JobThroughput] = None
+    savings: Optional[JobSavings] = None
+
+    model_config = ConfigDict(from_attributes=True, populate_by_name=True)
 
-    model_config = ConfigDict(from_attributes=True, populate_by_name=True)
\ No newline at end of file
+    @model_validator(mode="after")
+    def compute_throughput(self) -> "JobStatusResponse":
+        self.throughput = JobThroughput.from_files(self.files)
+        self.savings = JobSavings.from_files(self.files)
+        return self
\ No newline at end of file
@@ -0,0 +1,121 @@
+"""Batch question answering without going through the API.
+
+Reads questions from a text file (one per line) or a JSONL file (a "question" field per
+line, other fields are copied to the output), or from stdin with `-`. They are answered
+as one batch job, like `POST /api/batch/questions` (see workflow/batch.py): standalone
+questions, outside any thread, with retrievals shared across the batch. The job is
+tracked in the database, so `GET /api/batch/status/{job_id}` reports on it as well.
+Results are written as JSON lines in completion order; progress goes to stderr.
+
+Usage:
+    python batch_questions.py faq.txt --output answers.jsonl
+    python batch_questions.py eval.jsonl --user-id evaluator --concurrency 16 > answers.jsonl
+"""
+import argparse
+import asyncio
+import json
+import sys
+import time
+from typing import Any, Dict, List, Tuple
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("questions", help="Text file with one question per line, JSONL file with a \"question\" field, or - for stdin")
+    parser.add_argument("--user-id", default="batch", help="Whose memories the answers draw on (default: batch)")
+    parser.add_argument("--concurrency", type=int, help="Questions answered at the same time (default: BATCH_QA_CONCURRENCY)")
+    parser.add_argument("--output", help="Write the results to this file instead of stdout")
+    return parser.parse_args()
+
+
+def read_questions(path: str) -> Tuple[List[str], List[Dict[str, Any]]]:
+    """The questions, and for JSONL input the other fields of each line."""
+    f = sys.stdin if path == "-" else open(path, encoding="utf-8")
+    try:
+        lines = [line.strip() for line in f if line.strip()]
+    finally:
+        if f is not sys.stdin:
+            f.close()
+    questions, extras = [], []
+    for line_number, line in enumerate(lines, start=1):
+        if line.startswith("{"):
+            record = json.loads(line)
+            if not str(record.get("question", "")).strip():
+                raise ValueError(f"Line {line_number} has no \"question\" field.")
+            questions.append(str(record.pop("question")).strip())
+            extras.append(record)
+        else:
+            questions.append(line)
+            extras.append({})
+    return questions, extras
+
+
+async def run(args: argparse.Namespace) -> int:
+    from core.progress import batch_progress
+    from database import crud
+    from database.database import async_engine, async_session, engine
+    from database.models import create_db_and_tables
+    from workflow.batch import process_batch_job
+
+    create_db_and_tables(engine)
+    try:
+        questions, extras = read_questions(args.questions)
+    except (OSError, ValueError) as e:
+        print(f"Could not read the questions: {e}", file=sys.stderr)
+        return 1
+    if not questions:
+        print("No questions found.", file=sys.stderr)
+        return 1
+
+    out = open(args.output, "w", encoding="utf-8") if args.output else sys.stdout
+    try:
+        async with async_session() as db:
+            job = await crud.create_batch_job_in_db(db, args.user_id, questions)
+        print(f"Job {job.id}: {len(questions)} question(s) for user {args.user_id}.", file=sys.stderr)
+
+        started = time.perf_counter()
+        finished = 0
+        with batch_progress.subscribe(job.id) as subscription:
+            task = asyncio.create_task(process_batch_job(job.id, args.user_id, questions))
+            while not task.done() or not subscription.queue.empty():
+                event = await subscription.get(timeout=0.5)
+                if event is None or event["type"] != "question" or event["status"] not in ("completed", "failed"):
+                    continue
+                finished += 1
+                out.write(json.dumps({**extras[event["position"]], **event}, ensure_ascii=False) + "\n")
+                out.flush()
+                detail = f" ({event['error']})" if event["status"] == "failed" else ""
+                print(f"[{finished}/{len(questions)}] {event['status']}: {event['question'][:60]}{detail}", file=sys.stderr)
+            summary = await task
+        elapsed = time.perf_counter() - started
+
+        retrieval = summary["retrieval"]
+        print(
+            f"Job {job.id}: {summary['completed']}/{len(questions)} question(s) answered in {elapsed:.1f}s "
+            f"({summary['completed'] / elapsed * 60:.0f} questions/min).",
+            file=sys.stderr,
+        )
+        print(
+            f"{retrieval['retrievals']} retrievals served by {retrieval['searches']} vector searches, "
+            f"{retrieval['queries_embedded']} queries embedded in {retrieval['embedding_requests']} request(s).",
+            file=sys.stderr,
+        )
+        return 0 if summary["failed"] == 0 else 1
+    finally:
+        if out is not sys.stdout:
+            out.close()
+        await async_engine.dispose()
+
+
+def main() -> None:
+    args = parse_args()
+    from core.config import settings
+
+    # Set before workflow.batch is imported, which sizes the process-wide batch slots
+    if args.concurrency:
+        settings.BATCH_QA_CONCURRENCY = settings.BATCH_QA_GLOBAL_CONCURRENCY = args.concurrency
+    sys.exit(asyncio.run(run(args)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,183 @@
+"""Chat admission control under a burst: one heavy user against a few light users.
+
+The heavy user fires `--heavy-turns` turns at once (each on its own thread), while
+`--light-users` other users each send `--light-turns` turns one after the other. The
+app runs in-process in offline mode (see core/offline.py), with `--llm-latency` seconds
+per model call so the graph is the bottleneck. Each mode runs in a fresh process:
+
+- `unbounded`: CHAT_MAX_CONCURRENCY high enough that every turn runs the graph at once;
+- `admission`: the configured limits (see core/admission.py).
+
+Reported per mode: latency of the light users' turns, heavy turns answered and shed
+(429), other errors, turns slower than `--timeout`, and the peak number of turns running the graph at once.
+
+Usage:
+    python -m benchmarks.admission --heavy-turns 200 --light-users 5
+    python -m benchmarks.admission --max-concurrency 8 --output results/admission.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+async def _new_thread(client: httpx.AsyncClient, user_id: str) -> str:
+    return (await client.post("/api/threads", json={"user_id": user_id})).raise_for_status().json()["id"]
+
+
+async def _turn(client: httpx.AsyncClient, user_id: str, thread_id: str, content: str, timeout: float) -> Optional[httpx.Response]:
+    """The turn's response, or None if it took longer than `timeout` (the in-process client has no timeouts)."""
+    try:
+        return await asyncio.wait_for(
+            client.post(f"/api/threads/{thread_id}/messages", json={"user_id": user_id, "content": content}), timeout
+        )
+    except asyncio.TimeoutError:
+        return None
+
+
+async def run_burst(args: argparse.Namespace) -> Dict[str, Any]:
+    import main
+    from benchmarks.chat_load import CONVERSATIONS, seed_documents, summarize_latencies
+    from core.admission import chat_admission
+    from core.metrics import ADMISSION_REJECTED
+
+    seed_documents(200)
+    results: Dict[str, Any] = {"light": [], "heavy_ok": 0, "heavy_shed": 0, "errors": 0, "timeouts": 0, "retry_after": []}
+    peak = 0
+
+    async def heavy(client: httpx.AsyncClient) -> None:
+        user_id = "heavy"
+        (await client.post("/api/users", json={"user_id": user_id})).raise_for_status()
+        threads = await asyncio.gather(*(_new_thread(client, user_id) for _ in range(args.heavy_turns)))
+        responses = await asyncio.gather(*(
+            _turn(client, user_id, thread_id, CONVERSATIONS[i % len(CONVERSATIONS)][0], args.timeout)
+            for i, thread_id in enumerate(threads)
+        ))
+        for response in responses:
+            if response is None:
+                results["timeouts"] += 1
+            elif response.status_code == 200:
+                results["heavy_ok"] += 1
+            elif response.status_code == 429:
+                results["heavy_shed"] += 1
+                results["retry_after"].append(int(response.headers["Retry-After"]))
+            else:
+                results["errors"] += 1
+
+    async def light(client: httpx.AsyncClient, index: int) -> None:
+        user_id = f"light-{index}"
+        (await client.post("/api/users", json={"user_id": user_id})).raise_for_status()
+        thread_id = await _new_thread(client, user_id)
+        await asyncio.sleep(0.5)  # Arrive once the heavy burst is queued
+        conversation = CONVERSATIONS[index % len(CONVERSATIONS)]
+        for turn in range(args.light_turns):
+            started = time.perf_counter()
+            response = await _turn(client, user_id, thread_id, conversation[turn % len(conversation)], args.timeout)
+            if response is None:
+                results["timeouts"] += 1
+            elif response.status_code == 200:
+                results["light"].append(time.perf_counter() - started)
+            else:
+                results["errors"] += 1
+
+    async def sample_in_flight(stop: asyncio.Event) -> None:
+        nonlocal peak
+        while not stop.is_set():
+            peak = max(peak, chat_admission.in_flight)
+            await asyncio.sleep(0.01)
+
+    async with main.app.router.lifespan_context(main.app):
+        # Unhandled errors (database locked, pool exhausted) reach the client as 500s, like over HTTP
+        transport = httpx.ASGITransport(app=main.app, raise_app_exceptions=False)
+        async with httpx.AsyncClient(transport=transport, base_url="http://admission", timeout=600) as client:
+            stop = asyncio.Event()
+            sampler = asyncio.create_task(sample_in_flight(stop))
+            started = time.perf_counter()
+            await asyncio.gather(heavy(client), *(light(client, i) for i in range(args.light_users)))
+            elapsed = time.perf_counter() - started
+            stop.set()
+            await sampler
+
+    retry_after: List[int] = results.pop("retry_after")
+    return {
+        **results,
+        "seconds": elapsed,
+        "light": summarize_latencies(results["light"]),
+        "peak_in_flight": peak,
+        "mean_retry_after": sum(retry_after) / len(retry_after) if retry_after else None,
+        "shed_by_reason": {
+            sample.labels["reason"]: int(sample.value)
+            for metric in ADMISSION_REJECTED.collect() for sample in metric.samples
+            if sample.name.endswith("_total") and sample.labels["controller"] == chat_admission.name
+        },
+    }
+
+
+def run_mode(args: argparse.Namespace, bounded: bool) -> Dict[str, Any]:
+    env = {
+        **os.environ,
+        "PYTHONPATH": ROOT,
+        "OFFLINE_MODE": "true",
+        "OFFLINE_LLM_LATENCY_SECONDS": str(args.llm_latency),
+        "OFFLINE_SERVICE_LATENCY_SECONDS": "0.02",
+        "DATABASE_URL": f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='admission_'), 'bench.db')}",
+        "WARMUP_ENABLED": "false",
+        "CHAT_MAX_CONCURRENCY": str(args.max_concurrency if bounded else 100_000),
+        "CHAT_MAX_QUEUE": str(args.max_queue if bounded else 100_000),
+        "CHAT_MAX_QUEUED_PER_USER": str(args.max_queued_per_user if bounded else 100_000),
+    }
+    completed = subprocess.run(
+        [sys.executable, "-m", "benchmarks.admission", "--child",
+         "--heavy-turns", str(args.heavy_turns), "--light-users", str(args.light_users),
+         "--light-turns", str(args.light_turns), "--timeout", str(args.timeout)],
+        cwd=ROOT, env=env, capture_output=True, text=True, check=True,
+    )
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--heavy-turns", type=int, default=200)
+    parser.add_argument("--light-users", type=int, default=5)
+    parser.add_argument("--light-turns", type=int, default=3)
+    parser.add_argument("--llm-latency", type=float, default=0.3, help="Offline model latency (seconds)")
+    parser.add_argument("--timeout", type=float, default=60.0, help="Turns slower than this count as timeouts (seconds)")
+    parser.add_argument("--max-concurrency", type=int, default=16)
+    parser.add_argument("--max-queue", type=int, default=64)
+    parser.add_argument("--max-queued-per-user", type=int, default=32)
+    parser.add_argument("--output", help="Write the JSON report to this path")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(asyncio.run(run_burst(args))), flush=True)
+        # Turns cut off by --timeout can leave database connection threads behind that
+        # would block the interpreter's exit
+        os._exit(0)
+
+    report = {"config": vars(args), "results": {"unbounded": run_mode(args, False), "admission": run_mode(args, True)}}
+    print(f"1 heavy user x {args.heavy_turns} turns at once, {args.light_users} light users x {args.light_turns} turns")
+    print(f"{'mode':<11}{'light p50':>10}{'light p95':>10}{'heavy ok':>10}{'shed':>6}{'errors':>8}{'timeouts':>10}{'peak':>6}{'seconds':>9}")
+    for mode, result in report["results"].items():
+        print(
+            f"{mode:<11}{result['light']['p50']:>10.2f}{result['light']['p95']:>10.2f}{result['heavy_ok']:>10}"
+            f"{result['heavy_shed']:>6}{result['errors']:>8}{result['timeouts']:>10}{result['peak_in_flight']:>6}{result['seconds']:>9.1f}"
+        )
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"Report written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,190 @@
+"""A set of questions answered as one batch, against the same questions sent as chat turns.
+
+The question set mimics an FAQ audit: `--distinct` questions, each asked several times
+in slightly different form (case, spacing), `--questions` in all. The app runs in-process
+in offline mode (see core/offline.py), with `--llm-latency` seconds per model call. Each
+mode runs in a fresh process:
+
+- `chat`: every question is a new thread and a chat turn, `--concurrency` at a time;
+- `batch`: one `POST /api/batch/questions` with BATCH_QA_CONCURRENCY=`--concurrency`.
+
+Reported per mode: wall time, questions per minute, vector searches, embedding requests
+and texts embedded (documents and queries), and failed questions.
+
+Usage:
+    python -m benchmarks.batch_qa --questions 200 --distinct 40
+    python -m benchmarks.batch_qa --concurrency 16 --output results/batch_qa.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from typing import Any, Dict, List
+
+import httpx
+from langchain_core.embeddings import Embeddings
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class CountingQueryEmbeddings(Embeddings):
+    """Counts the embedding requests that reach the model, queries included."""
+
+    def __init__(self, embeddings: Embeddings):
+        self.embeddings = embeddings
+        self.requests = 0
+        self.texts = 0
+        self._lock = threading.Lock()
+
+    def _count(self, texts: int) -> None:
+        with self._lock:
+            self.requests += 1
+            self.texts += texts
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        self._count(len(texts))
+        return self.embeddings.embed_documents(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        self._count(1)
+        return self.embeddings.embed_query(text)
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        self._count(len(texts))
+        return await self.embeddings.aembed_documents(texts)
+
+    async def aembed_query(self, text: str) -> List[float]:
+        self._count(1)
+        return await self.embeddings.aembed_query(text)
+
+
+def question_set(n_questions: int, n_distinct: int, seed: int) -> List[str]:
+    from benchmarks.chat_load import CONVERSATIONS
+
+    rng = random.Random(seed)
+    pool = [turn for turns in CONVERSATIONS for turn in turns]
+    distinct = [pool[i % len(pool)] + (f" ({i // len(pool)})" if i >= len(pool) else "") for i in range(n_distinct)]
+    variants = [str.lower, str.upper, lambda q: q.replace(" ", "  "), lambda q: q]
+    return [rng.choice(variants)(distinct[i % n_distinct]) for i in range(n_questions)]
+
+
+async def run_mode_child(args: argparse.Namespace) -> Dict[str, Any]:
+    import main
+    from benchmarks.chat_load import seed_documents
+    from core.embedding_batcher import EmbeddingBatcher
+    from core.vectorstore import get_vector_store
+    from database.database import async_engine
+
+    seed_documents(200)
+    store = get_vector_store()
+    if isinstance(store.embedding, EmbeddingBatcher):
+        counter = store.embedding.embeddings = CountingQueryEmbeddings(store.embedding.embeddings)
+    else:
+        counter = store.embedding = CountingQueryEmbeddings(store.embedding)
+    searches = 0
+    search_by_vector = store.similarity_search_with_score_by_vector
+
+    def counted_search(*search_args, **search_kwargs):
+        nonlocal searches
+        searches += 1
+        return search_by_vector(*search_args, **search_kwargs)
+
+    store.similarity_search_with_score_by_vector = counted_search
+
+    questions = question_set(args.questions, args.distinct, seed=0)
+    user_id = "batch-bench"
+    failed = 0
+    async with main.app.router.lifespan_context(main.app):
+        transport = httpx.ASGITransport(app=main.app, raise_app_exceptions=False)
+        async with httpx.AsyncClient(transport=transport, base_url="http://batch", timeout=600) as client:
+            (await client.post("/api/users", json={"user_id": user_id})).raise_for_status()
+            started = time.perf_counter()
+            if args.mode == "chat":
+                slots = asyncio.Semaphore(args.concurrency)
+
+                async def ask(question: str) -> bool:
+                    async with slots:
+                        thread = (await client.post("/api/threads", json={"user_id": user_id})).raise_for_status().json()
+                        response = await client.post(
+                            f"/api/threads/{thread['id']}/messages", json={"user_id": user_id, "content": question}
+                        )
+                        return response.status_code == 200
+
+                failed = sum(not ok for ok in await asyncio.gather(*(ask(q) for q in questions)))
+            else:
+                async with client.stream("POST", "/api/batch/questions", json={"user_id": user_id, "questions": questions}) as response:
+                    response.raise_for_status()
+                    async for line in response.aiter_lines():
+                        event = json.loads(line) if line else {}
+                        if event.get("type") == "summary":
+                            failed = event["failed"]
+            elapsed = time.perf_counter() - started
+    await async_engine.dispose()
+    return {
+        "seconds": elapsed,
+        "questions_per_minute": len(questions) * 60 / elapsed,
+        "vector_searches": searches,
+        "embedding_requests": counter.requests,
+        "texts_embedded": counter.texts,
+        "failed": failed,
+    }
+
+
+def run_mode(args: argparse.Namespace, mode: str) -> Dict[str, Any]:
+    env = {
+        **os.environ,
+        "PYTHONPATH": ROOT,
+        "OFFLINE_MODE": "true",
+        "OFFLINE_LLM_LATENCY_SECONDS": str(args.llm_latency),
+        "OFFLINE_SERVICE_LATENCY_SECONDS": "0.02",
+        "DATABASE_URL": f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='batch_qa_'), 'bench.db')}",
+        "WARMUP_ENABLED": "false",
+        "BATCH_QA_CONCURRENCY": str(args.concurrency),
+        "BATCH_QA_GLOBAL_CONCURRENCY": str(args.concurrency),
+    }
+    completed = subprocess.run(
+        [sys.executable, "-m", "benchmarks.batch_qa", "--child", mode,
+         "--questions", str(args.questions), "--distinct", str(args.distinct), "--concurrency", str(args.concurrency)],
+        cwd=ROOT, env=env, capture_output=True, text=True, check=True,
+    )
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--questions", type=int, default=200)
+    parser.add_argument("--distinct", type=int, default=40, help="Distinct questions among them")
+    parser.add_argument("--concurrency", type=int, default=8, help="Questions answered at the same time")
+    parser.add_argument("--llm-latency", type=float, default=0.2, help="Offline model latency (seconds)")
+    parser.add_argument("--output", help="Write the JSON report to this path")
+    parser.add_argument("--child", dest="mode", choices=["chat", "batch"], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.mode:
+        print(json.dumps(asyncio.run(run_mode_child(args))), flush=True)
+        # Like the admission benchmark: leftover database connection threads must not block the exit
+        os._exit(0)
+
+    report = {"config": vars(args), "results": {mode: run_mode(args, mode) for mode in ("chat", "batch")}}
+    print(f"{args.questions} questions ({args.distinct} distinct), {args.concurrency} at a time")
+    print(f"{'mode':<7}{'seconds':>9}{'q/min':>8}{'searches':>10}{'emb reqs':>10}{'embedded':>10}{'failed':>8}")
+    for mode, result in report["results"].items():
+        print(
+            f"{mode:<7}{result['seconds']:>9.1f}{result['questions_per_minute']:>8.0f}{result['vector_searches']:>10}"
+            f"{result['embedding_requests']:>10}{result['texts_embedded']:>10}{result['failed']:>8}"
+        )
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"Report written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
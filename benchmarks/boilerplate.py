@@ -0,0 +1,187 @@
+"""Corpus reduction from boilerplate stripping and duplicate chunk removal.
+
+Generates a corpus of corporate-style PDF manuals. Every page carries the company
+header, a revision line with a date, a confidentiality disclaimer and "Página i de n".
+Every manual also ends with annexes shared across the corpus: the same data protection
+annex in all of them, and a code of conduct copied with small edits (punctuation, one
+word) into some of them. The corpus is indexed as one upload job (`process_upload_job`)
+in offline mode, in a fresh process per mode:
+
+- `raw`: INGEST_STRIP_BOILERPLATE=false, INGEST_DEDUP_CHUNKS=false;
+- `boilerplate`: repeated header/footer lines stripped (see core/boilerplate.py);
+- `dedup`: stripped, and duplicate and near-duplicate chunks dropped (see core/dedup.py).
+  The same corpus is then uploaded again as a second job, which should embed nothing.
+
+Reported per mode: chunks and tokens indexed, chunks and tokens skipped, and the
+embedding requests sent.
+
+Usage:
+    python -m benchmarks.boilerplate --files 20 --pages 8
+    python -m benchmarks.boilerplate --output results/boilerplate.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+HEADER = "ACME Servicios Integrales S.L. - Manual interno de {topic}"
+REVISION = "Documento controlado. Revision 4, aprobada el {day} de marzo de 2024"
+DISCLAIMER = (
+    "CONFIDENCIAL: este documento es propiedad de ACME Servicios Integrales S.L. y no puede "
+    "reproducirse ni distribuirse sin autorizacion expresa del departamento de Recursos Humanos."
+)
+FOOTER = "Pagina {page} de {pages}"
+TOPICS = ["vacaciones", "teletrabajo", "prevencion de riesgos", "instalaciones", "formacion", "gastos", "seguridad"]
+
+
+def _paragraphs(rng: random.Random, words: List[str], count: int, words_per_paragraph: int) -> str:
+    return "\n".join(
+        " ".join(rng.choice(words) for _ in range(words_per_paragraph)).capitalize() + "."
+        for _ in range(count)
+    )
+
+
+def _near_copy(text: str, rng: random.Random) -> str:
+    """The same text re-punctuated, with one word changed: what gets pasted between manuals."""
+    words = text.replace(".", ";").split(" ")
+    words[rng.randrange(len(words))] = "igualmente"
+    return " ".join(words)
+
+
+def corporate_pdfs(n_files: int, n_pages: int, words_per_page: int, seed: int) -> Dict[str, bytes]:
+    from benchmarks.ingestion import WORDS, make_pdf
+
+    rng = random.Random(seed)
+    data_protection = _paragraphs(rng, WORDS, 6, words_per_page // 6)
+    code_of_conduct = _paragraphs(rng, WORDS, 6, words_per_page // 6)
+    pdfs = {}
+    for i in range(n_files):
+        topic = TOPICS[i % len(TOPICS)]
+        bodies = [_paragraphs(rng, WORDS, 4, words_per_page // 4) for _ in range(n_pages)]
+        bodies.append(data_protection)
+        bodies.append(_near_copy(code_of_conduct, rng) if i % 2 else code_of_conduct)
+        pages = [
+            "\n".join([
+                HEADER.format(topic=topic), REVISION.format(day=rng.randint(1, 28)), "",
+                body, "", DISCLAIMER, FOOTER.format(page=page, pages=len(bodies)),
+            ])
+            for page, body in enumerate(bodies, start=1)
+        ]
+        pdfs[f"manual_{i:03d}_{topic.replace(' ', '_')}.pdf"] = make_pdf(pages)
+    return pdfs
+
+
+async def run_job(args: argparse.Namespace) -> Dict[str, Any]:
+    from benchmarks.embedding_batcher import CountingEmbeddings
+    from core.embedding_batcher import EmbeddingBatcher
+    from core.ingestion import JobFile, process_upload_job
+    from core.vectorstore import get_vector_store
+    from database import crud
+    from database.database import async_engine, async_session, engine
+    from database.models import create_db_and_tables
+    from utils.tokens import count_text_tokens
+
+    create_db_and_tables(engine)
+    store = get_vector_store()
+    if isinstance(store.embedding, EmbeddingBatcher):
+        counter = store.embedding.embeddings = CountingEmbeddings(store.embedding.embeddings)
+    else:
+        counter = store.embedding = CountingEmbeddings(store.embedding)
+
+    pdfs = corporate_pdfs(args.files, args.pages, args.words_per_page, seed=0)
+    runs = []
+    for _ in range(args.uploads):
+        files = [JobFile.from_bytes(filename, file_bytes) for filename, file_bytes in pdfs.items()]
+        async with async_session() as db:
+            job = await crud.create_upload_job_in_db(db, [f.filename for f in files])
+        requests_before, texts_before = counter.requests, counter.texts
+        started = time.perf_counter()
+        await process_upload_job(job.id, files)
+        elapsed = time.perf_counter() - started
+        async with async_session() as db:
+            job = await crud.get_upload_job_from_db(db, job.id)
+        runs.append({
+            "status": job.overall_status.value,
+            "seconds": elapsed,
+            "chunks_indexed": sum(f.chunks_indexed or 0 for f in job.files),
+            "chunks_skipped": sum(f.chunks_skipped or 0 for f in job.files),
+            "tokens_saved": sum(f.tokens_saved or 0 for f in job.files),
+            "embeddings": counter.texts - texts_before,
+            "embedding_requests": counter.requests - requests_before,
+        })
+    # Tokens of everything in the index at the end (the in-memory store of the offline mode)
+    runs[0]["tokens_indexed"] = sum(count_text_tokens(doc["text"]) for doc in store.store.values())
+    await async_engine.dispose()
+    return {"uploads": runs}
+
+
+def run_mode(args: argparse.Namespace, strip: bool, dedup: bool, uploads: int) -> Dict[str, Any]:
+    env = {
+        **os.environ,
+        "PYTHONPATH": ROOT,
+        "OFFLINE_MODE": "true",
+        "OFFLINE_SERVICE_LATENCY_SECONDS": "0",
+        "DATABASE_URL": f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='boilerplate_'), 'bench.db')}",
+        "INGEST_STRIP_BOILERPLATE": str(strip).lower(),
+        "INGEST_DEDUP_CHUNKS": str(dedup).lower(),
+    }
+    completed = subprocess.run(
+        [sys.executable, "-m", "benchmarks.boilerplate", "--child", "--uploads", str(uploads),
+         "--files", str(args.files), "--pages", str(args.pages), "--words-per-page", str(args.words_per_page)],
+        cwd=ROOT, env=env, capture_output=True, text=True, check=True,
+    )
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--files", type=int, default=20)
+    parser.add_argument("--pages", type=int, default=8, help="Content pages per manual, before the shared annexes")
+    parser.add_argument("--words-per-page", type=int, default=300)
+    parser.add_argument("--output", help="Write the JSON report to this path")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--uploads", type=int, default=1, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(asyncio.run(run_job(args))))
+        return
+
+    results = {
+        "raw": run_mode(args, strip=False, dedup=False, uploads=1),
+        "boilerplate": run_mode(args, strip=True, dedup=False, uploads=1),
+        "dedup": run_mode(args, strip=True, dedup=True, uploads=2),
+    }
+    report = {"config": vars(args), "results": results}
+    raw = results["raw"]["uploads"][0]
+    print(f"{args.files} manuals x {args.pages + 2} pages")
+    print(f"{'mode':<13}{'chunks':>8}{'tokens':>9}{'skipped':>9}{'tok saved':>11}{'embedded':>10}{'requests':>10}{'vs raw':>8}")
+    for mode, result in results.items():
+        first = result["uploads"][0]
+        print(
+            f"{mode:<13}{first['chunks_indexed']:>8}{first['tokens_indexed']:>9}{first['chunks_skipped']:>9}"
+            f"{first['tokens_saved']:>11}{first['embeddings']:>10}{first['embedding_requests']:>10}"
+            f"{first['tokens_indexed'] / raw['tokens_indexed'] - 1:>+8.0%}"
+        )
+    for again in results["dedup"]["uploads"][1:]:
+        print(
+            f"{'re-upload':<13}{again['chunks_indexed']:>8}{'':>9}{again['chunks_skipped']:>9}"
+            f"{again['tokens_saved']:>11}{again['embeddings']:>10}{again['embedding_requests']:>10}"
+        )
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"Report written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,272 @@
+"""Load test for the chat endpoint with realistic multi-turn conversations.
+
+Each virtual user creates a user and a thread, then sends a multi-turn conversation
+to `POST /api/threads/{id}/messages`, waiting for every answer (plus an optional think
+time) before sending the next message. Reports throughput, end-to-end latency
+percentiles and the time spent in each graph node, and saves everything as JSON.
+
+By default the app runs in-process in offline mode (see core/offline.py) against a
+throw-away SQLite database; pass `--url` to target a running server instead. Node timings
+come from the `rag_graph_node_duration_seconds` histogram at /metrics, read before and
+after the run, so their percentiles are bucket estimates (like `histogram_quantile`).
+
+Usage:
+    python -m benchmarks.chat_load --users 50 --turns 4 --output results/chat_50.json
+    python -m benchmarks.chat_load --users 200 --llm-latency 0.4 --service-latency 0.05
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import tempfile
+import time
+import uuid
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+import httpx
+
+CONVERSATIONS = [
+    [
+        "¿Cuántos días de vacaciones me corresponden al año?",
+        "¿Y si entré a mitad de año?",
+        "¿Puedo acumular los días que no use?",
+        "¿Con cuánta antelación tengo que pedirlas?",
+        "Gracias, ¿dónde encuentro el formulario?",
+    ],
+    [
+        "¿Cuál es la política de teletrabajo?",
+        "¿Cuántos días a la semana puedo trabajar desde casa?",
+        "¿La empresa paga parte de la conexión a internet?",
+        "¿Qué pasa si mi jefe no aprueba la solicitud?",
+    ],
+    [
+        "¿Qué requisitos tiene la instalación eléctrica de una vivienda según el REBT?",
+        "¿Cuántos circuitos mínimos debe tener?",
+        "¿Qué sección de cable se usa para el circuito de cocina?",
+        "¿Y para el baño hay alguna restricción especial?",
+        "¿Quién debe firmar el certificado de instalación?",
+    ],
+    [
+        "Hola, ¿qué puedes hacer por mí?",
+        "Me llamo Laura y trabajo en el departamento de compras.",
+        "¿Cómo se aprueba una compra de más de 5000 euros?",
+        "¿Necesito tres presupuestos?",
+    ],
+]
+
+
+def summarize_latencies(latencies: List[float]) -> Dict[str, float]:
+    from workflow.instrumentation import percentile
+
+    ordered = sorted(latencies)
+    return {
+        "count": len(ordered),
+        "mean": sum(ordered) / len(ordered) if ordered else 0.0,
+        "p50": percentile(ordered, 50),
+        "p95": percentile(ordered, 95),
+        "p99": percentile(ordered, 99),
+        "max": ordered[-1] if ordered else 0.0,
+    }
+
+
+async def node_histograms(client: httpx.AsyncClient) -> Dict[str, Dict[str, Any]]:
+    """Cumulative bucket counts, count and sum of `rag_graph_node_duration_seconds` per node."""
+    from prometheus_client.parser import text_string_to_metric_families
+
+    text = (await client.get("/metrics")).raise_for_status().text
+    nodes: Dict[str, Dict[str, Any]] = {}
+    for family in text_string_to_metric_families(text):
+        if family.name != "rag_graph_node_duration_seconds":
+            continue
+        for sample in family.samples:
+            node = nodes.setdefault(sample.labels["node"], {"buckets": {}, "count": 0.0, "sum": 0.0})
+            if sample.name.endswith("_bucket"):
+                node["buckets"][float(sample.labels["le"])] = sample.value
+            elif sample.name.endswith("_count"):
+                node["count"] = sample.value
+            elif sample.name.endswith("_sum"):
+                node["sum"] = sample.value
+    return nodes
+
+
+def histogram_quantile(q: float, buckets: List[Tuple[float, float]]) -> float:
+    """Quantile estimate from sorted (upper bound, cumulative count) pairs, interpolated within the bucket."""
+    total = buckets[-1][1]
+    rank = q / 100 * total
+    lower, below = 0.0, 0.0
+    for upper, cumulative in buckets:
+        if cumulative >= rank:
+            if upper == float("inf"):
+                return lower  # Beyond the last finite bucket: its bound is the best estimate
+            return lower + (upper - lower) * (rank - below) / (cumulative - below) if cumulative > below else upper
+        lower, below = upper, cumulative
+    return lower
+
+
+def summarize_nodes(before: Dict[str, Dict[str, Any]], after: Dict[str, Dict[str, Any]]) -> Dict[str, Dict[str, float]]:
+    """Per node count, mean and percentiles of the runs between the two snapshots."""
+    summary = {}
+    for node, stats in after.items():
+        previous = before.get(node, {"buckets": {}, "count": 0.0, "sum": 0.0})
+        count = stats["count"] - previous["count"]
+        if count <= 0:
+            continue
+        buckets = sorted((le, value - previous["buckets"].get(le, 0.0)) for le, value in stats["buckets"].items())
+        summary[node] = {
+            "count": int(count),
+            "mean": (stats["sum"] - previous["sum"]) / count,
+            "p50": histogram_quantile(50, buckets),
+            "p95": histogram_quantile(95, buckets),
+            "p99": histogram_quantile(99, buckets),
+        }
+    return summary
+
+
+@asynccontextmanager
+async def in_process_client(args: argparse.Namespace):
+    """HTTP client bound to the app running in this process, in offline mode."""
+    database_path = os.path.join(tempfile.mkdtemp(prefix="chat_load_"), "chat_load.db")
+    os.environ.update({
+        "OFFLINE_MODE": "true",
+        "DATABASE_URL": f"sqlite:///{database_path}",
+        "OFFLINE_LLM_LATENCY_SECONDS": str(args.llm_latency),
+        "OFFLINE_SERVICE_LATENCY_SECONDS": str(args.service_latency),
+        "OFFLINE_TOOL_CALL_PROBABILITY": str(args.tool_call_probability),
+    })
+    import main
+
+    seed_documents(args.documents)
+    async with main.app.router.lifespan_context(main.app):
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://chat-load", timeout=args.timeout) as client:
+            yield client
+
+
+def seed_documents(n_documents: int) -> None:
+    """Fill the offline vector store with a small synthetic corpus so retrieval has something to rank."""
+    from langchain_core.documents import Document
+    from core.vectorstore import get_vector_store
+
+    words = " ".join(" ".join(turns) for turns in CONVERSATIONS).split()
+    rng = random.Random(0)
+    get_vector_store().add_documents([
+        Document(
+            page_content=" ".join(rng.choice(words) for _ in range(150)),
+            metadata={"source": f"doc_{i // 10}.pdf", "page": i % 10 + 1},
+        )
+        for i in range(n_documents)
+    ])
+
+
+async def virtual_user(
+    client: httpx.AsyncClient, args: argparse.Namespace, user_index: int, results: Dict[str, Any]
+) -> None:
+    rng = random.Random(user_index)
+    await asyncio.sleep(args.ramp_up * user_index / max(1, args.users))
+
+    user_id = f"load-{uuid.uuid4().hex[:8]}-{user_index}"
+    try:
+        (await client.post("/api/users", json={"user_id": user_id})).raise_for_status()
+        thread = (await client.post("/api/threads", json={"user_id": user_id})).raise_for_status().json()
+    except httpx.HTTPError as e:
+        results["errors"].append(f"setup: {e}")
+        return
+
+    conversation = CONVERSATIONS[user_index % len(CONVERSATIONS)]
+    for turn in range(args.turns):
+        content = conversation[turn % len(conversation)]
+        started = time.perf_counter()
+        try:
+            response = await client.post(
+                f"/api/threads/{thread['id']}/messages", json={"user_id": user_id, "content": content}
+            )
+            response.raise_for_status()
+        except httpx.HTTPError as e:
+            results["errors"].append(f"turn {turn}: {e}")
+            continue
+        results["latencies"].append(time.perf_counter() - started)
+        if args.think_time:
+            await asyncio.sleep(rng.uniform(0, 2 * args.think_time))
+
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+    if args.url:
+        client_context = httpx.AsyncClient(base_url=args.url, timeout=args.timeout)
+    else:
+        client_context = in_process_client(args)
+
+    results: Dict[str, Any] = {"latencies": [], "errors": []}
+    async with client_context as client:
+        before = await node_histograms(client)
+        started = time.perf_counter()
+        await asyncio.gather(*(virtual_user(client, args, i, results) for i in range(args.users)))
+        elapsed = time.perf_counter() - started
+        nodes = summarize_nodes(before, await node_histograms(client))
+
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "git_commit": _git_commit(),
+        "config": vars(args),
+        "duration_seconds": elapsed,
+        "requests": len(results["latencies"]),
+        "errors": len(results["errors"]),
+        "error_samples": results["errors"][:10],
+        "throughput_rps": len(results["latencies"]) / elapsed if elapsed else 0.0,
+        "latency_seconds": summarize_latencies(results["latencies"]),
+        "nodes": nodes,
+    }
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_report(report: Dict[str, Any]) -> None:
+    latency = report["latency_seconds"]
+    print(
+        f"{report['requests']} requests, {report['errors']} errors in {report['duration_seconds']:.1f}s "
+        f"({report['throughput_rps']:.2f} req/s)"
+    )
+    print(
+        f"latency p50={latency['p50']:.3f}s p95={latency['p95']:.3f}s p99={latency['p99']:.3f}s max={latency['max']:.3f}s"
+    )
+    print(f"{'node':<20}{'count':>7}{'mean':>9}{'p50':>9}{'p95':>9}{'p99':>9}")
+    for node, stats in report["nodes"].items():
+        print(
+            f"{node:<20}{stats['count']:>7}{stats['mean']:>9.3f}{stats['p50']:>9.3f}{stats['p95']:>9.3f}{stats['p99']:>9.3f}"
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=50, help="Concurrent virtual users")
+    parser.add_argument("--turns", type=int, default=4, help="Messages per conversation")
+    parser.add_argument("--ramp-up", type=float, default=2.0, help="Seconds over which users start")
+    parser.add_argument("--think-time", type=float, default=0.0, help="Mean pause between turns (seconds)")
+    parser.add_argument("--timeout", type=float, default=120.0, help="Per-request timeout (seconds)")
+    parser.add_argument("--url", help="Target a running server instead of the in-process offline app")
+    parser.add_argument("--llm-latency", type=float, default=0.2, help="Offline model latency (seconds)")
+    parser.add_argument("--service-latency", type=float, default=0.02, help="Offline embedding/memory latency (seconds)")
+    parser.add_argument("--tool-call-probability", type=float, default=0.8)
+    parser.add_argument("--documents", type=int, default=500, help="Synthetic chunks seeded in the offline store")
+    parser.add_argument("--output", help="Write the JSON report to this path")
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+    print_report(report)
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"Report written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
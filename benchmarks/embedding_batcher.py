@@ -0,0 +1,146 @@
+"""Embedding throughput on a many-small-files upload, with and without the cross-file batcher.
+
+Creates one upload job with `--files` small PDFs (`--pages` pages each) and runs it
+through the upload job processing (`process_upload_job`: concurrent files, parsing,
+splitting, embedding, upsert) in offline mode. Each embedding request costs
+`--embedding-latency` seconds, which stands for the per-request latency of the API.
+Each mode runs in a fresh process:
+
+- `per-file`: EMBEDDING_BATCHING=false, every file embeds its own chunks;
+- `batched`: the chunks of the files indexing at the same time share requests of up to
+  EMBEDDING_BATCH_SIZE texts (see core/embedding_batcher.py).
+
+Reported per mode: embeddings/sec over the whole job, the number of embedding requests
+and their mean size.
+
+Usage:
+    python -m benchmarks.embedding_batcher --files 60 --pages 2
+    python -m benchmarks.embedding_batcher --files 200 --embedding-latency 1.0 --output results/embedding_batcher.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List
+
+from langchain_core.embeddings import Embeddings
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class CountingEmbeddings(Embeddings):
+    """Counts the document embedding requests that reach the model."""
+
+    def __init__(self, embeddings: Embeddings):
+        self.embeddings = embeddings
+        self.requests = 0
+        self.texts = 0
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        self.requests += 1
+        self.texts += len(texts)
+        return self.embeddings.embed_documents(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embeddings.embed_query(text)
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        self.requests += 1
+        self.texts += len(texts)
+        return await self.embeddings.aembed_documents(texts)
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return await self.embeddings.aembed_query(text)
+
+
+async def run_job(args: argparse.Namespace) -> Dict[str, Any]:
+    from benchmarks.ingestion import synthetic_pdfs
+    from core.embedding_batcher import EmbeddingBatcher
+    from core.ingestion import JobFile, process_upload_job
+    from core.vectorstore import get_vector_store
+    from database import crud
+    from database.database import async_engine, async_session, engine
+    from database.models import create_db_and_tables
+
+    create_db_and_tables(engine)
+    store = get_vector_store()
+    # The counter sits below the batcher (if any), where the requests reach the model
+    if isinstance(store.embedding, EmbeddingBatcher):
+        counter = store.embedding.embeddings = CountingEmbeddings(store.embedding.embeddings)
+    else:
+        counter = store.embedding = CountingEmbeddings(store.embedding)
+
+    pdfs = synthetic_pdfs(args.files, args.pages, args.words_per_page, seed=0)
+    files = [JobFile.from_bytes(filename, file_bytes) for filename, file_bytes in pdfs.items()]
+    async with async_session() as db:
+        job = await crud.create_upload_job_in_db(db, [f.filename for f in files])
+
+    started = time.perf_counter()
+    await process_upload_job(job.id, files)
+    elapsed = time.perf_counter() - started
+
+    async with async_session() as db:
+        job = await crud.get_upload_job_from_db(db, job.id)
+    await async_engine.dispose()
+    return {
+        "status": job.overall_status.value,
+        "seconds": elapsed,
+        "embeddings": counter.texts,
+        "embeddings_per_second": counter.texts / elapsed,
+        "requests": counter.requests,
+        "mean_request_size": counter.texts / counter.requests if counter.requests else 0.0,
+    }
+
+
+def run_mode(args: argparse.Namespace, batching: bool) -> Dict[str, Any]:
+    env = {
+        **os.environ,
+        "PYTHONPATH": ROOT,
+        "OFFLINE_MODE": "true",
+        "OFFLINE_SERVICE_LATENCY_SECONDS": str(args.embedding_latency),
+        "DATABASE_URL": f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='embedding_batcher_'), 'bench.db')}",
+        "EMBEDDING_BATCHING": str(batching).lower(),
+    }
+    completed = subprocess.run(
+        [sys.executable, "-m", "benchmarks.embedding_batcher", "--child",
+         "--files", str(args.files), "--pages", str(args.pages), "--words-per-page", str(args.words_per_page)],
+        cwd=ROOT, env=env, capture_output=True, text=True, check=True,
+    )
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--files", type=int, default=60)
+    parser.add_argument("--pages", type=int, default=2, help="Pages per PDF")
+    parser.add_argument("--words-per-page", type=int, default=350)
+    parser.add_argument("--embedding-latency", type=float, default=0.5, help="Seconds per embedding request")
+    parser.add_argument("--output", help="Write the JSON report to this path")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(asyncio.run(run_job(args))))
+        return
+
+    report = {"config": vars(args), "results": {"per-file": run_mode(args, False), "batched": run_mode(args, True)}}
+    print(f"{args.files} files x {args.pages} pages, {args.embedding_latency}s per embedding request")
+    print(f"{'mode':<10}{'seconds':>9}{'embeddings':>12}{'emb/s':>9}{'requests':>10}{'texts/req':>11}")
+    for mode, result in report["results"].items():
+        print(
+            f"{mode:<10}{result['seconds']:>9.2f}{result['embeddings']:>12}{result['embeddings_per_second']:>9.1f}"
+            f"{result['requests']:>10}{result['mean_request_size']:>11.1f}"
+        )
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"Report written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
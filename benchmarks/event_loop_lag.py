@@ -0,0 +1,226 @@
+"""Event-loop lag under concurrent chats: blocking vs. async database access.
+
+A monitor task asks to wake up every `--interval` seconds and records how late it
+actually runs; anything that blocks the event loop (a synchronous query, CPU work in a
+coroutine) shows up as lag, and delays every request served by the process.
+
+Scenarios:
+
+- `db`: `--chats` concurrent chat turns doing the database work of
+  `POST /api/threads/{id}/messages` (load the thread, store the user message, load the
+  history, store the answer), with `--graph-latency` seconds of simulated graph time in
+  between. It runs twice: `blocking` issues the queries through a sync `Session` on the
+  event loop (how the API worked before the async database layer), `async` through the
+  async CRUD functions.
+- `app`: the whole app in-process in offline mode, driven by the chat load test users
+  (see benchmarks/chat_load.py), for the lag of the current code path end to end.
+
+Reported per mode: throughput (turns per second), turn latency from the moment the
+round's turns arrive (a turn that can't start while the loop is blocked is waiting too)
+and the loop lag. SQLite (default, throw-away file) has no network round trip, so the
+blocking numbers are a lower bound: each query is cheaper than the aiosqlite thread hops
+of the async path, and blocking still has the higher throughput there. Pass
+`--database-url postgresql://...` to measure against Postgres.
+
+Usage:
+    python -m benchmarks.event_loop_lag --chats 100
+    python -m benchmarks.event_loop_lag --scenario app --chats 30 --output results/loop_lag.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import time
+from typing import Any, Dict, List
+
+
+class LagMonitor:
+    """Measures how late the event loop runs a task that sleeps for `interval` seconds."""
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.samples: List[float] = []
+        self._task = None
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            self.samples.append(max(0.0, loop.time() - expected))
+
+    def __enter__(self) -> "LagMonitor":
+        self._task = asyncio.ensure_future(self._run())
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self._task.cancel()
+
+    def summary(self) -> Dict[str, float]:
+        from workflow.instrumentation import percentile
+
+        ordered = sorted(self.samples)
+        return {
+            "samples": len(ordered),
+            "p50_ms": percentile(ordered, 50) * 1000,
+            "p99_ms": percentile(ordered, 99) * 1000,
+            "max_ms": (ordered[-1] if ordered else 0.0) * 1000,
+            "blocked_ms_total": sum(ordered) * 1000,
+        }
+
+
+def summarize_turns(latencies: List[float]) -> Dict[str, float]:
+    from workflow.instrumentation import percentile
+
+    ordered = sorted(latencies)
+    return {
+        "turn_p50_ms": percentile(ordered, 50) * 1000,
+        "turn_p99_ms": percentile(ordered, 99) * 1000,
+        "turn_max_ms": (ordered[-1] if ordered else 0.0) * 1000,
+    }
+
+
+# --- db scenario ---
+def blocking_turn_queries(thread_id: str, content: str) -> None:
+    """The queries of a chat turn through a sync session, as the handlers issued them before."""
+    from sqlmodel import Session, select
+    from database import models
+    from database.database import engine
+
+    with Session(engine) as db:
+        db_thread = db.get(models.Thread, thread_id)
+        db.add(models.Message(thread_id=thread_id, role="user", content=content))
+        db_thread.token_count = models.Thread.token_count + len(content) // 4
+        db.add(db_thread)
+        db.commit()
+        db.exec(select(models.Message).where(models.Message.thread_id == thread_id).order_by(models.Message.timestamp)).all()
+
+
+async def blocking_turn(thread_id: str, content: str, graph_latency: float) -> None:
+    blocking_turn_queries(thread_id, content)
+    await asyncio.sleep(graph_latency)
+    blocking_turn_queries(thread_id, content)
+
+
+async def async_turn(thread_id: str, content: str, graph_latency: float) -> None:
+    from database import crud
+    from database.database import async_session
+
+    async with async_session() as db:
+        await crud.get_thread_by_id(db, thread_id)
+        await crud.create_message_in_thread(db, thread_id=thread_id, role="user", content=content)
+        await crud.get_messages_for_thread(db, thread_id)
+        await db.commit()
+    await asyncio.sleep(graph_latency)
+    async with async_session() as db:
+        await crud.create_message_in_thread(db, thread_id=thread_id, role="assistant", content=content)
+
+
+async def run_db_scenario(args: argparse.Namespace) -> Dict[str, Any]:
+    from database import crud, models
+    from database.database import async_engine, async_session, engine
+    from database.models import create_db_and_tables
+
+    create_db_and_tables(engine)
+    user_id = f"lag-{time.time_ns()}"
+    async with async_session() as db:
+        await crud.create_user(db, models.UserCreate(user_id=user_id))
+        thread_ids = [(await crud.create_thread_for_user(db, user_id=user_id)).id for _ in range(args.chats)]
+
+    content = "¿Cuántos días de vacaciones me corresponden al año? " * 4
+    results = {}
+    for mode, turn in (("blocking", blocking_turn), ("async", async_turn)):
+        latencies = []
+
+        async def timed_turn(thread_id: str, submitted: float) -> None:
+            await turn(thread_id, content, args.graph_latency)
+            # From when the round's turns arrived: a turn that can't start because the loop is blocked is waiting too
+            latencies.append(time.perf_counter() - submitted)
+
+        with LagMonitor(args.interval) as monitor:
+            started = time.perf_counter()
+            for _ in range(args.turns):
+                submitted = time.perf_counter()
+                await asyncio.gather(*(timed_turn(thread_id, submitted) for thread_id in thread_ids))
+            elapsed = time.perf_counter() - started
+        results[mode] = {
+            "seconds": elapsed,
+            "turns": len(latencies),
+            "turns_per_second": len(latencies) / elapsed,
+            **summarize_turns(latencies),
+            "lag": monitor.summary(),
+        }
+    await async_engine.dispose()
+    return results
+
+
+# --- app scenario ---
+async def run_app_scenario(args: argparse.Namespace) -> Dict[str, Any]:
+    from benchmarks.chat_load import in_process_client, virtual_user
+
+    load_args = argparse.Namespace(
+        users=args.chats, turns=args.turns, ramp_up=0.0, think_time=0.0, timeout=120.0,
+        llm_latency=args.graph_latency / 4, service_latency=0.01, tool_call_probability=0.8, documents=200,
+    )
+    results: Dict[str, Any] = {"latencies": [], "errors": []}
+    async with in_process_client(load_args) as client:
+        with LagMonitor(args.interval) as monitor:
+            started = time.perf_counter()
+            await asyncio.gather(*(virtual_user(client, load_args, i, results) for i in range(args.chats)))
+            elapsed = time.perf_counter() - started
+    return {
+        "app": {
+            "seconds": elapsed,
+            "turns": len(results["latencies"]),
+            "turns_per_second": len(results["latencies"]) / elapsed,
+            **summarize_turns(results["latencies"]),
+            "errors": len(results["errors"]),
+            "lag": monitor.summary(),
+        }
+    }
+
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+    database_url = args.database_url or f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='loop_lag_'), 'loop_lag.db')}"
+    os.environ.update({"OFFLINE_MODE": "true", "DATABASE_URL": database_url})
+    results = await (run_db_scenario(args) if args.scenario == "db" else run_app_scenario(args))
+    return {"config": vars(args), "results": results}
+
+
+def print_report(report: Dict[str, Any]) -> None:
+    print(
+        f"{'mode':<10}{'turns':>7}{'seconds':>9}{'turns/s':>9}{'turn p50':>11}{'turn p99':>11}"
+        f"{'lag p50':>10}{'lag p99':>10}{'lag max':>10}{'blocked':>10}"
+    )
+    for mode, result in report["results"].items():
+        lag = result["lag"]
+        print(
+            f"{mode:<10}{result['turns']:>7}{result['seconds']:>9.2f}{result['turns_per_second']:>9.1f}"
+            f"{result['turn_p50_ms']:>9.0f}ms{result['turn_p99_ms']:>9.0f}ms{lag['p50_ms']:>8.1f}ms"
+            f"{lag['p99_ms']:>8.1f}ms{lag['max_ms']:>8.1f}ms{lag['blocked_ms_total']:>8.0f}ms"
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenario", choices=("db", "app"), default="db")
+    parser.add_argument("--chats", type=int, default=50, help="Concurrent chats")
+    parser.add_argument("--turns", type=int, default=3, help="Turns per chat")
+    parser.add_argument("--graph-latency", type=float, default=0.2, help="Simulated graph time per turn (seconds)")
+    parser.add_argument("--interval", type=float, default=0.005, help="Monitor wake-up interval (seconds)")
+    parser.add_argument("--database-url", help="Database to run against (default: throw-away SQLite file)")
+    parser.add_argument("--output", help="Write the JSON report to this path")
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+    print_report(report)
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"Report written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,291 @@
+"""Ingestion throughput benchmark: synthetic PDFs through the upload flow and its isolated stages.
+
+Generates PDFs of configurable size, then measures against the offline stand-ins
+(see core/offline.py):
+
+- stages: PDF parsing (`load_pdf_from_bytes`), splitting (`split_documents`), embedding
+  and vector store upsert (`add_documents_to_vector_store`), per file;
+- end to end: `POST /api/upload` followed by status polling until the job finishes.
+
+Reports pages/sec, chunks/sec, peak RSS and the stage-time breakdown. With `--baseline`
+the run fails if throughput dropped (or peak RSS grew) by more than `--max-regression`.
+
+Usage:
+    python -m benchmarks.ingestion --files 4 --pages 50 --output results/ingestion.json
+    python -m benchmarks.ingestion --baseline results/ingestion.json --max-regression 0.15
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import resource
+import sys
+import tempfile
+import textwrap
+import time
+from typing import Any, Dict, List
+
+import httpx
+
+WORDS = (
+    "instalacion electrica vivienda circuito proteccion diferencial interruptor cable seccion "
+    "potencia tension conductor tierra reglamento baja tension norma certificado instalador "
+    "empresa trabajador vacaciones permiso contrato salario jornada teletrabajo politica "
+    "seguridad riesgo prevencion formacion evaluacion procedimiento documento anexo articulo"
+).split()
+
+
+# --- Synthetic PDFs ---
+def make_pdf(pages: List[str]) -> bytes:
+    """Minimal multi-page PDF (Helvetica text, WinAnsi encoded), built without third-party libraries."""
+    objects: List[bytes] = []
+
+    def add(body: bytes) -> int:
+        objects.append(body)
+        return len(objects)
+
+    catalog_id = add(b"")  # Filled in once the page tree exists
+    pages_id = add(b"")
+    font_id = add(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>")
+    page_ids = []
+    for text in pages:
+        # Each line of the text is wrapped on its own, so headers and footers stay lines
+        lines = [line for paragraph in text.split("\n") for line in textwrap.wrap(paragraph, 90) or [""]]
+        commands = ["BT", "/F1 10 Tf", "12 TL", "40 800 Td"]
+        for line in lines:
+            escaped = line.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+            commands.append(f"({escaped}) Tj T*")
+        commands.append("ET")
+        stream = "\n".join(commands).encode("cp1252", errors="replace")
+        content_id = add(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+        page_ids.append(add(
+            b"<< /Type /Page /Parent %d 0 R /MediaBox [0 0 595 842] /Contents %d 0 R "
+            b"/Resources << /Font << /F1 %d 0 R >> >> >>" % (pages_id, content_id, font_id)
+        ))
+    objects[catalog_id - 1] = b"<< /Type /Catalog /Pages %d 0 R >>" % pages_id
+    kids = b" ".join(b"%d 0 R" % page_id for page_id in page_ids)
+    objects[pages_id - 1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (kids, len(page_ids))
+
+    output = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(output))
+        output += b"%d 0 obj\n" % number + body + b"\nendobj\n"
+    xref_offset = len(output)
+    output += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    output += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    output += b"trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, catalog_id, xref_offset)
+    return bytes(output)
+
+
+def synthetic_pdfs(n_files: int, n_pages: int, words_per_page: int, seed: int) -> Dict[str, bytes]:
+    rng = random.Random(seed)
+    return {
+        f"synthetic_{i}.pdf": make_pdf([
+            " ".join(rng.choice(WORDS) for _ in range(words_per_page)) + "." for _ in range(n_pages)
+        ])
+        for i in range(n_files)
+    }
+
+
+# --- Measurements ---
+def peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024  # bytes on macOS, KiB on Linux
+
+
+class TimedEmbeddings:
+    """Wraps the vector store's embedding model to separate embedding time from upsert time."""
+
+    def __init__(self, embeddings):
+        self.embeddings = embeddings
+        self.seconds = 0.0
+
+    def embed_documents(self, texts):
+        started = time.perf_counter()
+        try:
+            return self.embeddings.embed_documents(texts)
+        finally:
+            self.seconds += time.perf_counter() - started
+
+    async def aembed_documents(self, texts):
+        started = time.perf_counter()
+        try:
+            return await self.embeddings.aembed_documents(texts)
+        finally:
+            self.seconds += time.perf_counter() - started
+
+    def __getattr__(self, name):
+        return getattr(self.embeddings, name)
+
+
+async def benchmark_stages(pdfs: Dict[str, bytes]) -> Dict[str, Any]:
+    from core.loader import load_pdf_from_bytes
+    from core.splitter import split_documents
+    from core.vectorstore import add_documents_to_vector_store, get_vector_store
+
+    pc_store = get_vector_store()
+    timed_embeddings = TimedEmbeddings(pc_store.embedding)
+    pc_store.embedding = timed_embeddings
+    stages = {"parse": 0.0, "split": 0.0, "embed": 0.0, "upsert": 0.0}
+    pages = chunks = 0
+    try:
+        for filename, file_bytes in pdfs.items():
+            started = time.perf_counter()
+            documents = await load_pdf_from_bytes(file_bytes, filename)
+            stages["parse"] += time.perf_counter() - started
+
+            started = time.perf_counter()
+            file_chunks = split_documents(documents)
+            stages["split"] += time.perf_counter() - started
+
+            embedded_before = timed_embeddings.seconds
+            started = time.perf_counter()
+            await add_documents_to_vector_store(file_chunks)
+            index_seconds = time.perf_counter() - started
+            embed_seconds = timed_embeddings.seconds - embedded_before
+            stages["embed"] += embed_seconds
+            stages["upsert"] += index_seconds - embed_seconds
+
+            pages += len(documents)
+            chunks += len(file_chunks)
+    finally:
+        pc_store.embedding = timed_embeddings.embeddings
+
+    total = sum(stages.values())
+    return {
+        "pages": pages,
+        "chunks": chunks,
+        "seconds": total,
+        "pages_per_sec": pages / total if total else 0.0,
+        "chunks_per_sec": chunks / total if total else 0.0,
+        "stage_seconds": stages,
+        "stage_share": {stage: seconds / total if total else 0.0 for stage, seconds in stages.items()},
+    }
+
+
+async def benchmark_upload_flow(pdfs: Dict[str, bytes], pages: int, poll_interval: float, timeout: float) -> Dict[str, Any]:
+    import main
+
+    async with main.app.router.lifespan_context(main.app):
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://ingestion", timeout=timeout) as client:
+            started = time.perf_counter()
+            response = await client.post(
+                "/api/upload",
+                files=[("files", (name, data, "application/pdf")) for name, data in pdfs.items()],
+            )
+            response.raise_for_status()
+            job_id = response.json()["job_id"]
+
+            polls = 0
+            while True:
+                job = (await client.get(f"/api/upload/status/{job_id}")).raise_for_status().json()
+                polls += 1
+                if job["overall_status"] in ("completed", "failed") or time.perf_counter() - started > timeout:
+                    break
+                await asyncio.sleep(poll_interval)
+            elapsed = time.perf_counter() - started
+
+    chunks = sum(f.get("chunks_indexed") or 0 for f in job.get("files", []))
+    return {
+        "status": job["overall_status"],
+        "seconds": elapsed,
+        "polls": polls,
+        "pages": pages,
+        "chunks": chunks,
+        "pages_per_sec": pages / elapsed if elapsed else 0.0,
+        "chunks_per_sec": chunks / elapsed if elapsed else 0.0,
+    }
+
+
+def check_regressions(report: Dict[str, Any], baseline: Dict[str, Any], max_regression: float) -> List[str]:
+    failures = []
+    for section in ("stages", "upload_flow"):
+        for metric in ("pages_per_sec", "chunks_per_sec"):
+            old = baseline.get(section, {}).get(metric)
+            new = report.get(section, {}).get(metric)
+            if old and new is not None and new < old * (1 - max_regression):
+                failures.append(f"{section}.{metric} dropped from {old:.1f} to {new:.1f}")
+    old_rss, new_rss = baseline.get("peak_rss_mb"), report["peak_rss_mb"]
+    if old_rss and new_rss > old_rss * (1 + max_regression):
+        failures.append(f"peak_rss_mb grew from {old_rss:.0f} to {new_rss:.0f}")
+    return failures
+
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+    database_path = os.path.join(tempfile.mkdtemp(prefix="ingestion_"), "ingestion.db")
+    os.environ.update({
+        "OFFLINE_MODE": "true",
+        "DATABASE_URL": f"sqlite:///{database_path}",
+        "OFFLINE_SERVICE_LATENCY_SECONDS": str(args.embedding_latency),
+    })
+
+    started = time.perf_counter()
+    pdfs = synthetic_pdfs(args.files, args.pages, args.words_per_page, args.seed)
+    generation_seconds = time.perf_counter() - started
+    report: Dict[str, Any] = {
+        "config": vars(args),
+        "pdf_megabytes": sum(len(data) for data in pdfs.values()) / 1e6,
+        "generation_seconds": generation_seconds,
+        "stages": await benchmark_stages(pdfs),
+    }
+    if not args.skip_upload_flow:
+        report["upload_flow"] = await benchmark_upload_flow(
+            pdfs, args.files * args.pages, args.poll_interval, args.timeout
+        )
+    report["peak_rss_mb"] = peak_rss_mb()
+    return report
+
+
+def print_report(report: Dict[str, Any]) -> None:
+    stages = report["stages"]
+    print(f"{report['config']['files']} files, {stages['pages']} pages, {stages['chunks']} chunks ({report['pdf_megabytes']:.1f} MB)")
+    print(f"stages:      {stages['pages_per_sec']:.1f} pages/s, {stages['chunks_per_sec']:.1f} chunks/s")
+    for stage, seconds in stages["stage_seconds"].items():
+        print(f"  {stage:<8} {seconds:8.3f}s  {stages['stage_share'][stage]:6.1%}")
+    if "upload_flow" in report:
+        flow = report["upload_flow"]
+        print(
+            f"upload flow: {flow['pages_per_sec']:.1f} pages/s, {flow['chunks_per_sec']:.1f} chunks/s "
+            f"({flow['seconds']:.2f}s, status={flow['status']}, {flow['polls']} polls)"
+        )
+    print(f"peak RSS:    {report['peak_rss_mb']:.0f} MB")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--files", type=int, default=3)
+    parser.add_argument("--pages", type=int, default=30, help="Pages per PDF")
+    parser.add_argument("--words-per-page", type=int, default=400)
+    parser.add_argument("--embedding-latency", type=float, default=0.0, help="Offline embedding latency per call (seconds)")
+    parser.add_argument("--poll-interval", type=float, default=0.2)
+    parser.add_argument("--timeout", type=float, default=600.0)
+    parser.add_argument("--skip-upload-flow", action="store_true", help="Only benchmark the isolated stages")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write the JSON report to this path")
+    parser.add_argument("--baseline", help="Earlier JSON report to compare against")
+    parser.add_argument("--max-regression", type=float, default=0.2, help="Allowed relative slowdown / RSS growth")
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+    print_report(report)
+
+    failures = []
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            failures = check_regressions(report, json.load(f), args.max_regression)
+        report["regressions"] = failures
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"Report written to {args.output}")
+    for failure in failures:
+        print(f"REGRESSION: {failure}")
+    raise SystemExit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,187 @@
+"""Retrieval quality vs. latency evaluation over a labeled fixture corpus.
+
+The fixture (benchmarks/fixtures/retrieval_eval.json) holds documents as lists of page
+texts and questions labeled with their relevant (source, page) pairs. For every
+configuration in the sweep the corpus goes through the ingestion stack (PDF parsing with
+`load_pdf_from_bytes`, `split_documents`, embedding into a fresh vector store) and each
+question is retrieved the way `retrieve_documents` does it. Reported per configuration:
+
+- recall@k: share of a question's relevant pages found in its top_k chunks (mean);
+- MRR: mean reciprocal rank of the first chunk from a relevant page;
+- context tokens: approximate tokens of the formatted context handed to the answer model;
+- query latency (p50/p95) and indexing time.
+
+Runs offline by default (hashing embeddings, see core/offline.py). `--online` uses the
+configured embedding model instead; the index is in-memory either way, so the production
+Pinecone namespace is never touched. With `--baseline` the run fails if the recall@k or
+MRR of a configuration present in both reports dropped by more than `--max-quality-drop`.
+
+Usage:
+    python -m benchmarks.retrieval_eval --chunk-sizes 500,1000,1500 --top-k 3,5,8
+    python -m benchmarks.retrieval_eval --output results/retrieval.json --baseline results/retrieval_main.json
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import time
+from typing import Any, Dict, List, Set, Tuple
+
+FIXTURE_PATH = os.path.join(os.path.dirname(__file__), "fixtures", "retrieval_eval.json")
+
+
+def _parse_list(value: str, cast) -> List:
+    return [cast(item) for item in value.split(",") if item.strip()]
+
+
+def config_name(config: Dict[str, Any]) -> str:
+    return f"chunk={config['chunk_size']} overlap={config['overlap_ratio']:g} k={config['top_k']}"
+
+
+# --- Metrics ---
+def recall_at_k(retrieved: List[Tuple[str, int]], relevant: Set[Tuple[str, int]]) -> float:
+    return len(relevant.intersection(retrieved)) / len(relevant) if relevant else 0.0
+
+
+def reciprocal_rank(retrieved: List[Tuple[str, int]], relevant: Set[Tuple[str, int]]) -> float:
+    for rank, page in enumerate(retrieved, start=1):
+        if page in relevant:
+            return 1.0 / rank
+    return 0.0
+
+
+# --- Pipeline ---
+async def build_index(fixture: Dict[str, Any], chunk_size: int, overlap_ratio: float):
+    """Ingest the fixture corpus into a fresh in-memory store; returns (store, chunks, seconds)."""
+    from langchain_core.vectorstores import InMemoryVectorStore
+    from benchmarks.ingestion import make_pdf
+    from core.embeddings import get_embedding_model
+    from core.loader import load_pdf_from_bytes
+    from core.splitter import split_documents
+
+    started = time.perf_counter()
+    chunks = []
+    for document in fixture["documents"]:
+        pages = await load_pdf_from_bytes(make_pdf(document["pages"]), document["source"])
+        chunks.extend(split_documents(pages, chunk_size=chunk_size, overlap_ratio=overlap_ratio))
+    store = InMemoryVectorStore(embedding=get_embedding_model())
+    await store.aadd_documents(chunks)
+    return store, len(chunks), time.perf_counter() - started
+
+
+def evaluate(store, questions: List[Dict[str, Any]], top_k: int) -> Dict[str, Any]:
+    from langchain_core.messages import ToolMessage
+    from langchain_core.messages.utils import count_tokens_approximately
+    from utils.helper import format_docs
+    from workflow.instrumentation import percentile
+
+    recalls, reciprocal_ranks, context_tokens, latencies, misses = [], [], [], [], []
+    for item in questions:
+        relevant = {(source, int(page)) for source, page in item["relevant"]}
+        started = time.perf_counter()
+        results = store.similarity_search(item["question"], k=top_k)
+        context = format_docs(results)
+        latencies.append(time.perf_counter() - started)
+
+        retrieved = [(doc.metadata["source"], int(doc.metadata["page"])) for doc in results]
+        recalls.append(recall_at_k(retrieved, relevant))
+        reciprocal_ranks.append(reciprocal_rank(retrieved, relevant))
+        context_tokens.append(count_tokens_approximately([ToolMessage(content=context, tool_call_id="eval")]))
+        if recalls[-1] < 1.0:
+            misses.append(item["question"])
+
+    latencies.sort()
+    n = len(questions)
+    return {
+        "recall_at_k": sum(recalls) / n,
+        "mrr": sum(reciprocal_ranks) / n,
+        "context_tokens_mean": sum(context_tokens) / n,
+        "context_tokens_max": max(context_tokens),
+        "latency_p50_ms": percentile(latencies, 50) * 1000,
+        "latency_p95_ms": percentile(latencies, 95) * 1000,
+        "incomplete_recall": misses,
+    }
+
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+    if not args.online:
+        os.environ.update({"OFFLINE_MODE": "true", "OFFLINE_SERVICE_LATENCY_SECONDS": "0"})
+    with open(args.fixture, encoding="utf-8") as f:
+        fixture = json.load(f)
+
+    results = []
+    for chunk_size, overlap_ratio in itertools.product(args.chunk_sizes, args.overlaps):
+        store, n_chunks, index_seconds = await build_index(fixture, chunk_size, overlap_ratio)
+        for top_k in args.top_k:
+            config = {"chunk_size": chunk_size, "overlap_ratio": overlap_ratio, "top_k": top_k}
+            results.append({
+                "name": config_name(config),
+                "config": config,
+                "chunks": n_chunks,
+                "index_seconds": index_seconds,
+                **evaluate(store, fixture["questions"], top_k),
+            })
+    return {
+        "fixture": args.fixture,
+        "questions": len(fixture["questions"]),
+        "embeddings": "configured" if args.online else "offline",
+        "results": results,
+    }
+
+
+def check_regressions(report: Dict[str, Any], baseline: Dict[str, Any], max_drop: float) -> List[str]:
+    previous = {result["name"]: result for result in baseline.get("results", [])}
+    failures = []
+    for result in report["results"]:
+        old = previous.get(result["name"])
+        if old is None:
+            continue
+        for metric in ("recall_at_k", "mrr"):
+            if result[metric] < old[metric] - max_drop:
+                failures.append(f"{result['name']}: {metric} dropped from {old[metric]:.3f} to {result[metric]:.3f}")
+    return failures
+
+
+def print_report(report: Dict[str, Any]) -> None:
+    print(f"{report['questions']} questions, {report['embeddings']} embeddings")
+    print(f"{'configuration':<32}{'chunks':>7}{'recall@k':>10}{'MRR':>7}{'ctx tok':>9}{'p50 ms':>8}{'p95 ms':>8}")
+    for result in report["results"]:
+        print(
+            f"{result['name']:<32}{result['chunks']:>7}{result['recall_at_k']:>10.3f}{result['mrr']:>7.3f}"
+            f"{result['context_tokens_mean']:>9.0f}{result['latency_p50_ms']:>8.2f}{result['latency_p95_ms']:>8.2f}"
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--fixture", default=FIXTURE_PATH, help="Labeled corpus (JSON)")
+    parser.add_argument("--chunk-sizes", type=lambda v: _parse_list(v, int), default=[500, 1000])
+    parser.add_argument("--overlaps", type=lambda v: _parse_list(v, float), default=[0.15], help="Chunk overlap ratios")
+    parser.add_argument("--top-k", type=lambda v: _parse_list(v, int), default=[3, 5])
+    parser.add_argument("--online", action="store_true", help="Use the configured embedding model instead of the offline one")
+    parser.add_argument("--output", help="Write the JSON report to this path")
+    parser.add_argument("--baseline", help="Earlier JSON report to compare against")
+    parser.add_argument("--max-quality-drop", type=float, default=0.02, help="Allowed absolute drop in recall@k / MRR")
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+    print_report(report)
+
+    failures = []
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            failures = check_regressions(report, json.load(f), args.max_quality_drop)
+        report["regressions"] = failures
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f"Report written to {args.output}")
+    for failure in failures:
+        print(f"REGRESSION: {failure}")
+    raise SystemExit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
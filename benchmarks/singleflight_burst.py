@@ -0,0 +1,164 @@
+"""Bursty identical traffic against a slow fake backend, with and without single-flight coalescing.
+
+Simulates many users asking the same question within a short window: every request
+runs a retrieval (sync, in worker threads like the graph nodes) followed by a
+scoring call (async). Reports backend calls and latency for both modes, then checks
+the error-propagation and cancellation semantics of SingleFlight.
+
+Usage:
+    python -m benchmarks.singleflight_burst --users 50 --distinct-questions 3
+"""
+import argparse
+import asyncio
+import random
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from core.singleflight import SingleFlight
+
+
+class FakeBackend:
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def _count(self) -> None:
+        with self._lock:
+            self.calls += 1
+
+    def retrieve(self, query: str) -> str:
+        self._count()
+        time.sleep(self.latency)
+        return f"documents for {query}"
+
+    async def score(self, query: str) -> int:
+        self._count()
+        await asyncio.sleep(self.latency)
+        return len(query) % 10
+
+
+async def burst(args: argparse.Namespace, coalesce: bool) -> dict:
+    retrieval = FakeBackend(args.latency)
+    scoring = FakeBackend(args.latency)
+    retrieval_flights = SingleFlight("retrieval")
+    scoring_flights = SingleFlight("scoring")
+    questions = [f"¿Qué cambia con la nueva política {i}?" for i in range(args.distinct_questions)]
+    executor = ThreadPoolExecutor(max_workers=args.users)
+    loop = asyncio.get_running_loop()
+    latencies = []
+
+    def retrieve(query: str) -> str:
+        if coalesce:
+            return retrieval_flights.do(query, lambda: retrieval.retrieve(query))
+        return retrieval.retrieve(query)
+
+    async def request(query: str) -> None:
+        await asyncio.sleep(random.uniform(0, args.spread))
+        started = time.perf_counter()
+        await loop.run_in_executor(executor, retrieve, query)
+        if coalesce:
+            await scoring_flights.ado(query, lambda: scoring.score(query))
+        else:
+            await scoring.score(query)
+        latencies.append(time.perf_counter() - started)
+
+    await asyncio.gather(*(request(random.choice(questions)) for _ in range(args.users)))
+    executor.shutdown()
+    return {
+        "retrieval_calls": retrieval.calls,
+        "scoring_calls": scoring.calls,
+        "p50": statistics.median(latencies),
+        "max": max(latencies),
+    }
+
+
+async def check_semantics() -> list:
+    failures = []
+    flights = SingleFlight("semantics")
+
+    # Errors reach every caller of the flight, and are not remembered afterwards
+    calls = 0
+
+    async def failing():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.05)
+        raise ValueError("backend down")
+
+    results = await asyncio.gather(*(flights.ado("k", failing) for _ in range(5)), return_exceptions=True)
+    if calls != 1 or not all(isinstance(r, ValueError) for r in results):
+        failures.append("error was not shared by all callers of a single flight")
+    results = await asyncio.gather(flights.ado("k", failing), return_exceptions=True)
+    if calls != 2:
+        failures.append("a failed flight was reused by a later call")
+
+    # A cancelled caller doesn't cancel the call the others are waiting on
+    async def slow():
+        await asyncio.sleep(0.1)
+        return "ok"
+
+    first = asyncio.create_task(flights.ado("s", slow))
+    second = asyncio.create_task(flights.ado("s", slow))
+    await asyncio.sleep(0.01)
+    first.cancel()
+    if await second != "ok":
+        failures.append("cancelling one caller broke the shared call")
+
+    # ... but the call is cancelled once nobody waits for it anymore
+    started = asyncio.Event()
+    cancelled = asyncio.Event()
+
+    async def abandoned():
+        started.set()
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+
+    only = asyncio.create_task(flights.ado("a", abandoned))
+    await started.wait()
+    only.cancel()
+    try:
+        await asyncio.wait_for(cancelled.wait(), 1)
+    except asyncio.TimeoutError:
+        failures.append("abandoned call kept running")
+    if flights.in_flight:
+        failures.append("finished flights were not cleaned up")
+    return failures
+
+
+async def run(args: argparse.Namespace) -> int:
+    random.seed(args.seed)
+    baseline = await burst(args, coalesce=False)
+    random.seed(args.seed)
+    coalesced = await burst(args, coalesce=True)
+    for name, result in (("without coalescing", baseline), ("with coalescing", coalesced)):
+        print(
+            f"{name:<19} retrieval calls={result['retrieval_calls']:<4} scoring calls={result['scoring_calls']:<4} "
+            f"p50={result['p50']:.3f}s max={result['max']:.3f}s"
+        )
+
+    failures = await check_semantics()
+    if coalesced["retrieval_calls"] >= baseline["retrieval_calls"]:
+        failures.append("identical retrievals were not coalesced")
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    return 1 if failures else 0
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--distinct-questions", type=int, default=3)
+    parser.add_argument("--latency", type=float, default=0.3, help="Backend latency in seconds")
+    parser.add_argument("--spread", type=float, default=0.2, help="Window (seconds) the burst arrives in")
+    parser.add_argument("--seed", type=int, default=0)
+    raise SystemExit(asyncio.run(run(parser.parse_args())))
+
+
+if __name__ == "__main__":
+    main()
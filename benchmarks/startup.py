@@ -0,0 +1,155 @@
+"""Startup cost: import time of the app, warm-up time and first-request latency.
+
+- import: `python -X importtime -c "import main"` in fresh interpreters. Reports the
+  total (best of `--repeat`) and the top-level packages that cost the most. Exits with
+  status 1 if it exceeds `--max-import-seconds`.
+- first request: a fresh process per mode serves `--turns` chat turns in-process. With
+  `warm` it waits for `/api/ready` first; with `cold` the warm-up is disabled, so the first
+  turn creates the clients and compiles the graph itself. It reports the time to ready,
+  the first turn's latency and the median of the following turns (steady state).
+
+Offline mode by default (see core/offline.py), where client setup is local; pass
+`--online` to use the configured services, where the cold first turn also pays for the
+connections.
+
+Usage:
+    python -m benchmarks.startup
+    python -m benchmarks.startup --repeat 5 --max-import-seconds 2.5 --output results/startup.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from typing import Any, Dict, List
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def child_env(args: argparse.Namespace, **extra: str) -> Dict[str, str]:
+    env = {**os.environ, "PYTHONPATH": ROOT, **extra}
+    if not args.online:
+        env["OFFLINE_MODE"] = "true"
+        env.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='startup_'), 'startup.db')}")
+    return env
+
+
+# --- Import time ---
+def parse_importtime(stderr: str) -> Dict[str, Any]:
+    """Total import time of `main` and self time per top-level package, in seconds."""
+    total, packages = 0.0, defaultdict(float)
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = (part.strip() for part in line[len("import time:"):].split("|"))
+        packages[name.split(".")[0]] += int(self_us) / 1e6
+        if name == "main":
+            total = int(cumulative_us) / 1e6
+    return {"seconds": total, "packages": dict(packages)}
+
+
+def measure_imports(args: argparse.Namespace) -> Dict[str, Any]:
+    runs = []
+    for _ in range(args.repeat):
+        completed = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", "import main"],
+            cwd=ROOT, env=child_env(args), capture_output=True, text=True, check=True,
+        )
+        runs.append(parse_importtime(completed.stderr))
+    best = min(runs, key=lambda run: run["seconds"])
+    top = sorted(best["packages"].items(), key=lambda item: item[1], reverse=True)[:args.top]
+    return {"seconds": best["seconds"], "runs": [run["seconds"] for run in runs], "top_packages": dict(top)}
+
+
+# --- First request ---
+async def serve_turns(args: argparse.Namespace, warm: bool) -> Dict[str, Any]:
+    import httpx
+    import main
+    from database.database import async_engine
+
+    started = time.perf_counter()
+    latencies: List[float] = []
+    async with main.app.router.lifespan_context(main.app):
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://startup", timeout=120) as client:
+            while warm and (await client.get("/api/ready")).status_code != 200:
+                await asyncio.sleep(0.01)
+            ready_seconds = time.perf_counter() - started
+            (await client.post("/api/users", json={"user_id": "startup"})).raise_for_status()
+            thread = (await client.post("/api/threads", json={"user_id": "startup"})).raise_for_status().json()
+            for turn in range(args.turns):
+                turn_started = time.perf_counter()
+                response = await client.post(
+                    f"/api/threads/{thread['id']}/messages",
+                    json={"user_id": "startup", "content": f"¿Cuántos días de vacaciones me corresponden? ({turn})"},
+                )
+                response.raise_for_status()
+                latencies.append(time.perf_counter() - turn_started)
+    await async_engine.dispose()
+    return {
+        "ready_seconds": ready_seconds,
+        "first_turn_ms": latencies[0] * 1000,
+        "steady_turn_ms": statistics.median(latencies[1:]) * 1000 if len(latencies) > 1 else None,
+    }
+
+
+def measure_first_request(args: argparse.Namespace, mode: str) -> Dict[str, Any]:
+    completed = subprocess.run(
+        [sys.executable, "-m", "benchmarks.startup", "--child", mode, "--turns", str(args.turns)]
+        + (["--online"] if args.online else []),
+        cwd=ROOT, env=child_env(args, WARMUP_ENABLED=str(mode == "warm").lower()),
+        capture_output=True, text=True, check=True,
+    )
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def print_report(report: Dict[str, Any]) -> None:
+    imports = report["import"]
+    print(f"import main: {imports['seconds']:.2f}s (best of {len(imports['runs'])})")
+    for package, seconds in imports["top_packages"].items():
+        print(f"  {package:<28}{seconds * 1000:>8.0f}ms")
+    print(f"{'mode':<8}{'ready':>9}{'first turn':>13}{'steady turn':>14}")
+    for mode, result in report["first_request"].items():
+        steady = f"{result['steady_turn_ms']:>12.0f}ms" if result["steady_turn_ms"] is not None else f"{'-':>14}"
+        print(f"{mode:<8}{result['ready_seconds']:>8.2f}s{result['first_turn_ms']:>11.0f}ms{steady}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=3, help="Fresh interpreters for the import measurement")
+    parser.add_argument("--top", type=int, default=10, help="Packages listed in the import breakdown")
+    parser.add_argument("--turns", type=int, default=6, help="Chat turns per first-request run")
+    parser.add_argument("--online", action="store_true", help="Use the configured services instead of offline mode")
+    parser.add_argument("--max-import-seconds", type=float, help="Fail if importing the app takes longer")
+    parser.add_argument("--output", help="Write the JSON report to this path")
+    parser.add_argument("--child", choices=("warm", "cold"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(asyncio.run(serve_turns(args, warm=args.child == "warm"))))
+        return
+
+    report = {
+        "config": vars(args),
+        "import": measure_imports(args),
+        "first_request": {mode: measure_first_request(args, mode) for mode in ("cold", "warm")},
+    }
+    print_report(report)
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"Report written to {args.output}")
+    over_budget = args.max_import_seconds is not None and report["import"]["seconds"] > args.max_import_seconds
+    if over_budget:
+        print(f"OVER BUDGET: importing the app took {report['import']['seconds']:.2f}s (budget {args.max_import_seconds}s)")
+    raise SystemExit(1 if over_budget else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+"""Admission control: bounds the requests that run (and wait to run) an expensive handler.
+
+When the model slows down, chat turns would otherwise pile up without bound, each one
+holding graph state and, later, database connections. Instead, at most
+`max_concurrency` requests run. Up to `max_queue` more wait for a slot, and the rest are
+shed, to be answered with 429 and a Retry-After header:
+
+- the queue, or the user's share of it (`max_queued_per_user`), is full;
+- the expected wait, from the queue ahead and the recent service time, exceeds
+  `queue_timeout` (no point in holding a request that will time out anyway);
+- the request waited `queue_timeout` without getting a slot.
+
+Waiting requests are queued per user and slots are handed out round-robin across users.
+A user with many requests in the queue gets one slot per round, so others don't wait
+behind all of them.
+"""
+import asyncio
+import math
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import AsyncIterator, Deque, Optional
+
+from core.config import settings
+from core.metrics import ADMISSION_IN_FLIGHT, ADMISSION_QUEUE_DEPTH, ADMISSION_REJECTED, ADMISSION_WAIT
+
+# Weight of the latest request in the moving average of the service time
+_SERVICE_TIME_ALPHA = 0.2
+
+
+class AdmissionRejected(Exception):
+    """Raised when a request is shed; `retry_after` is the suggested delay in seconds."""
+
+    def __init__(self, reason: str, retry_after: int):
+        super().__init__(f"Request rejected ({reason}), retry after {retry_after}s.")
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+@dataclass
+class _Ticket:
+    user: str
+    future: asyncio.Future
+
+
+class AdmissionController:
+    """Concurrency limit with a bounded, per-user fair wait queue (see module docstring).
+
+    Lives on one event loop: `admit` is only called from async request handlers.
+    """
+
+    def __init__(self, name: str, *, max_concurrency: int, max_queue: int, max_queued_per_user: int, queue_timeout: float):
+        self.name = name
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.max_queued_per_user = max_queued_per_user
+        self.queue_timeout = queue_timeout
+        self.in_flight = 0
+        self.queued = 0
+        self.service_seconds: Optional[float] = None  # Moving average, unknown until a request completes
+        self._queues: "OrderedDict[str, Deque[_Ticket]]" = OrderedDict()  # Users in round-robin order
+
+    # --- Queue management ---
+    def _update_gauges(self) -> None:
+        ADMISSION_IN_FLIGHT.labels(controller=self.name).set(self.in_flight)
+        ADMISSION_QUEUE_DEPTH.labels(controller=self.name).set(self.queued)
+
+    def _dispatch(self) -> None:
+        """Hand free slots to the head of the next user's queue, in round-robin order."""
+        while self.in_flight < self.max_concurrency and self._queues:
+            user, queue = self._queues.popitem(last=False)
+            ticket = queue.popleft()
+            if queue:
+                self._queues[user] = queue  # Back of the round
+            self.queued -= 1
+            self.in_flight += 1
+            ticket.future.set_result(None)
+        self._update_gauges()
+
+    def _remove(self, ticket: _Ticket) -> None:
+        queue = self._queues.get(ticket.user)
+        if queue is not None and ticket in queue:
+            queue.remove(ticket)
+            self.queued -= 1
+            if not queue:
+                del self._queues[ticket.user]
+        self._update_gauges()
+
+    def _release(self, service_seconds: float) -> None:
+        self.in_flight -= 1
+        if self.service_seconds is None:
+            self.service_seconds = service_seconds
+        else:
+            self.service_seconds += _SERVICE_TIME_ALPHA * (service_seconds - self.service_seconds)
+        self._dispatch()
+
+    def expected_wait(self, position: int) -> float:
+        """Seconds until the `position`-th request in the queue gets a slot, at the recent service rate."""
+        if self.service_seconds is None:
+            return 0.0
+        return position * self.service_seconds / self.max_concurrency
+
+    def _position(self, user: str) -> int:
+        """Where a new request of `user` lands with round-robin service: it goes after the
+        requests the user already has queued, and each other user gets as many turns first."""
+        own = len(self._queues.get(user, ()))
+        return 1 + sum(min(len(queue), own + 1) if other != user else own for other, queue in self._queues.items())
+
+    def _reject(self, reason: str) -> AdmissionRejected:
+        ADMISSION_REJECTED.labels(controller=self.name, reason=reason).inc()
+        # By then the queue ahead has drained at the recent service rate
+        retry_after = max(1, math.ceil(self.expected_wait(self.queued + 1)))
+        return AdmissionRejected(reason, retry_after)
+
+    # --- Admission ---
+    @asynccontextmanager
+    async def admit(self, user: str) -> AsyncIterator[None]:
+        """Hold a slot for the duration of the block; raises AdmissionRejected if the request is shed."""
+        queued_at = time.perf_counter()
+        if self.in_flight < self.max_concurrency and not self._queues:
+            self.in_flight += 1
+            self._update_gauges()
+        else:
+            if self.queued >= self.max_queue:
+                raise self._reject("queue_full")
+            if len(self._queues.get(user, ())) >= self.max_queued_per_user:
+                raise self._reject("user_queue_full")
+            if self.expected_wait(self._position(user)) > self.queue_timeout:
+                raise self._reject("expected_wait")
+
+            ticket = _Ticket(user, asyncio.get_running_loop().create_future())
+            self._queues.setdefault(user, deque()).append(ticket)
+            self.queued += 1
+            self._update_gauges()
+            try:
+                await asyncio.wait({ticket.future}, timeout=self.queue_timeout)
+            except asyncio.CancelledError:
+                # Client gone: give back the slot if it was granted in the meantime
+                if ticket.future.done():
+                    self._release(time.perf_counter() - queued_at)
+                else:
+                    self._remove(ticket)
+                raise
+            if not ticket.future.done():
+                self._remove(ticket)
+                raise self._reject("deadline")
+
+        started = time.perf_counter()
+        ADMISSION_WAIT.labels(controller=self.name).observe(started - queued_at)
+        try:
+            yield
+        finally:
+            self._release(time.perf_counter() - started)
+
+
+chat_admission = AdmissionController(
+    "chat",
+    max_concurrency=settings.CHAT_MAX_CONCURRENCY,
+    max_queue=settings.CHAT_MAX_QUEUE,
+    max_queued_per_user=settings.CHAT_MAX_QUEUED_PER_USER,
+    queue_timeout=settings.CHAT_QUEUE_TIMEOUT_SECONDS,
+)
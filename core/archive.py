@@ -0,0 +1,119 @@
+"""Zip and tar archives of documents, read one member at a time.
+
+Only the archive's index is read up front. A document is decompressed into memory
+when it is read, so nothing is extracted to disk, and only the documents being
+processed are held in memory. Tar members are read in archive order (see
+`DocumentArchive.sequential`): a compressed tar is one stream, and going back in it
+decompresses it again from the start.
+"""
+import posixpath
+import tarfile
+import threading
+import zipfile
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+from core.loader import is_supported_document
+
+ARCHIVE_EXTENSIONS = (".zip", ".tar", ".tar.gz", ".tgz", ".tar.bz2", ".tbz2", ".tar.xz", ".txz")
+
+
+def is_archive(filename: str) -> bool:
+    return filename.lower().endswith(ARCHIVE_EXTENSIONS)
+
+
+def is_hidden_path(name: str) -> bool:
+    """Metadata that archivers and editors leave next to the documents (e.g. __MACOSX/, .DS_Store, ~$lock files).
+
+    "." and ".." are not hidden: `tar -C docs .` names its members "./a.pdf".
+    """
+    parts = posixpath.normpath(name.replace("\\", "/")).split("/")
+    return any(part.startswith((".", "__MACOSX", "~$")) for part in parts if part not in ("", ".", ".."))
+
+
+@dataclass
+class ArchiveMember:
+    name: str  # Path inside the archive, also the file's name in the upload job
+    size: int  # Uncompressed bytes
+
+
+class DocumentArchive:
+    """The documents of a zip or tar file on disk.
+
+    `members` lists the files that have a loader (see core/loader.py). `skipped` lists
+    other formats, hidden files, duplicate names and files over `max_member_bytes`.
+    Directories and links are ignored. A zip member never yields more than its
+    declared size, which guards against zip bombs. Reads are serialized because the
+    archive file has a single read position. Call `read` from a worker thread.
+
+    `sequential` is set for tar archives, whose `members` should be read in the order
+    listed. Reading one decompresses the stream up to it: the members before it that are
+    still to be read are decompressed on the way and kept in memory until they are read,
+    so the stream is never rewound.
+    """
+
+    def __init__(self, path: str, *, max_member_bytes: int):
+        self.path = path
+        self._lock = threading.Lock()
+        self._zip: Optional[zipfile.ZipFile] = None
+        self._tar: Optional[tarfile.TarFile] = None
+        self._tar_members: Dict[str, tarfile.TarInfo] = {}
+        self._tar_next = 0  # Index in `members` of the first member the stream hasn't passed
+        self._read_ahead: Dict[str, bytes] = {}  # Members passed before they were read
+
+        if zipfile.is_zipfile(path):
+            self._zip = zipfile.ZipFile(path)
+            entries = [(info.filename, info.file_size) for info in self._zip.infolist() if not info.is_dir()]
+        else:
+            # Raises tarfile.ReadError if the file is neither a zip nor a (compressed) tar
+            self._tar = tarfile.open(path, "r:*")
+            entries = []
+            for info in self._tar.getmembers():
+                if info.isfile():
+                    self._tar_members.setdefault(info.name, info)
+                    entries.append((info.name, info.size))
+
+        self.members: List[ArchiveMember] = []
+        self.skipped: List[str] = []
+        seen = set()
+        for name, size in entries:
+            if name in seen or is_hidden_path(name) or not is_supported_document(name) or size > max_member_bytes:
+                self.skipped.append(name)
+                continue
+            seen.add(name)
+            self.members.append(ArchiveMember(name=name, size=size))
+        self._positions = {member.name: position for position, member in enumerate(self.members)}
+
+    @property
+    def sequential(self) -> bool:
+        return self._tar is not None
+
+    def read(self, name: str) -> bytes:
+        with self._lock:
+            if self._zip is not None:
+                return self._zip.read(name)
+            if name in self._read_ahead:
+                return self._read_ahead.pop(name)
+            position = self._positions[name]
+            for member in self.members[self._tar_next:position]:
+                self._read_ahead[member.name] = self._extract(member.name)
+            # A member read twice is extracted again, rewinding the stream
+            self._tar_next = max(self._tar_next, position + 1)
+            return self._extract(name)
+
+    def _extract(self, name: str) -> bytes:
+        return self._tar.extractfile(self._tar_members[name]).read()
+
+    def close(self) -> None:
+        if self._zip is not None:
+            self._zip.close()
+        if self._tar is not None:
+            self._tar.close()
+        self._read_ahead.clear()
+
+    def __enter__(self) -> "DocumentArchive":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
@@ -0,0 +1,112 @@
+"""Boilerplate stripping: headers, footers, disclaimers and page numbers repeated on every page.
+
+Corporate PDFs repeat the same lines on every page. Split verbatim, they add chunks,
+embedding cost and index size, and their text competes with the content at retrieval.
+`strip_boilerplate` looks at all the pages of one document before it is split and
+removes the header and footer lines that repeat across them. Runs in the ingestion
+worker (see core/docs_processing.py), so it must stay pure Python over plain data.
+"""
+import math
+import re
+from collections import Counter
+from typing import Dict, FrozenSet, List, Optional, Set, Tuple
+
+from langchain_core.documents import Document
+
+_DIGITS = re.compile(r"\d+")
+_PUNCTUATION = re.compile(r"[^\w#]+")
+
+
+def _line_key(line: str) -> str:
+    """A line as compared across pages: case, spacing, punctuation and numbers (page numbers, dates) ignored."""
+    return " ".join(_PUNCTUATION.sub(" ", _DIGITS.sub("#", line.casefold())).split())
+
+
+def _trigrams(key: str) -> FrozenSet[str]:
+    return frozenset(key[i:i + 3] for i in range(max(1, len(key) - 2)))
+
+
+def _similar(a: Tuple[str, FrozenSet[str]], b: Tuple[str, FrozenSet[str]], similarity: float) -> bool:
+    (key_a, trigrams_a), (key_b, trigrams_b) = a, b
+    # Lengths this far apart can't reach the similarity; skips most comparisons
+    if min(len(key_a), len(key_b)) < similarity * max(len(key_a), len(key_b)):
+        return False
+    return len(trigrams_a & trigrams_b) >= similarity * len(trigrams_a | trigrams_b)
+
+
+def _edge_lines(lines: List[str], edge_lines: int) -> Dict[int, str]:
+    """The header and footer lines of a page: its first and last `edge_lines` non-empty lines,
+    by index, each with the side it is on. A short page is split in half between the two."""
+    non_empty = [index for index, line in enumerate(lines) if line.strip()]
+    half = len(non_empty) // 2
+    edges = {index: "footer" for index in non_empty[half:][-edge_lines:]}
+    edges.update((index, "header") for index in non_empty[:min(edge_lines, half)])
+    return edges
+
+
+def strip_boilerplate(
+    pages: List[Document],
+    *,
+    min_pages: int,
+    min_page_ratio: float,
+    edge_lines: int,
+    similarity: float,
+) -> Optional[List[Document]]:
+    """
+    Removes the header and footer lines that repeat across the pages of a document. Only
+    the first and last `edge_lines` non-empty lines of each page are considered. Such a
+    line is boilerplate if it appears on the same side (top or bottom) of at least
+    `min_page_ratio` of the pages, ignoring numbers, case and punctuation, so "Página 3 de 12" matches on every
+    page. It is also boilerplate if near-duplicates of it do (character trigram Jaccard >=
+    `similarity`), e.g. a footer whose revision date is spelled out. The body of a page is
+    never touched: the same line in the body is content, and so are its numbers.
+    Documents shorter than `min_pages` are left as they are. Returns new pages without
+    those lines, or None if there is nothing to strip.
+    """
+    if len(pages) < min_pages:
+        return None
+    page_lines = [page.page_content.split("\n") for page in pages]
+    # Header/footer line index -> (side, key), per page: a line only matches lines on the same side
+    page_edges: List[Dict[int, Tuple[str, str]]] = [
+        {index: (side, _line_key(lines[index])) for index, side in _edge_lines(lines, edge_lines).items()}
+        for lines in page_lines
+    ]
+    min_count = max(2, math.ceil(min_page_ratio * len(pages)))
+
+    # Repeated edge lines, counted once per page
+    pages_per_key = Counter(key for edges in page_edges for key in set(edges.values()) if key[1])
+    boilerplate: Set[Tuple[str, str]] = {key for key, count in pages_per_key.items() if count >= min_count}
+
+    # Near-duplicate edge lines: group the others with a similar earlier one
+    groups: List[Tuple[str, Tuple[str, FrozenSet[str]], Set[int]]] = []  # side, first line of the group, its pages
+    group_of: Dict[Tuple[str, str], int] = {}
+    for page_number, edges in enumerate(page_edges):
+        for side_key in edges.values():
+            side, key = side_key
+            if not key or side_key in boilerplate:
+                continue
+            if side_key not in group_of:
+                line = (key, _trigrams(key))
+                group_of[side_key] = next(
+                    (
+                        index for index, (group_side, first, _) in enumerate(groups)
+                        if group_side == side and _similar(line, first, similarity)
+                    ),
+                    len(groups),
+                )
+                if group_of[side_key] == len(groups):
+                    groups.append((side, line, set()))
+            groups[group_of[side_key]][2].add(page_number)
+    boilerplate.update(side_key for side_key, index in group_of.items() if len(groups[index][2]) >= min_count)
+
+    if not boilerplate:
+        return None
+    return [
+        Document(
+            page_content="\n".join(
+                line for index, line in enumerate(lines) if edges.get(index) not in boilerplate
+            ),
+            metadata=dict(page.metadata),
+        )
+        for page, lines, edges in zip(pages, page_lines, page_edges)
+    ]
@@ -1,6 +1,7 @@
 from pathlib import Path
+from typing import Optional
 
-from pydantic import Field
+from pydantic import Field, model_validator
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 
@@ -13,25 +14,50 @@ class Settings(BaseSettings):
     APP_VERSION: str = "0.1.0"
     ALLOWED_ORIGINS: list = ["*"]
     
+    # --- Offline Mode (deterministic local stand-ins for every external service, see core/offline.py) ---
+    OFFLINE_MODE: bool = False
+    OFFLINE_DATABASE_URL: str = "sqlite:///./rag_offline.db"  # Used when DATABASE_URL is not set
+    OFFLINE_LLM_LATENCY_SECONDS: float = 0.0
+    OFFLINE_SERVICE_LATENCY_SECONDS: float = 0.0  # Embeddings and memory calls
+    OFFLINE_TOOL_CALL_PROBABILITY: float = 0.8  # Share of user messages the fake router retrieves for
+
     # --- Database Configuration ---
-    DATABASE_URL: str
+    DATABASE_URL: Optional[str] = None
     DB_CONNECT_ARGS: dict = {"sslmode": "require"}
+    # Async pool (request handlers). Sessions give their connection back before the graph runs,
+    # so connections are only held for the duration of the queries of a request.
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 20
+    DB_POOL_TIMEOUT_SECONDS: float = 10.0
+    # Sync pool (worker threads: LLM cache, sync checkpointer API)
+    DB_SYNC_POOL_SIZE: int = 5
+    DB_SYNC_MAX_OVERFLOW: int = 10
+    # SQLite has a single writer: more connections only retry each other's write locks, so
+    # its async pool is capped (no overflow). Runs in WAL mode, where readers don't block the writer.
+    SQLITE_POOL_SIZE: int = 2
+    SQLITE_BUSY_TIMEOUT_SECONDS: float = 30.0  # Wait for another connection's write lock before "database is locked"
+    # Keyset pagination of the thread and message lists
+    PAGE_SIZE_DEFAULT: int = 50
+    PAGE_SIZE_MAX: int = 200
+    THREAD_PREVIEW_CHARS: int = 120
     
     # --- Mem0 Configuration ---
-    MEM0_API_KEY: str
+    MEM0_API_KEY: Optional[str] = None
 
     # --- Google Models Configuration ---
-    GOOGLE_API_KEY: str
+    GOOGLE_API_KEY: Optional[str] = None
     PRIMARY_MODEL: str = "gemini-2.5-flash-preview-05-20"
 
     SUMMARY_MODEL: str = "gemini-2.0-flash"
     REWRITE_QUERY_MODEL: str = "gemini-2.0-flash"
     SCORE_DOCUMENTS_MODEL: str = "gemini-2.0-flash"
     THREAD_TITLE_GENERATOR_MODEL: str = "gemini-2.0-flash-lite"
+    TITLE_BATCH_SIZE: int = 8
+    TITLE_BATCH_WAIT_SECONDS: float = 0.5
 
     # --- Pinecone Configuration ---
-    PINECONE_API_KEY: str
-    PINECONE_INDEX_NAME: str
+    PINECONE_API_KEY: Optional[str] = None
+    PINECONE_INDEX_NAME: Optional[str] = None
     NAMESPACE: str = "rag"
 
     # --- Agents Configuration ---
@@ -40,13 +66,95 @@ class Settings(BaseSettings):
     MAX_TOKENS : int = 600
     MAX_RETRIEVAL_LOOP_COUNT: int = 2
     SCORE_THRESHOLD: int = 6
+    CHECKPOINTS_TO_KEEP: int = 3
+    SPECULATIVE_RETRIEVAL: bool = True
+    SPECULATION_SIMILARITY_THRESHOLD: float = 0.5
+
+    # --- LLM Scheduler Configuration ---
+    LLM_MAX_CONCURRENCY: int = 16
+    LLM_TOKENS_PER_MINUTE: int = 1_000_000
+    LLM_MODEL_QUOTAS: dict = {}  # e.g. {"gemini-2.0-flash": {"max_concurrency": 8, "tokens_per_minute": 400000}}
+    LLM_QUEUE_TIMEOUT_SECONDS: dict = {"answer": 60, "router": 45, "auxiliary": 30, "title": 120, "batch": 300}
+    LLM_MAX_RATE_LIMIT_RETRIES: int = 3
+
+    # --- Chat Admission Control (POST /api/threads/{id}/messages, see core/admission.py) ---
+    CHAT_MAX_CONCURRENCY: int = 16  # Turns running the graph at the same time
+    CHAT_MAX_QUEUE: int = 64  # Turns waiting for a slot; more are answered with 429
+    CHAT_MAX_QUEUED_PER_USER: int = 4
+    CHAT_QUEUE_TIMEOUT_SECONDS: float = 20.0  # A turn that can't start within this is answered with 429
+
+    # --- LLM Cache Configuration ---
+    LLM_CACHE_TTL_SECONDS: int = 7 * 24 * 3600
+    LLM_CACHE_MAX_ENTRIES: int = 50_000
+
+    # --- Upload Processing ---
+    UPLOAD_JOB_CONCURRENCY: int = 4  # Files of one job indexed at the same time
+    UPLOAD_GLOBAL_CONCURRENCY: int = 8  # Files indexed at the same time across all jobs of the process
+    UPLOAD_JOB_FILES_IN_FLIGHT: int = 64  # With EMBEDDING_BATCHING: parsed files of one job waiting on embeddings (bounds memory)
+
+    # --- Bulk Ingestion (POST /api/upload/archive, ingest.py) ---
+    INGEST_PROCESS_WORKERS: int = 0  # Processes that parse and split documents; 0 = worker threads (see core/process_pool.py)
+    INGEST_MAX_FILE_BYTES: int = 100 * 1024 * 1024  # Larger archive members are skipped (uncompressed size)
+
+    # --- Ingestion Cleanup (core/boilerplate.py, core/dedup.py) ---
+    INGEST_STRIP_BOILERPLATE: bool = True
+    BOILERPLATE_MIN_PAGES: int = 3  # Shorter documents are left as they are
+    BOILERPLATE_MIN_PAGE_RATIO: float = 0.5  # A header/footer line on at least this share of a document's pages is boilerplate
+    BOILERPLATE_EDGE_LINES: int = 4  # Lines at the top and bottom of each page considered header/footer; the rest is never stripped
+    BOILERPLATE_SIMILARITY: float = 0.8  # Character trigram Jaccard of near-duplicate header/footer lines
+    INGEST_DEDUP_CHUNKS: bool = True
+    DEDUP_NEAR_DUPLICATE_THRESHOLD: float = 0.9  # Estimated Jaccard similarity of word 3-shingles
+    DEDUP_MINHASH_PERMUTATIONS: int = 64
+    DEDUP_MINHASH_BANDS: int = 16  # LSH bands; more bands find less similar candidates
+
+    # --- Batch Questions (POST /api/batch/questions, batch_questions.py, see workflow/batch.py) ---
+    BATCH_QA_CONCURRENCY: int = 8  # Questions of one batch answered at the same time
+    BATCH_QA_GLOBAL_CONCURRENCY: int = 8  # Questions answered at the same time across all batches of the process
+    BATCH_QA_MAX_QUESTIONS: int = 1000  # Per batch
+
+    # --- Upload Progress Events (GET /api/upload/events/{job_id}) ---
+    UPLOAD_EVENTS_QUEUE_SIZE: int = 1000  # Per listener; a listener that falls behind gets a fresh snapshot
+    UPLOAD_EVENTS_HEARTBEAT_SECONDS: float = 15.0  # Keeps proxies from closing an idle stream
+
+    # --- Startup Warm-up (see core/warmup.py) ---
+    WARMUP_ENABLED: bool = True
+    WARMUP_DB_CONNECTIONS: int = 5  # Pooled connections opened ahead of the first requests
+    WARMUP_STEP_TIMEOUT_SECONDS: float = 30.0
+
+    # --- Profiling Configuration (opt-in, see core/profiling.py) ---
+    PROFILING_ADMIN_TOKEN: Optional[str] = None  # Requests sending it as X-Profile-Token are profiled
+    PROFILING_SAMPLE_RATE: float = 0.0  # Share of requests under PROFILING_SAMPLED_PATHS profiled at random
+    PROFILING_SAMPLED_PATHS: list = ["/api/threads/"]
+    PROFILING_OUTPUT_DIR: str = "profiles"
     
     # --- RAG Configuration ---
-    OPENAI_API_KEY: str
+    OPENAI_API_KEY: Optional[str] = None
     EMBEDDING_MODEL: str = "text-embedding-3-large"
     EMBEDDING_MODEL_DIM: int = 3072
+    # Document embeddings of concurrently indexing files are merged into shared requests (see core/embedding_batcher.py)
+    EMBEDDING_BATCHING: bool = True
+    EMBEDDING_BATCH_SIZE: int = 256  # Texts per request (the OpenAI API takes up to 2048)
+    EMBEDDING_BATCH_WAIT_SECONDS: float = 0.05  # How long the first text waits for others to fill its batch
+    EMBEDDING_MAX_CONCURRENT_BATCHES: int = 4
     TASK_TYPE: str = "RETRIEVAL_DOCUMENT"
     CHUNK_SIZE: int = 1000
 
+    @model_validator(mode="after")
+    def check_service_credentials(self) -> "Settings":
+        """Credentials are only required when talking to the real services."""
+        if self.OFFLINE_MODE:
+            if self.DATABASE_URL is None:
+                self.DATABASE_URL = self.OFFLINE_DATABASE_URL
+            return self
+
+        missing = [
+            name
+            for name in ("DATABASE_URL", "MEM0_API_KEY", "GOOGLE_API_KEY", "PINECONE_API_KEY", "PINECONE_INDEX_NAME", "OPENAI_API_KEY")
+            if not getattr(self, name)
+        ]
+        if missing:
+            raise ValueError(f"Missing settings: {', '.join(missing)} (or set OFFLINE_MODE=true)")
+        return self
+
 
 settings = Settings()
\ No newline at end of file
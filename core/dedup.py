@@ -0,0 +1,153 @@
+"""Duplicate chunk removal: chunks that are already indexed are not embedded again.
+
+- Exact duplicates: each chunk's vector id is derived from its text (`content_id`). A
+  chunk whose id is already in the vector store is dropped. So is one already kept by the
+  same job. Re-uploading a document therefore only embeds the chunks that changed.
+- Near-duplicates: a MinHash LSH index over word 3-shingles drops a chunk whose
+  estimated Jaccard similarity with a chunk kept earlier reaches the threshold. Examples
+  are the same paragraph re-flowed, re-punctuated or pasted into another document. Two
+  chunks whose numbers differ are never near-duplicates, so "15 días" and "20 días"
+  are both indexed.
+
+Near-duplicates are looked for within one upload job, which for bulk ingestion is the
+whole onboarded corpus. Across jobs only exact copies are dropped. Otherwise an old
+version of a document already in the index would suppress the chunks of its update.
+"""
+import asyncio
+import hashlib
+import re
+import threading
+import zlib
+from dataclasses import dataclass
+from typing import Dict, Iterator, List, Set, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+
+from core.metrics import INGEST_CHUNKS_SAVED, INGEST_TOKENS_SAVED
+from core.vectorstore import find_existing_ids
+from utils.tokens import count_text_tokens
+
+_WORDS = re.compile(r"\w+")
+_NUMBERS = re.compile(r"\d+")
+_MERSENNE_PRIME = (1 << 61) - 1
+
+
+@dataclass
+class Savings:
+    """Chunks (and their tokens) kept out of the index and of the embedding requests."""
+    chunks: int = 0
+    tokens: int = 0
+
+    @classmethod
+    def of(cls, chunks: List[Document]) -> "Savings":
+        return cls(chunks=len(chunks), tokens=sum(count_text_tokens(chunk.page_content) for chunk in chunks))
+
+    def __add__(self, other: "Savings") -> "Savings":
+        return Savings(chunks=self.chunks + other.chunks, tokens=self.tokens + other.tokens)
+
+    def record(self, reason: str) -> None:
+        INGEST_CHUNKS_SAVED.labels(reason=reason).inc(self.chunks)
+        INGEST_TOKENS_SAVED.labels(reason=reason).inc(self.tokens)
+
+
+def content_id(text: str) -> str:
+    """Vector id of a chunk: the same text, spacing and case aside, always gets the same id."""
+    return hashlib.sha256(" ".join(text.casefold().split()).encode("utf-8")).hexdigest()[:32]
+
+
+class MinHasher:
+    """MinHash signatures of a text's word 3-shingles, `num_perm` values each."""
+
+    def __init__(self, num_perm: int, seed: int = 0):
+        rng = np.random.default_rng(seed)
+        # a < 2**31 and crc32 < 2**32, so a * h + b fits in uint64 before the modulo
+        self._a = rng.integers(1, 1 << 31, size=(num_perm, 1), dtype=np.uint64)
+        self._b = rng.integers(0, 1 << 31, size=(num_perm, 1), dtype=np.uint64)
+
+    def signature(self, text: str) -> np.ndarray:
+        words = _WORDS.findall(text.casefold())
+        shingles = {" ".join(words[i:i + 3]) for i in range(max(1, len(words) - 2))}
+        hashes = np.fromiter((zlib.crc32(shingle.encode("utf-8")) for shingle in shingles), dtype=np.uint64, count=len(shingles))
+        return ((self._a * hashes + self._b) % _MERSENNE_PRIME).min(axis=1)
+
+
+class NearDuplicateIndex:
+    """LSH over MinHash signatures: `bands` bands of `num_perm / bands` values each.
+
+    Signatures that share a band are candidates. A candidate is a near-duplicate if
+    the share of equal signature values (the estimated Jaccard similarity) reaches
+    `threshold` and the numbers in the two texts are the same.
+    """
+
+    def __init__(self, *, num_perm: int, bands: int, threshold: float):
+        self.rows = num_perm // bands
+        self.bands = bands
+        self.threshold = threshold
+        self._buckets: Dict[Tuple[int, bytes], List[int]] = {}
+        self._entries: List[Tuple[str, np.ndarray, Tuple[str, ...]]] = []
+
+    def _band_keys(self, signature: np.ndarray) -> List[Tuple[int, bytes]]:
+        return [(band, signature[band * self.rows:(band + 1) * self.rows].tobytes()) for band in range(self.bands)]
+
+    def matches(self, signature: np.ndarray, numbers: Tuple[str, ...]) -> Iterator[str]:
+        """Keys of the near-duplicates in the index."""
+        for index in {index for key in self._band_keys(signature) for index in self._buckets.get(key, ())}:
+            key, other_signature, other_numbers = self._entries[index]
+            if other_numbers == numbers and np.mean(other_signature == signature) >= self.threshold:
+                yield key
+
+    def add(self, key: str, signature: np.ndarray, numbers: Tuple[str, ...]) -> None:
+        self._entries.append((key, signature, numbers))
+        for band_key in self._band_keys(signature):
+            self._buckets.setdefault(band_key, []).append(len(self._entries) - 1)
+
+
+class ChunkDeduplicator:
+    """Drops the duplicate chunks of the files of one upload job before they are embedded (see module docstring).
+
+    Shared by the job's files, which are deduplicated concurrently. If a file fails after
+    deduplication, `forget` its chunks so that copies in files deduplicated later are indexed.
+    """
+
+    def __init__(self, *, num_perm: int, bands: int, threshold: float):
+        self._hasher = MinHasher(num_perm)
+        self._near_duplicates = NearDuplicateIndex(num_perm=num_perm, bands=bands, threshold=threshold)
+        self._kept_ids: Set[str] = set()
+        self._lock = threading.Lock()
+
+    def _drop_seen(self, chunks: List[Document]) -> Tuple[List[Document], List[Document], List[Document]]:
+        """Splits `chunks` into kept, exact and near-duplicates of chunks this job already kept."""
+        signatures = [self._hasher.signature(chunk.page_content) for chunk in chunks]
+        kept, exact, near = [], [], []
+        with self._lock:
+            for chunk, signature in zip(chunks, signatures):
+                numbers = tuple(_NUMBERS.findall(chunk.page_content))
+                if chunk.id in self._kept_ids:
+                    exact.append(chunk)
+                elif any(key in self._kept_ids for key in self._near_duplicates.matches(signature, numbers)):
+                    near.append(chunk)
+                else:
+                    self._kept_ids.add(chunk.id)
+                    self._near_duplicates.add(chunk.id, signature, numbers)
+                    kept.append(chunk)
+        return kept, exact, near
+
+    def forget(self, chunks: List[Document]) -> None:
+        with self._lock:
+            self._kept_ids.difference_update(chunk.id for chunk in chunks)
+
+    async def filter(self, chunks: List[Document]) -> Tuple[List[Document], Savings]:
+        """Gives the chunks their content ids and returns the ones to index, with what the others saved."""
+        for chunk in chunks:
+            chunk.id = content_id(chunk.page_content)
+        kept, exact, near = await asyncio.to_thread(self._drop_seen, chunks)
+        if kept:
+            indexed = await find_existing_ids([chunk.id for chunk in kept])
+            exact += [chunk for chunk in kept if chunk.id in indexed]
+            kept = [chunk for chunk in kept if chunk.id not in indexed]
+
+        exact_savings, near_savings = Savings.of(exact), Savings.of(near)
+        exact_savings.record("duplicate")
+        near_savings.record("near_duplicate")
+        return kept, exact_savings + near_savings
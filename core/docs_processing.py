@@ -1,26 +1,27 @@
-from typing import List, Optional, Dict
-from core.loader import load_pdf_from_bytes
+from typing import Callable, List, Optional, Dict, Tuple
+from langchain_core.documents import Document
+from core.boilerplate import strip_boilerplate
+from core.config import settings
+from core.dedup import Savings
+from core.loader import load_document
+from core.process_pool import run_cpu_bound
 from core.splitter import split_documents
 from core.vectorstore import add_documents_to_vector_store
 
-async def process_and_index_pdf(
-    file_bytes: bytes, 
-    filename: str, 
-    custom_metadata: Optional[Dict] = None
-) -> int:
+def parse_and_split_document(
+    file_bytes: bytes,
+    filename: str,
+    custom_metadata: Optional[Dict] = None,
+) -> Tuple[int, List[Document], Savings]:
     """
-    Processes a PDF file from bytes, splits it into chunks, 
-    and indexes the chunks into the vector store.
-    Returns the number of chunks indexed. Handles large files and rate limits internally.
+    The CPU-bound work of indexing a file, in one call so that it can run in a worker
+    process (see core/process_pool.py). Returns the number of pages, the chunks and
+    what stripping the boilerplate saved.
     """
-    print(f"Starting processing for PDF: {filename}")
-    
-    # 1. Load PDF into documents (each page is a Document)
-    documents = await load_pdf_from_bytes(file_bytes, filename)
+    # 1. Load the document (each PDF page is a Document; other formats are a single one)
+    documents = load_document(file_bytes, filename)
     if not documents:
-        print(f"No documents loaded from {filename}. File might be empty or corrupted.")
-        return 0
-    print(f"Loaded {len(documents)} pages from {filename}.")
+        return 0, [], Savings()
 
     # 2. Add any custom metadata to all loaded documents (pages)
     # Also add page number metadata
@@ -30,17 +31,78 @@ async def process_and_index_pdf(
         page.metadata["page"] = i + 1 # Add page number
         if custom_metadata:
             page.metadata.update(custom_metadata)
-    
+
     # 3. Split documents into manageable chunks
     chunks = split_documents(documents)
+
+    # 4. Drop the headers, footers and disclaimers repeated on every page. The split is
+    # redone without them (cheap next to parsing) to know the chunks and tokens saved
+    stripped = strip_boilerplate(
+        documents,
+        min_pages=settings.BOILERPLATE_MIN_PAGES,
+        min_page_ratio=settings.BOILERPLATE_MIN_PAGE_RATIO,
+        edge_lines=settings.BOILERPLATE_EDGE_LINES,
+        similarity=settings.BOILERPLATE_SIMILARITY,
+    ) if settings.INGEST_STRIP_BOILERPLATE else None
+    if stripped is None:
+        return len(documents), chunks, Savings()
+    stripped_chunks = split_documents(stripped)
+    before, after = Savings.of(chunks), Savings.of(stripped_chunks)
+    savings = Savings(chunks=max(0, before.chunks - after.chunks), tokens=max(0, before.tokens - after.tokens))
+    return len(documents), stripped_chunks, savings
+
+
+async def load_and_split_document(
+    file_bytes: bytes,
+    filename: str,
+    custom_metadata: Optional[Dict] = None,
+    on_progress: Optional[Callable[..., None]] = None,
+) -> Tuple[List[Document], Savings]:
+    """
+    Parses a document (PDF, DOCX, HTML or text, by file extension), strips its
+    boilerplate and splits it into chunks, off the event loop. Returns the chunks (none
+    if the file has no text) and what stripping the boilerplate saved.
+    `on_progress(stage, **counts)` reports "parsed" (pages) and "split" (chunks, and
+    the boilerplate chunks and tokens stripped).
+    """
+    print(f"Starting processing for document: {filename}")
+    pages, chunks, savings = await run_cpu_bound(parse_and_split_document, file_bytes, filename, custom_metadata)
+    if not pages:
+        print(f"No documents loaded from {filename}. File might be empty or corrupted.")
+        return [], savings
+    print(f"Loaded {pages} pages from {filename}.")
+    if on_progress is not None:
+        on_progress("parsed", pages=pages)
+
     if not chunks:
         print(f"No chunks created from {filename}. File content might be too small or formatting issue.")
-        return 0
-    print(f"Split into {len(chunks)} chunks for {filename}.")
+        return [], savings
+    savings.record("boilerplate")
+    print(f"Split into {len(chunks)} chunks for {filename} ({savings.chunks} chunks, {savings.tokens} tokens of boilerplate stripped).")
+    if on_progress is not None:
+        on_progress("split", chunks_total=len(chunks), chunks_skipped=savings.chunks, tokens_saved=savings.tokens)
+    return chunks, savings
+
 
+async def index_chunks(
+    chunks: List[Document],
+    filename: str,
+    on_progress: Optional[Callable[..., None]] = None,
+) -> int:
+    """
+    Embeds the chunks of a file split by `load_and_split_document` and upserts them into
+    the vector store. Returns the number of chunks indexed. `on_progress("indexing", ...)`
+    reports the chunks indexed so far, after every vector store batch.
+    """
     # 4. Add chunks to vector store (Pinecone) with batching and retries
     try:
-        indexed_ids = await add_documents_to_vector_store(chunks)
+        indexed_ids = await add_documents_to_vector_store(
+            chunks,
+            on_progress=(
+                (lambda indexed, total: on_progress("indexing", chunks_indexed=indexed, chunks_total=total))
+                if on_progress is not None else None
+            ),
+        )
         num_indexed = len(indexed_ids) if indexed_ids else 0
         print(f"Successfully indexed {num_indexed} chunks from {filename}.")
         return num_indexed
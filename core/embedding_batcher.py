@@ -0,0 +1,112 @@
+import asyncio
+from typing import List, Optional, Tuple
+
+from langchain_core.embeddings import Embeddings
+
+from .metrics import EMBEDDING_BATCH_SIZE
+
+
+class EmbeddingBatcher(Embeddings):
+    """Embeds the documents of every concurrently indexing file in shared, full-size requests.
+
+    Each file's `aembed_documents` call is split into its texts and queued. A worker
+    fills batches of up to `batch_size` texts from the queue, across files. A batch is
+    sent once it is full, or `max_wait_seconds` after its first text arrived, with up
+    to `max_concurrent_batches` requests in flight. Each caller gets back the vectors of
+    its own texts, in order. A failed request fails only the callers whose texts were
+    in it. The worker only runs while there are texts to embed, so there is nothing
+    to start or stop with the app.
+
+    Many small PDFs otherwise produce many small requests, each paying the per-request
+    latency and counting against the request rate limit. Queries and sync calls go
+    straight to the wrapped model.
+    """
+
+    def __init__(self, embeddings: Embeddings, *, batch_size: int, max_wait_seconds: float, max_concurrent_batches: int):
+        self.embeddings = embeddings
+        self.batch_size = batch_size
+        self.max_wait_seconds = max_wait_seconds
+        self.max_concurrent_batches = max_concurrent_batches
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._batches: set = set()
+
+    def _ensure_started(self) -> None:
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            # First use, or a new event loop (scripts calling asyncio.run more than once)
+            self._loop = loop
+            self._queue = asyncio.Queue()
+            self._slots = asyncio.Semaphore(self.max_concurrent_batches)
+            self._worker = None
+        if self._worker is None or self._worker.done():
+            self._worker = asyncio.create_task(self._run_worker())
+
+    # --- Embeddings interface ---
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+        self._ensure_started()
+        loop = asyncio.get_running_loop()
+        futures = [loop.create_future() for _ in texts]
+        for text, future in zip(texts, futures):
+            self._queue.put_nowait((text, future))
+        return list(await asyncio.gather(*futures))
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return await self.embeddings.aembed_query(text)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.embeddings.embed_documents(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embeddings.embed_query(text)
+
+    # --- Batching ---
+    async def _run_worker(self) -> None:
+        loop = asyncio.get_running_loop()
+        # Exits once the queue is drained; the next caller starts it again
+        while not self._queue.empty():
+            batch: List[Tuple[str, asyncio.Future]] = [self._queue.get_nowait()]
+
+            # Collect more texts until the batch is full or the wait window closes
+            deadline = loop.time() + self.max_wait_seconds
+            while len(batch) < self.batch_size:
+                if not self._queue.empty():
+                    batch.append(self._queue.get_nowait())
+                    continue
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            # Waiting for a slot holds back the next batch, which keeps filling meanwhile
+            await self._slots.acquire()
+            task = asyncio.create_task(self._embed_batch(batch))
+            self._batches.add(task)
+            task.add_done_callback(self._batches.discard)
+
+    async def _embed_batch(self, batch: List[Tuple[str, asyncio.Future]]) -> None:
+        try:
+            # Texts of callers that gave up (cancelled) are not sent
+            batch = [(text, future) for text, future in batch if not future.done()]
+            if not batch:
+                return
+            EMBEDDING_BATCH_SIZE.observe(len(batch))
+            try:
+                vectors = await self.embeddings.aembed_documents([text for text, _ in batch])
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                return
+            for (_, future), vector in zip(batch, vectors):
+                if not future.done():
+                    future.set_result(vector)
+        finally:
+            self._slots.release()
@@ -1,11 +1,48 @@
-from langchain_openai import OpenAIEmbeddings
+from typing import List
+
+from langchain_core.embeddings import Embeddings
 import os
 from .config import settings
+from .metrics import EMBEDDING_DURATION, timed
+from .offline import HashingEmbeddings
+
+
+class InstrumentedEmbeddings(Embeddings):
+    """Records the duration of every embedding call of the wrapped model."""
+
+    def __init__(self, embeddings: Embeddings):
+        self.embeddings = embeddings
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        with timed(EMBEDDING_DURATION, operation="documents"):
+            return self.embeddings.embed_documents(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        with timed(EMBEDDING_DURATION, operation="query"):
+            return self.embeddings.embed_query(text)
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        with timed(EMBEDDING_DURATION, operation="documents"):
+            return await self.embeddings.aembed_documents(texts)
+
+    async def aembed_query(self, text: str) -> List[float]:
+        with timed(EMBEDDING_DURATION, operation="query"):
+            return await self.embeddings.aembed_query(text)
+
+
+def get_embedding_model() -> Embeddings:
+    """Get an instance of a OpenAI embedding model (or its offline stand-in)"""
+
+    if settings.OFFLINE_MODE:
+        return InstrumentedEmbeddings(HashingEmbeddings(
+            size=settings.EMBEDDING_MODEL_DIM,
+            latency_seconds=settings.OFFLINE_SERVICE_LATENCY_SECONDS,
+        ))
 
-def get_embedding_model() -> OpenAIEmbeddings:
-    """Get an instance of a OpenAI embedding model"""
+    # Imported here: the OpenAI client is only needed, and paid for at import, outside offline mode
+    from langchain_openai import OpenAIEmbeddings
 
-    return OpenAIEmbeddings(
+    return InstrumentedEmbeddings(OpenAIEmbeddings(
         model=settings.EMBEDDING_MODEL,
         openai_api_key=settings.OPENAI_API_KEY,
-    )
+    ))
@@ -0,0 +1,169 @@
+"""Upload jobs: index the files of a job concurrently and record each file's status.
+
+Shared by the upload endpoints (api/routers/upload.py) and the bulk ingestion CLI
+(ingest.py). Status changes are stored in the database and published to the job's
+progress listeners (see core/progress.py).
+"""
+import asyncio
+from contextlib import AsyncExitStack, asynccontextmanager
+from dataclasses import dataclass
+from typing import AsyncContextManager, AsyncIterator, Awaitable, Callable, List, Optional
+
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from core.config import settings
+from core.dedup import ChunkDeduplicator
+from core.docs_processing import index_chunks, load_and_split_document
+from core.progress import upload_progress
+from database import crud as db_crud
+from database.database import async_session
+from database.models import FileProcessingStatusEnum
+
+
+@dataclass
+class JobFile:
+    """A file of an upload job.
+
+    `read` returns the file's content. It is only called once the file gets a slot, so
+    a job over an archive or a directory holds only the files being parsed in memory.
+    `sequential` files are read in the order given rather than by size: the members of
+    a tar archive (see DocumentArchive.sequential).
+    """
+    filename: str
+    size: int
+    read: Callable[[], Awaitable[bytes]]
+    sequential: bool = False
+
+    @classmethod
+    def from_bytes(cls, filename: str, data: bytes) -> "JobFile":
+        async def read() -> bytes:
+            return data
+        return cls(filename=filename, size=len(data), read=read)
+
+
+# Shared by every job of the process; each job also has its own limit (see process_upload_job)
+_global_upload_slots = asyncio.Semaphore(settings.UPLOAD_GLOBAL_CONCURRENCY)
+
+async def update_file_status(
+    db: AsyncSession,
+    job_id: str,
+    filename: str,
+    file_status: FileProcessingStatusEnum,
+    message: Optional[str] = None,
+    chunks_indexed: Optional[int] = None,
+    chunks_skipped: Optional[int] = None,
+    tokens_saved: Optional[int] = None,
+) -> None:
+    """Store a file's new status and publish it (and the job's overall status) to the job's listeners."""
+    job = await db_crud.update_file_processing_status_in_db(
+        db, job_id, filename, file_status, message=message,
+        chunks_indexed=chunks_indexed, chunks_skipped=chunks_skipped, tokens_saved=tokens_saved,
+    )
+    upload_progress.publish(job_id, {
+        "type": "file", "filename": filename, "status": file_status.value, "message": message,
+        "chunks_indexed": chunks_indexed, "chunks_skipped": chunks_skipped, "tokens_saved": tokens_saved,
+    })
+    if job is not None:
+        upload_progress.publish(job_id, {"type": "job", "overall_status": job.overall_status.value})
+
+async def index_job_file(
+    job_id: str,
+    job_file: JobFile,
+    slot: Optional[AsyncContextManager] = None,
+    duplicates: Optional[ChunkDeduplicator] = None,
+) -> None:
+    """
+    Indexes one file of a job and updates its status in the database.
+    `slot` is entered before the file starts processing. With EMBEDDING_BATCHING it is
+    released once the file is split, otherwise once the file is indexed. Chunks that
+    `duplicates` has already seen, in this job or in the index, are not indexed again.
+    """
+    filename = job_file.filename
+    # Important: Each background task needs its own DB session
+    async with async_session() as db:
+        try:
+            async with AsyncExitStack() as held:
+                if slot is not None:
+                    await held.enter_async_context(slot)
+                print(f"Background task started for: job_id={job_id}, filename={filename}")
+                await update_file_status(db, job_id, filename, FileProcessingStatusEnum.PROCESSING)
+
+                def on_progress(stage: str, **counts: int) -> None:
+                    upload_progress.publish(job_id, {"type": "progress", "filename": filename, "stage": stage, **counts})
+
+                chunks, savings = await load_and_split_document(
+                    await job_file.read(), filename, custom_metadata=None, on_progress=on_progress # No custom_metadata from user
+                )
+                if settings.EMBEDDING_BATCHING:
+                    # The batcher bounds the embedding requests in flight, so the slot can go to
+                    # the next file while these chunks wait to share a request with other files'
+                    await held.aclose()
+                if chunks and duplicates is not None:
+                    chunks, duplicate_savings = await duplicates.filter(chunks)
+                    on_progress("deduplicated", chunks_skipped=duplicate_savings.chunks, tokens_saved=duplicate_savings.tokens)
+                    savings += duplicate_savings
+                try:
+                    num_chunks_indexed = await index_chunks(chunks, filename, on_progress) if chunks else 0
+                except Exception:
+                    if duplicates is not None:
+                        # Not indexed after all: copies in the job's other files must be
+                        duplicates.forget(chunks)
+                    raise
+
+            await update_file_status(
+                db,
+                job_id,
+                filename,
+                FileProcessingStatusEnum.COMPLETED,
+                message=f"Successfully indexed with {num_chunks_indexed} chunks"
+                        f" ({savings.chunks} boilerplate or duplicate chunks skipped).",
+                chunks_indexed=num_chunks_indexed,
+                chunks_skipped=savings.chunks,
+                tokens_saved=savings.tokens,
+            )
+            print(f"Background task: Successfully indexed {filename} (job: {job_id}) with {num_chunks_indexed} chunks.")
+        except Exception as e:
+            error_message = f"Error indexing {filename}: {str(e)}"
+            print(f"Background task: {error_message} (job: {job_id})")
+            # A failed flush leaves the session unusable until it is rolled back
+            await db.rollback()
+            await update_file_status(
+                db,
+                job_id,
+                filename,
+                FileProcessingStatusEnum.FAILED,
+                message=error_message
+            )
+
+async def process_upload_job(job_id: str, files: List[JobFile]) -> None:
+    """
+    Indexes the files of a job concurrently: up to UPLOAD_JOB_CONCURRENCY of them at a
+    time, and up to UPLOAD_GLOBAL_CONCURRENCY across all jobs. Slots are handed out in
+    order of arrival, smallest file first, so small files don't wait behind a large PDF.
+    A large PDF only holds one slot while the small files go through the others.
+    Sequential files (tar members) come after the others, in the order given.
+    With EMBEDDING_BATCHING the slots only cover parsing and splitting (see
+    index_job_file), so the chunks of many files fill the same requests. At most
+    UPLOAD_JOB_FILES_IN_FLIGHT files of the job are parsed and not yet indexed.
+    With INGEST_DEDUP_CHUNKS, chunks already indexed or repeated across the job's files
+    are dropped before embedding (see core/dedup.py).
+    """
+    duplicates = ChunkDeduplicator(
+        num_perm=settings.DEDUP_MINHASH_PERMUTATIONS,
+        bands=settings.DEDUP_MINHASH_BANDS,
+        threshold=settings.DEDUP_NEAR_DUPLICATE_THRESHOLD,
+    ) if settings.INGEST_DEDUP_CHUNKS else None
+    job_slots = asyncio.Semaphore(settings.UPLOAD_JOB_CONCURRENCY)
+    in_flight = asyncio.Semaphore(max(settings.UPLOAD_JOB_FILES_IN_FLIGHT, settings.UPLOAD_JOB_CONCURRENCY))
+
+    @asynccontextmanager
+    async def file_slot() -> AsyncIterator[None]:
+        async with job_slots, _global_upload_slots:
+            yield
+
+    async def index(job_file: JobFile) -> None:
+        async with in_flight:
+            await index_job_file(job_id, job_file, slot=file_slot(), duplicates=duplicates)
+
+    by_size = sorted((f for f in files if not f.sequential), key=lambda f: f.size)
+    await asyncio.gather(*(index(job_file) for job_file in by_size + [f for f in files if f.sequential]))
@@ -0,0 +1,206 @@
+import asyncio
+import hashlib
+import json
+import threading
+from contextvars import ContextVar
+from datetime import datetime, timedelta, timezone
+from typing import Any, Optional, Sequence, Type, TypeVar
+
+from langchain_core.caches import RETURN_VAL_TYPE, BaseCache
+from langchain_core.language_models import BaseChatModel
+from langchain_core.load import dumps, loads
+from langchain_core.messages import BaseMessage
+from pydantic import BaseModel
+from sqlalchemy import func, update
+from sqlalchemy.engine import Engine
+from sqlmodel import Session, delete, select
+
+from core.config import settings
+from core.metrics import LLM_CACHE_REQUESTS
+from core.singleflight import SingleFlight
+from database.database import engine
+from database.models import LLMCacheEntry
+
+SchemaT = TypeVar("SchemaT", bound=BaseModel)
+
+# Set while a structured call is being computed, so the raw generation is not cached twice
+_bypass_raw_cache: ContextVar[bool] = ContextVar("bypass_raw_cache", default=False)
+
+# Expired / overflowing entries are purged once every N writes rather than on every write
+_EVICTION_INTERVAL = 100
+
+
+def _model_name_from_llm_string(llm_string: str) -> str:
+    """Best-effort extraction of the model name from a LangChain llm_string (for metrics)."""
+    try:
+        serialized = json.loads(llm_string.split("---", 1)[0])
+        return serialized.get("kwargs", {}).get("model", "unknown").removeprefix("models/")
+    except (ValueError, AttributeError):
+        return "unknown"
+
+
+def _hash_key(llm_string: str, prompt: str) -> str:
+    return hashlib.sha256(f"{llm_string}\x00{prompt}".encode("utf-8")).hexdigest()
+
+
+def structured_call_key(model: BaseChatModel, schema: Type[BaseModel], messages: Sequence[BaseMessage]) -> str:
+    """Hash of the model, its parameters, the output schema and the prompt of a structured call."""
+    llm_string = f"{model._get_llm_string()}---structured:{schema.__module__}.{schema.__qualname__}"
+    return _hash_key(llm_string, dumps(list(messages)))
+
+
+class LLMResponseCache(BaseCache):
+    """Persistent, size-bounded LLM response cache stored in the application database.
+
+    Entries are keyed by a hash of the model name, its parameters and the prompt.
+    They expire after `ttl_seconds`, and the least recently used entries are evicted
+    once the cache holds more than `max_entries`.
+
+    Enable it per model by passing `cache=llm_cache` to the chat model constructor.
+    """
+
+    def __init__(self, engine: Engine, *, ttl_seconds: int, max_entries: int):
+        self.engine = engine
+        self.ttl = timedelta(seconds=ttl_seconds)
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._writes_since_eviction = 0
+
+    # --- Storage ---
+    def _get(self, key: str, model: str) -> Optional[str]:
+        now = datetime.now(timezone.utc)
+        with Session(self.engine) as db:
+            value = db.exec(
+                select(LLMCacheEntry.value).where(LLMCacheEntry.key == key, LLMCacheEntry.expires_at > now)
+            ).first()
+            if value is not None:
+                db.exec(
+                    update(LLMCacheEntry)
+                    .where(LLMCacheEntry.key == key)
+                    .values(hits=LLMCacheEntry.hits + 1, last_accessed_at=now)
+                )
+                db.commit()
+
+        LLM_CACHE_REQUESTS.labels(model=model, result="miss" if value is None else "hit").inc()
+        return value
+
+    def _set(self, key: str, model: str, value: str) -> None:
+        now = datetime.now(timezone.utc)
+        with Session(self.engine) as db:
+            db.merge(
+                LLMCacheEntry(
+                    key=key,
+                    model=model,
+                    value=value,
+                    created_at=now,
+                    last_accessed_at=now,
+                    expires_at=now + self.ttl,
+                )
+            )
+            db.commit()
+
+        with self._lock:
+            self._writes_since_eviction += 1
+            should_evict = self._writes_since_eviction >= _EVICTION_INTERVAL
+            if should_evict:
+                self._writes_since_eviction = 0
+        if should_evict:
+            self.evict()
+
+    def evict(self) -> None:
+        """Drop expired entries, then the least recently used ones above `max_entries`."""
+        now = datetime.now(timezone.utc)
+        with Session(self.engine) as db:
+            db.exec(delete(LLMCacheEntry).where(LLMCacheEntry.expires_at <= now))
+            total = db.exec(select(func.count()).select_from(LLMCacheEntry)).one()
+            overflow = total - self.max_entries
+            if overflow > 0:
+                oldest_keys = select(LLMCacheEntry.key).order_by(LLMCacheEntry.last_accessed_at).limit(overflow)
+                db.exec(delete(LLMCacheEntry).where(LLMCacheEntry.key.in_(oldest_keys)))
+            db.commit()
+
+    # --- LangChain BaseCache interface (raw generations) ---
+    def lookup(self, prompt: str, llm_string: str) -> Optional[RETURN_VAL_TYPE]:
+        if _bypass_raw_cache.get():
+            return None
+        value = self._get(_hash_key(llm_string, prompt), _model_name_from_llm_string(llm_string))
+        return loads(value) if value is not None else None
+
+    def update(self, prompt: str, llm_string: str, return_val: RETURN_VAL_TYPE) -> None:
+        if _bypass_raw_cache.get():
+            return
+        self._set(_hash_key(llm_string, prompt), _model_name_from_llm_string(llm_string), dumps(list(return_val)))
+
+    def clear(self, **kwargs: Any) -> None:
+        with Session(self.engine) as db:
+            db.exec(delete(LLMCacheEntry))
+            db.commit()
+
+    # --- Structured outputs (parsed form) ---
+    def lookup_structured(self, model: BaseChatModel, schema: Type[SchemaT], messages: Sequence[BaseMessage]) -> Optional[SchemaT]:
+        value = self._get(structured_call_key(model, schema, messages), getattr(model, "model", "unknown").removeprefix("models/"))
+        return schema.model_validate_json(value) if value is not None else None
+
+    def update_structured(self, model: BaseChatModel, schema: Type[BaseModel], messages: Sequence[BaseMessage], result: BaseModel) -> None:
+        self._set(structured_call_key(model, schema, messages), getattr(model, "model", "unknown").removeprefix("models/"), result.model_dump_json())
+
+
+# Identical structured calls (scoring, rewriting, titles) in flight at the same time share one model call
+structured_flights = SingleFlight("structured_llm")
+
+llm_cache = LLMResponseCache(
+    engine,
+    ttl_seconds=settings.LLM_CACHE_TTL_SECONDS,
+    max_entries=settings.LLM_CACHE_MAX_ENTRIES,
+)
+
+
+def invoke_structured(model: BaseChatModel, schema: Type[SchemaT], messages: Sequence[BaseMessage]) -> SchemaT:
+    """`model.with_structured_output(schema).invoke(messages)`, served from the cache when enabled for the model.
+
+    Identical calls in flight at the same time are coalesced into one.
+    """
+    key = structured_call_key(model, schema, messages)
+    return structured_flights.do(key, lambda: _invoke_structured(model, schema, messages))
+
+
+def _invoke_structured(model: BaseChatModel, schema: Type[SchemaT], messages: Sequence[BaseMessage]) -> SchemaT:
+    cache = model.cache if isinstance(model.cache, LLMResponseCache) else None
+    if cache is None:
+        return model.with_structured_output(schema).invoke(list(messages))
+
+    cached = cache.lookup_structured(model, schema, messages)
+    if cached is not None:
+        return cached
+
+    token = _bypass_raw_cache.set(True)
+    try:
+        result = model.with_structured_output(schema).invoke(list(messages))
+    finally:
+        _bypass_raw_cache.reset(token)
+    cache.update_structured(model, schema, messages, result)
+    return result
+
+
+async def ainvoke_structured(model: BaseChatModel, schema: Type[SchemaT], messages: Sequence[BaseMessage]) -> SchemaT:
+    """Async version of `invoke_structured`; cache I/O runs off the event loop."""
+    key = structured_call_key(model, schema, messages)
+    return await structured_flights.ado(key, lambda: _ainvoke_structured(model, schema, messages))
+
+
+async def _ainvoke_structured(model: BaseChatModel, schema: Type[SchemaT], messages: Sequence[BaseMessage]) -> SchemaT:
+    cache = model.cache if isinstance(model.cache, LLMResponseCache) else None
+    if cache is None:
+        return await model.with_structured_output(schema).ainvoke(list(messages))
+
+    cached = await asyncio.to_thread(cache.lookup_structured, model, schema, messages)
+    if cached is not None:
+        return cached
+
+    token = _bypass_raw_cache.set(True)
+    try:
+        result = await model.with_structured_output(schema).ainvoke(list(messages))
+    finally:
+        _bypass_raw_cache.reset(token)
+    await asyncio.to_thread(cache.update_structured, model, schema, messages, result)
+    return result
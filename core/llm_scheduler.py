@@ -0,0 +1,400 @@
+import asyncio
+import heapq
+import itertools
+import re
+import threading
+import time
+from collections import deque
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from enum import IntEnum
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Tuple
+
+from langchain_core.messages.utils import count_tokens_approximately
+from langchain_core.runnables import Runnable, RunnableConfig
+
+from core.config import settings
+from core.metrics import LLM_CALL_DURATION, LLM_QUEUE_WAIT
+
+
+class Priority(IntEnum):
+    """Scheduling classes, lower value is served first."""
+    ANSWER = 0
+    ROUTER = 1
+    AUXILIARY = 2  # Document scoring and query rewriting
+    TITLE = 3
+    BATCH = 4  # Every call of a batch job (see priority_override)
+
+
+# While set, calls are scheduled at this priority whatever their model's (batch jobs set it
+# so their answers don't compete with chat turns)
+priority_override: ContextVar[Optional[Priority]] = ContextVar("priority_override", default=None)
+
+
+@dataclass
+class ModelQuota:
+    max_concurrency: int
+    tokens_per_minute: int
+
+
+class LLMQueueTimeout(Exception):
+    """Raised when a call could not get a slot before its deadline."""
+
+
+@dataclass(order=True)
+class _Waiter:
+    priority: int
+    seq: int
+    tokens: int = field(compare=False)
+    deadline: float = field(compare=False)
+    event: Optional[threading.Event] = field(compare=False, default=None)
+    future: Optional[asyncio.Future] = field(compare=False, default=None)
+    loop: Optional[asyncio.AbstractEventLoop] = field(compare=False, default=None)
+    granted: bool = field(compare=False, default=False)
+    cancelled: bool = field(compare=False, default=False)
+    usage: Optional[List[float]] = field(compare=False, default=None)  # [timestamp, tokens] entry once granted
+
+
+class _ModelState:
+    def __init__(self, quota: ModelQuota, window_seconds: float):
+        self.quota = quota
+        self.window_seconds = window_seconds
+        self.in_flight = 0
+        self.token_window: Deque[List[float]] = deque()  # [timestamp, tokens] over the last window
+        self.tokens_in_window = 0
+        self.paused_until = 0.0
+        self.waiters: List[_Waiter] = []
+
+    def expire_tokens(self, now: float) -> None:
+        while self.token_window and self.token_window[0][0] <= now - self.window_seconds:
+            self.tokens_in_window -= self.token_window.popleft()[1]
+
+    def can_grant(self, tokens: int, now: float) -> bool:
+        if now < self.paused_until or self.in_flight >= self.quota.max_concurrency:
+            return False
+        # A single call larger than the whole budget is let through once the window is empty
+        return self.tokens_in_window + tokens <= self.quota.tokens_per_minute or not self.token_window
+
+
+_RETRY_DELAY_PATTERNS = [
+    re.compile(r"retry_delay\s*\{\s*seconds:\s*(\d+)", re.IGNORECASE),
+    re.compile(r"retry(?:\s|-)?(?:in|after)\s*(\d+(?:\.\d+)?)\s*s", re.IGNORECASE),
+]
+
+
+# Provider exceptions for rate limits: google.api_core (Gemini, Vertex AI), openai, httpx-based clients
+_RATE_LIMIT_EXCEPTIONS = {"ResourceExhausted", "TooManyRequests", "RateLimitError"}
+
+
+def _status_code(exc: BaseException) -> Optional[int]:
+    """HTTP status of a provider error: on the exception or on its response, as an int, HTTPStatus or str."""
+    for holder in (exc, getattr(exc, "response", None)):
+        for attribute in ("status_code", "code"):
+            value = getattr(holder, attribute, None)
+            if value is None or callable(value):  # grpc errors have a code() method
+                continue
+            try:
+                return int(value)
+            except (TypeError, ValueError):
+                continue
+    return None
+
+
+def get_retry_after(exc: BaseException) -> Optional[float]:
+    """Return the provider's requested delay (seconds) if `exc` is a rate-limit error, else None.
+
+    A rate-limit error is a 429 status, a known provider rate-limit exception or a gRPC
+    RESOURCE_EXHAUSTED status; a "429" elsewhere in the message (a token count, a request
+    id) doesn't count. A rate-limit error without an explicit delay returns 0.0 so the
+    caller falls back to exponential backoff.
+    """
+    retry_after = getattr(exc, "retry_after", None)
+    if retry_after is not None:
+        return float(retry_after)
+
+    message = str(exc)
+    is_rate_limit = _status_code(exc) == 429 \
+        or any(cls.__name__ in _RATE_LIMIT_EXCEPTIONS for cls in type(exc).__mro__) \
+        or "RESOURCE_EXHAUSTED" in message.upper()
+    if not is_rate_limit:
+        return None
+    for pattern in _RETRY_DELAY_PATTERNS:
+        if match := pattern.search(message):
+            return float(match.group(1))
+    return 0.0
+
+
+def estimate_tokens(input: Any) -> int:
+    """Rough prompt size used for tokens-per-minute budgeting."""
+    if isinstance(input, str):
+        return max(1, len(input) // 4)
+    if hasattr(input, "to_messages"):
+        input = input.to_messages()
+    try:
+        return count_tokens_approximately(input if isinstance(input, list) else [input])
+    except Exception:
+        return max(1, len(str(input)) // 4)
+
+
+class LLMScheduler:
+    """Shared admission scheduler for every LLM client of the process.
+
+    Each model gets a concurrency limit and a tokens-per-minute budget. Waiting calls
+    are served by priority class (then FIFO) and give up at their deadline. When the
+    provider returns a rate-limit error, the whole model is paused for the requested
+    retry delay (or an exponential backoff) before the call is retried.
+    Works from both async code and sync code running in worker threads.
+    """
+
+    def __init__(
+        self,
+        *,
+        default_quota: ModelQuota,
+        quotas: Optional[Dict[str, ModelQuota]] = None,
+        queue_timeouts: Optional[Dict[Priority, float]] = None,
+        max_rate_limit_retries: int = 3,
+        backoff_base_seconds: float = 1.0,
+        token_window_seconds: float = 60.0,
+    ):
+        self.default_quota = default_quota
+        self.quotas = quotas or {}
+        self.queue_timeouts = queue_timeouts or {}
+        self.max_rate_limit_retries = max_rate_limit_retries
+        self.backoff_base_seconds = backoff_base_seconds
+        self.token_window_seconds = token_window_seconds
+        self._lock = threading.Lock()
+        self._models: Dict[str, _ModelState] = {}
+        self._seq = itertools.count()
+
+    # --- Slot management ---
+    def _state(self, model: str) -> _ModelState:
+        if model not in self._models:
+            self._models[model] = _ModelState(self.quotas.get(model, self.default_quota), self.token_window_seconds)
+        return self._models[model]
+
+    def _dispatch(self, state: _ModelState) -> None:
+        """Grant slots to the waiters at the head of the queue (lock must be held)."""
+        now = time.monotonic()
+        state.expire_tokens(now)
+        while state.waiters:
+            waiter = state.waiters[0]
+            if waiter.cancelled:
+                heapq.heappop(state.waiters)
+                continue
+            if not state.can_grant(waiter.tokens, now):
+                break
+            heapq.heappop(state.waiters)
+            waiter.granted = True
+            state.in_flight += 1
+            waiter.usage = [now, waiter.tokens]
+            state.token_window.append(waiter.usage)
+            state.tokens_in_window += waiter.tokens
+            if waiter.event is not None:
+                waiter.event.set()
+            else:
+                waiter.loop.call_soon_threadsafe(_resolve_future, waiter.future)
+
+    def _next_wakeup(self, state: _ModelState, waiter: _Waiter) -> float:
+        """How long a waiter may sleep before time alone could change its situation."""
+        now = time.monotonic()
+        delays = [waiter.deadline - now, 1.0]
+        if state.paused_until > now:
+            delays.append(state.paused_until - now)
+        if state.token_window:
+            delays.append(state.token_window[0][0] + state.window_seconds - now)
+        return max(0.005, min(delays))
+
+    def _enqueue(self, model: str, priority: Priority, tokens: int, **signal: Any) -> Tuple[_ModelState, _Waiter]:
+        timeout = self.queue_timeouts.get(priority, 60.0)
+        waiter = _Waiter(int(priority), next(self._seq), tokens, time.monotonic() + timeout, **signal)
+        state = self._state(model)
+        heapq.heappush(state.waiters, waiter)
+        self._dispatch(state)
+        return state, waiter
+
+    def _check_deadline(self, model: str, state: _ModelState, waiter: _Waiter) -> bool:
+        """Return True if the waiter got its slot; raise if its deadline passed (lock must be held)."""
+        if waiter.granted:
+            return True
+        if time.monotonic() >= waiter.deadline:
+            waiter.cancelled = True
+            raise LLMQueueTimeout(f"No {model} slot available within the {Priority(waiter.priority).name.lower()} deadline.")
+        self._dispatch(state)
+        return waiter.granted
+
+    def acquire(self, model: str, priority: Priority, tokens: int) -> List[float]:
+        """Wait for a slot; returns the usage entry to hand back to `release`."""
+        with self._lock:
+            state, waiter = self._enqueue(model, priority, tokens, event=threading.Event())
+        while True:
+            waiter.event.wait(self._next_wakeup(state, waiter))
+            with self._lock:
+                if self._check_deadline(model, state, waiter):
+                    return waiter.usage
+
+    async def aacquire(self, model: str, priority: Priority, tokens: int) -> List[float]:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        with self._lock:
+            state, waiter = self._enqueue(model, priority, tokens, future=future, loop=loop)
+        try:
+            while True:
+                try:
+                    await asyncio.wait_for(asyncio.shield(future), self._next_wakeup(state, waiter))
+                except asyncio.TimeoutError:
+                    pass
+                with self._lock:
+                    if self._check_deadline(model, state, waiter):
+                        return waiter.usage
+        except asyncio.CancelledError:
+            with self._lock:
+                if waiter.granted:
+                    self._release_locked(state)
+                else:
+                    waiter.cancelled = True
+            raise
+
+    def _release_locked(self, state: _ModelState) -> None:
+        state.in_flight -= 1
+        self._dispatch(state)
+
+    def release(self, model: str, usage: Optional[List[float]] = None) -> None:
+        with self._lock:
+            state = self._state(model)
+            if usage is not None:
+                # The provider counts tokens when the request reaches it, somewhere between
+                # our grant and the response; re-stamping at completion keeps us on the safe side.
+                try:
+                    state.token_window.remove(usage)
+                except ValueError:
+                    state.tokens_in_window += usage[1]
+                usage[0] = time.monotonic()
+                state.token_window.append(usage)
+            self._release_locked(state)
+
+    def pause(self, model: str, seconds: float) -> None:
+        """Stop granting slots for `model` for `seconds` (provider asked us to back off)."""
+        with self._lock:
+            state = self._state(model)
+            state.paused_until = max(state.paused_until, time.monotonic() + seconds)
+
+    def _backoff_delay(self, exc: BaseException, attempt: int) -> Optional[float]:
+        retry_after = get_retry_after(exc)
+        if retry_after is None or attempt >= self.max_rate_limit_retries:
+            return None
+        return retry_after or self.backoff_base_seconds * (2 ** attempt)
+
+    # --- Execution ---
+    def run(self, model: str, priority: Priority, input: Any, call: Callable[[], Any]) -> Any:
+        tokens = estimate_tokens(input)
+        priority_label = Priority(priority).name.lower()
+        for attempt in itertools.count():
+            queued_at = time.perf_counter()
+            usage = self.acquire(model, priority, tokens)
+            started = time.perf_counter()
+            LLM_QUEUE_WAIT.labels(model=model, priority=priority_label).observe(started - queued_at)
+            outcome = "error"
+            try:
+                result = call()
+                outcome = "ok"
+                return result
+            except Exception as e:
+                delay = self._backoff_delay(e, attempt)
+                if delay is None:
+                    raise
+                outcome = "rate_limited"
+                print(f"LLM scheduler: {model} rate limited, pausing {delay:.1f}s (attempt {attempt + 1})")
+                self.pause(model, delay)
+            finally:
+                LLM_CALL_DURATION.labels(model=model, priority=priority_label, outcome=outcome).observe(time.perf_counter() - started)
+                self.release(model, usage)
+
+    async def arun(self, model: str, priority: Priority, input: Any, call: Callable[[], Awaitable[Any]]) -> Any:
+        tokens = estimate_tokens(input)
+        priority_label = Priority(priority).name.lower()
+        for attempt in itertools.count():
+            queued_at = time.perf_counter()
+            usage = await self.aacquire(model, priority, tokens)
+            started = time.perf_counter()
+            LLM_QUEUE_WAIT.labels(model=model, priority=priority_label).observe(started - queued_at)
+            outcome = "error"
+            try:
+                result = await call()
+                outcome = "ok"
+                return result
+            except Exception as e:
+                delay = self._backoff_delay(e, attempt)
+                if delay is None:
+                    raise
+                outcome = "rate_limited"
+                print(f"LLM scheduler: {model} rate limited, pausing {delay:.1f}s (attempt {attempt + 1})")
+                self.pause(model, delay)
+            finally:
+                LLM_CALL_DURATION.labels(model=model, priority=priority_label, outcome=outcome).observe(time.perf_counter() - started)
+                self.release(model, usage)
+
+    def wrap(self, client: Runnable, priority: Priority) -> "ScheduledModel":
+        model_name = str(getattr(client, "model", None) or getattr(client, "model_name", None) or type(client).__name__)
+        return ScheduledModel(client, self, model_name.removeprefix("models/"), priority)
+
+
+def _resolve_future(future: asyncio.Future) -> None:
+    if not future.done():
+        future.set_result(None)
+
+
+# Methods of the wrapped client whose result is itself a model call to schedule
+# (`bind`, `with_config`, ... are inherited from Runnable and already wrap this object)
+_WRAPPED_FACTORIES = {"bind_tools", "with_structured_output"}
+
+
+class ScheduledModel(Runnable):
+    """A chat model (or a runnable derived from one) whose calls go through the LLMScheduler.
+
+    Attribute access is delegated to the wrapped runnable; `bind_tools`,
+    `with_structured_output` and friends return scheduled runnables as well.
+    """
+
+    def __init__(self, runnable: Runnable, scheduler: LLMScheduler, model_name: str, priority: Priority):
+        self.runnable = runnable
+        self.scheduler = scheduler
+        self.model_name = model_name
+        self.priority = priority
+
+    def with_priority(self, priority: Priority) -> "ScheduledModel":
+        return ScheduledModel(self.runnable, self.scheduler, self.model_name, priority)
+
+    def _priority(self) -> Priority:
+        override = priority_override.get()
+        return self.priority if override is None else override
+
+    def invoke(self, input: Any, config: Optional[RunnableConfig] = None, **kwargs: Any) -> Any:
+        return self.scheduler.run(
+            self.model_name, self._priority(), input, lambda: self.runnable.invoke(input, config, **kwargs)
+        )
+
+    async def ainvoke(self, input: Any, config: Optional[RunnableConfig] = None, **kwargs: Any) -> Any:
+        return await self.scheduler.arun(
+            self.model_name, self._priority(), input, lambda: self.runnable.ainvoke(input, config, **kwargs)
+        )
+
+    def __getattr__(self, name: str) -> Any:
+        if name == "runnable":
+            raise AttributeError(name)
+        attr = getattr(self.runnable, name)
+        if name in _WRAPPED_FACTORIES:
+            def factory(*args: Any, **kwargs: Any) -> "ScheduledModel":
+                return ScheduledModel(attr(*args, **kwargs), self.scheduler, self.model_name, self.priority)
+            return factory
+        return attr
+
+
+llm_scheduler = LLMScheduler(
+    default_quota=ModelQuota(
+        max_concurrency=settings.LLM_MAX_CONCURRENCY,
+        tokens_per_minute=settings.LLM_TOKENS_PER_MINUTE,
+    ),
+    quotas={model: ModelQuota(**quota) for model, quota in settings.LLM_MODEL_QUOTAS.items()},
+    queue_timeouts={Priority[name.upper()]: seconds for name, seconds in settings.LLM_QUEUE_TIMEOUT_SECONDS.items()},
+    max_rate_limit_retries=settings.LLM_MAX_RATE_LIMIT_RETRIES,
+)
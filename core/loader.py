@@ -1,15 +1,25 @@
 from langchain_community.document_loaders import PyPDFLoader
 from langchain_core.documents import Document
+import asyncio
+import io
 import tempfile
 import os
-from typing import List
+import zipfile
+from html.parser import HTMLParser
+from typing import Callable, Dict, List, Optional
+from xml.etree import ElementTree
 
 async def load_pdf_from_bytes(file_bytes: bytes, filename: str) -> List[Document]:
     """
     Loads PDF content from bytes using PyPDFLoader.
     Each page of the PDF is returned as a separate Langchain Document,
     with specific metadata: "source" (original filename) and "page" (page number).
+    Parsing runs in a worker thread, so the event loop keeps serving requests and
+    other files' network-bound indexing meanwhile.
     """
+    return await asyncio.to_thread(_load_pdf, file_bytes, filename)
+
+def _load_pdf(file_bytes: bytes, filename: str) -> List[Document]:
     with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as temp_file:
         temp_file.write(file_bytes)
         temp_file_path = temp_file.name
@@ -48,3 +58,118 @@ async def load_pdf_from_bytes(file_bytes: bytes, filename: str) -> List[Document
             os.remove(temp_file_path)
             
     return processed_documents
+
+
+def _decode_text(file_bytes: bytes) -> str:
+    try:
+        return file_bytes.decode("utf-8-sig")
+    except UnicodeDecodeError:
+        # Legacy exports (Windows-1252 / Latin-1); every byte sequence decodes
+        return file_bytes.decode("latin-1")
+
+def _text_document(text: str, filename: str) -> List[Document]:
+    """A single Document for formats without pages, or none if there is no text."""
+    text = text.strip()
+    if not text:
+        return []
+    return [Document(page_content=text, metadata={"source": filename, "page": 1})]
+
+
+_WORD_NAMESPACE = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+
+def _load_docx(file_bytes: bytes, filename: str) -> List[Document]:
+    """Paragraph text of a .docx (body and tables, in document order), read with the standard library."""
+    with zipfile.ZipFile(io.BytesIO(file_bytes)) as docx:
+        root = ElementTree.fromstring(docx.read("word/document.xml"))
+    paragraphs = []
+    for paragraph in root.iter(f"{_WORD_NAMESPACE}p"):
+        parts = []
+        for node in paragraph.iter():
+            if node.tag == f"{_WORD_NAMESPACE}t" and node.text:
+                parts.append(node.text)
+            elif node.tag == f"{_WORD_NAMESPACE}tab":
+                parts.append("\t")
+            elif node.tag in (f"{_WORD_NAMESPACE}br", f"{_WORD_NAMESPACE}cr"):
+                parts.append("\n")
+        paragraphs.append("".join(parts))
+    return _text_document("\n".join(paragraphs), filename)
+
+
+class _HTMLText(HTMLParser):
+    """Visible text of an HTML page, with a line break at every block element."""
+
+    _SKIPPED = {"script", "style", "noscript", "template", "svg", "head"}
+    _BLOCKS = {
+        "p", "div", "br", "li", "tr", "table", "section", "article", "header", "footer",
+        "h1", "h2", "h3", "h4", "h5", "h6", "pre", "blockquote", "title", "dd", "dt",
+    }
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.parts: List[str] = []
+        self._skipping = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in self._SKIPPED:
+            self._skipping += 1
+        elif tag in self._BLOCKS:
+            self.parts.append("\n")
+
+    def handle_endtag(self, tag):
+        if tag in self._SKIPPED:
+            self._skipping = max(0, self._skipping - 1)
+        elif tag in self._BLOCKS:
+            self.parts.append("\n")
+
+    def handle_data(self, data):
+        if not self._skipping:
+            self.parts.append(data)
+
+    def text(self) -> str:
+        lines = (" ".join(line.split()) for line in "".join(self.parts).splitlines())
+        return "\n".join(line for line in lines if line)
+
+def _load_html(file_bytes: bytes, filename: str) -> List[Document]:
+    parser = _HTMLText()
+    parser.feed(_decode_text(file_bytes))
+    parser.close()
+    return _text_document(parser.text(), filename)
+
+def _load_text(file_bytes: bytes, filename: str) -> List[Document]:
+    return _text_document(_decode_text(file_bytes), filename)
+
+
+# Loader per file extension; each returns the file's Documents with "source" and "page" metadata
+LOADERS: Dict[str, Callable[[bytes, str], List[Document]]] = {
+    ".pdf": _load_pdf,
+    ".docx": _load_docx,
+    ".html": _load_html,
+    ".htm": _load_html,
+    ".txt": _load_text,
+    ".md": _load_text,
+}
+
+# For uploads whose name has no known extension
+CONTENT_TYPE_EXTENSIONS: Dict[str, str] = {
+    "application/pdf": ".pdf",
+    "application/vnd.openxmlformats-officedocument.wordprocessingml.document": ".docx",
+    "text/html": ".html",
+    "text/plain": ".txt",
+    "text/markdown": ".md",
+}
+
+def document_extension(filename: str) -> str:
+    return os.path.splitext(filename)[1].lower()
+
+def is_supported_document(filename: str) -> bool:
+    return document_extension(filename) in LOADERS
+
+def load_document(file_bytes: bytes, filename: str) -> List[Document]:
+    """
+    Parses a document with the loader of its format, picked by file extension.
+    Synchronous and CPU-bound: call it from a worker thread or process.
+    """
+    loader: Optional[Callable[[bytes, str], List[Document]]] = LOADERS.get(document_extension(filename))
+    if loader is None:
+        raise ValueError(f"Unsupported document type: {filename}")
+    return loader(file_bytes, filename)
@@ -1,5 +1,41 @@
-from mem0 import MemoryClient
+import functools
+
 from core.config import settings
+from core.metrics import MEMORY_DURATION, timed
+from core.offline import FakeMemoryClient
+
+# Client methods whose duration is recorded (the operation name is the metric label)
+_TIMED_METHODS = {"add", "search", "get_all", "delete", "delete_all"}
+
+
+class InstrumentedMemoryClient:
+    """Proxy recording the duration of mem0 calls; everything else is delegated."""
+
+    def __init__(self, client):
+        self.client = client
+
+    def __getattr__(self, name):
+        attr = getattr(self.client, name)
+        if name not in _TIMED_METHODS:
+            return attr
+
+        @functools.wraps(attr)
+        def timed_call(*args, **kwargs):
+            with timed(MEMORY_DURATION, operation=name):
+                return attr(*args, **kwargs)
+        return timed_call
+
+
+@functools.lru_cache(maxsize=1)
+def get_memory_client() -> InstrumentedMemoryClient:
+    """The shared mem0 client, created on first use.
+
+    `MemoryClient` validates the API key against the service when constructed, and the
+    mem0 package takes about a second to import, so neither happens at import time.
+    """
+    if settings.OFFLINE_MODE:
+        return InstrumentedMemoryClient(FakeMemoryClient(latency_seconds=settings.OFFLINE_SERVICE_LATENCY_SECONDS))
 
+    from mem0 import MemoryClient
 
-mem0_client = MemoryClient(api_key=settings.MEM0_API_KEY)
+    return InstrumentedMemoryClient(MemoryClient(api_key=settings.MEM0_API_KEY))
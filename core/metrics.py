@@ -0,0 +1,129 @@
+"""Prometheus metrics for the RAG backend, exposed at `/metrics`.
+
+Labels only take values from small, fixed sets (graph node names, configured model
+names, priority classes, statement types, statuses) so cardinality stays bounded.
+Recording a sample is a lock-protected float update, cheap enough for the hot path.
+"""
+import time
+from contextlib import contextmanager
+from typing import Iterator
+
+from prometheus_client import Counter, Gauge, Histogram
+from sqlalchemy import event
+
+# Model calls take seconds; DB and vector store calls milliseconds
+_LLM_BUCKETS = (0.1, 0.25, 0.5, 1, 2, 4, 8, 15, 30, 60, 120)
+_IO_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+GRAPH_NODE_DURATION = Histogram(
+    "rag_graph_node_duration_seconds", "Time spent in each graph node.", ["node"], buckets=_LLM_BUCKETS
+)
+LLM_CALL_DURATION = Histogram(
+    "rag_llm_call_duration_seconds",
+    "LLM call duration (excluding scheduler queueing), by model, priority class and outcome.",
+    ["model", "priority", "outcome"],
+    buckets=_LLM_BUCKETS,
+)
+LLM_QUEUE_WAIT = Histogram(
+    "rag_llm_queue_wait_seconds", "Time LLM calls waited for a scheduler slot.", ["model", "priority"], buckets=_IO_BUCKETS
+)
+EMBEDDING_DURATION = Histogram(
+    "rag_embedding_duration_seconds", "Embedding call duration.", ["operation"], buckets=_IO_BUCKETS
+)
+EMBEDDING_BATCH_SIZE = Histogram(
+    "rag_embedding_batch_texts",
+    "Texts per document embedding request sent by the cross-file batcher.",
+    buckets=(1, 8, 16, 32, 64, 128, 256, 512, 1024, 2048),
+)
+VECTOR_STORE_DURATION = Histogram(
+    "rag_vector_store_duration_seconds",
+    "Vector store call duration (includes embedding the query / documents).",
+    ["operation"],
+    buckets=_IO_BUCKETS,
+)
+MEMORY_DURATION = Histogram(
+    "rag_memory_call_duration_seconds", "mem0 call duration.", ["operation"], buckets=_IO_BUCKETS
+)
+DB_QUERY_DURATION = Histogram(
+    "rag_db_query_duration_seconds", "Database statement duration, by statement type.", ["statement"], buckets=_IO_BUCKETS
+)
+
+RETRIEVAL_LOOPS = Histogram(
+    "rag_retrieval_loops", "Query rewrite loops per chat turn.", buckets=(0, 1, 2, 3, 5)
+)
+DOCUMENT_SCORES = Counter(
+    "rag_document_scores_total", "Relevance scores given to retrieved documents.", ["score"]
+)
+UPLOAD_FILE_STATES = Counter(
+    "rag_upload_file_transitions_total", "Upload file status transitions.", ["status"]
+)
+INGEST_CHUNKS_SAVED = Counter(
+    "rag_ingest_chunks_saved_total",
+    "Chunks kept out of the index by boilerplate stripping and duplicate removal.",
+    ["reason"],
+)
+INGEST_TOKENS_SAVED = Counter(
+    "rag_ingest_tokens_saved_total",
+    "Embedding tokens saved by boilerplate stripping and duplicate removal.",
+    ["reason"],
+)
+ADMISSION_WAIT = Histogram(
+    "rag_admission_wait_seconds", "Time admitted requests waited for a slot.", ["controller"], buckets=_LLM_BUCKETS
+)
+ADMISSION_REJECTED = Counter(
+    "rag_admission_rejected_total", "Requests shed by admission control (answered with 429).", ["controller", "reason"]
+)
+ADMISSION_QUEUE_DEPTH = Gauge(
+    "rag_admission_queued", "Requests waiting for an admission slot.", ["controller"]
+)
+ADMISSION_IN_FLIGHT = Gauge(
+    "rag_admission_in_flight", "Requests holding an admission slot.", ["controller"]
+)
+LLM_CACHE_REQUESTS = Counter(
+    "rag_llm_cache_requests_total", "Persistent LLM cache lookups.", ["model", "result"]
+)
+SINGLEFLIGHT_CALLS = Counter(
+    "rag_singleflight_calls_total", "Calls through single-flight groups.", ["group", "result"]
+)
+SPECULATIVE_RETRIEVALS = Counter(
+    "rag_speculative_retrievals_total", "Speculative retrieval outcomes.", ["outcome"]
+)
+SPECULATION_SECONDS_SAVED = Counter(
+    "rag_speculative_retrieval_seconds_saved_total",
+    "Retrieval time that speculative hits overlapped with the router call.",
+)
+
+_SQL_STATEMENTS = {"SELECT", "INSERT", "UPDATE", "DELETE"}
+
+
+@contextmanager
+def timed(histogram: Histogram, **labels: str) -> Iterator[None]:
+    """Observe the duration of the block, whether or not it raises."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        histogram.labels(**labels).observe(time.perf_counter() - started)
+
+
+def statement_type(statement: str) -> str:
+    keyword = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else ""
+    return keyword if keyword in _SQL_STATEMENTS else "OTHER"
+
+
+def instrument_engine(engine) -> None:
+    """Record the duration of every statement executed through `engine`."""
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_started_at", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info["query_started_at"].pop()
+        DB_QUERY_DURATION.labels(statement=statement_type(statement)).observe(time.perf_counter() - started)
+
+    @event.listens_for(engine, "handle_error")
+    def _error(exception_context):
+        connection = exception_context.connection
+        if connection is not None and connection.info.get("query_started_at"):
+            connection.info["query_started_at"].pop()
@@ -0,0 +1,239 @@
+"""Deterministic local stand-ins for the external services, used when `settings.OFFLINE_MODE` is on.
+
+- `FakeChatModel` replaces Gemini: configurable latency, tool calls and structured output.
+- `HashingEmbeddings` replaces OpenAI embeddings: feature-hashed bag of words, so texts
+  sharing words are close to each other.
+- `FakeMemoryClient` replaces the mem0 client with an in-process store.
+
+The vector store is LangChain's `InMemoryVectorStore` (see core/vectorstore.py).
+Every output depends only on the input, so runs are reproducible.
+"""
+import asyncio
+import hashlib
+import math
+import re
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Sequence
+
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from langchain_core.utils.function_calling import convert_to_openai_tool
+
+_WORD_RE = re.compile(r"\w+")
+
+
+def _stable_hash(text: str) -> int:
+    return int.from_bytes(hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+def _unit_interval(text: str) -> float:
+    """Deterministic pseudo-random number in [0, 1) derived from `text`."""
+    return _stable_hash(text) / 2**64
+
+
+# --- Chat model ---
+class FakeChatModel(BaseChatModel):
+    """Offline chat model with deterministic answers.
+
+    When tools are bound, the model calls the first one for a share of the user messages
+    (`tool_call_probability`, decided by a hash of the message). With `tool_choice` set,
+    as `with_structured_output` does, it always calls the tool with arguments generated
+    from the tool's JSON schema.
+    """
+
+    model: str = "fake-chat-model"
+    temperature: float = 0.0
+    latency_seconds: float = 0.0
+    tool_call_probability: float = 0.8
+    answer_words: int = 60
+
+    @property
+    def _llm_type(self) -> str:
+        return "offline-fake-chat"
+
+    @property
+    def _identifying_params(self) -> Dict[str, Any]:
+        return {"model": self.model, "temperature": self.temperature}
+
+    def bind_tools(self, tools: Sequence[Any], *, tool_choice: Optional[Any] = None, **kwargs: Any):
+        formatted_tools = [convert_to_openai_tool(tool) for tool in tools]
+        if tool_choice is not None:
+            kwargs["tool_choice"] = tool_choice
+        return self.bind(tools=formatted_tools, **kwargs)
+
+    def _respond(self, messages: List[BaseMessage], tools: Optional[List[dict]], tool_choice: Any) -> AIMessage:
+        prompt = "\n".join(str(message.content) for message in messages)
+        last_human = next((m for m in reversed(messages) if isinstance(m, HumanMessage)), None)
+        last_text = str(last_human.content) if last_human else prompt
+
+        if tools:
+            forced = tool_choice is not None
+            if forced or (
+                isinstance(messages[-1], HumanMessage)
+                and _unit_interval(f"tool:{last_text}") < self.tool_call_probability
+            ):
+                function = tools[0]["function"]
+                args = _fake_arguments(function.get("parameters", {}), last_text, prompt)
+                return AIMessage(
+                    content="",
+                    tool_calls=[{
+                        "name": function["name"],
+                        "args": args,
+                        "id": f"call_{_stable_hash(function['name'] + prompt):016x}",
+                        "type": "tool_call",
+                    }],
+                )
+
+        return AIMessage(content=_fake_text(prompt, self.answer_words))
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager=None, **kwargs: Any) -> ChatResult:
+        if self.latency_seconds:
+            time.sleep(self.latency_seconds)
+        message = self._respond(messages, kwargs.get("tools"), kwargs.get("tool_choice"))
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager=None, **kwargs: Any) -> ChatResult:
+        if self.latency_seconds:
+            await asyncio.sleep(self.latency_seconds)
+        message = self._respond(messages, kwargs.get("tools"), kwargs.get("tool_choice"))
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+
+def _fake_text(seed: str, n_words: int) -> str:
+    """Deterministic text re-using words of the prompt, so it looks topical."""
+    words = _WORD_RE.findall(seed) or ["respuesta"]
+    start = _stable_hash(seed)
+    return " ".join(words[(start + i * 7) % len(words)] for i in range(n_words))
+
+
+def _fake_arguments(schema: Dict[str, Any], query: str, prompt: str) -> Dict[str, Any]:
+    """Arguments matching a JSON schema (`query`-like strings echo the user message)."""
+    definitions = schema.get("$defs", {})
+    return {
+        name: _fake_value(name, field, definitions, query, prompt)
+        for name, field in schema.get("properties", {}).items()
+    }
+
+
+def _fake_value(name: str, field: Dict[str, Any], definitions: Dict[str, Any], query: str, prompt: str) -> Any:
+    if "$ref" in field:
+        field = definitions.get(field["$ref"].rsplit("/", 1)[-1], {})
+    if "anyOf" in field:
+        field = next((option for option in field["anyOf"] if option.get("type") != "null"), {})
+    if "enum" in field:
+        return field["enum"][_stable_hash(name + prompt) % len(field["enum"])]
+
+    field_type = field.get("type")
+    if field_type == "string":
+        return query if name == "query" else _fake_text(f"{name}:{prompt}", 5)
+    if field_type in ("integer", "number"):
+        low = field.get("minimum", field.get("exclusiveMinimum", 0))
+        high = field.get("maximum", field.get("exclusiveMaximum", low + 10))
+        value = low + _unit_interval(f"{name}:{prompt}") * (high - low)
+        return round(value) if field_type == "integer" else value
+    if field_type == "boolean":
+        return _unit_interval(f"{name}:{prompt}") < 0.5
+    if field_type == "array":
+        # One item per numbered line of the prompt ("1. ...", "2. ..."), e.g. batched titles
+        n_items = max(1, len(re.findall(r"^\d+\.\s", prompt, flags=re.MULTILINE)))
+        return [
+            _fake_value(f"{name}{i}", field.get("items", {}), definitions, query, prompt)
+            for i in range(n_items)
+        ]
+    if field_type == "object":
+        return _fake_arguments(field, query, prompt)
+    return None
+
+
+# --- Embeddings ---
+class HashingEmbeddings(Embeddings):
+    """Feature-hashed bag-of-words embeddings (L2-normalized)."""
+
+    def __init__(self, size: int, latency_seconds: float = 0.0):
+        self.size = size
+        self.latency_seconds = latency_seconds
+
+    def _embed(self, text: str) -> List[float]:
+        vector = [0.0] * self.size
+        for word in _WORD_RE.findall(text.lower()):
+            h = _stable_hash(word)
+            vector[h % self.size] += 1.0 if (h >> 32) & 1 else -1.0
+        norm = math.sqrt(sum(v * v for v in vector)) or 1.0
+        return [v / norm for v in vector]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        if self.latency_seconds:
+            time.sleep(self.latency_seconds)
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        if self.latency_seconds:
+            await asyncio.sleep(self.latency_seconds)
+        return [self._embed(text) for text in texts]
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return (await self.aembed_documents([text]))[0]
+
+
+# --- Memory client ---
+class FakeMemoryClient:
+    """In-process replacement for `mem0.MemoryClient` (the subset of its API used by the app).
+
+    Every added message is stored as a memory; search ranks memories by shared words.
+    """
+
+    def __init__(self, latency_seconds: float = 0.0):
+        self.latency_seconds = latency_seconds
+        self._lock = threading.Lock()
+        self._memories: Dict[str, Dict[str, Any]] = {}
+
+    def _wait(self) -> None:
+        if self.latency_seconds:
+            time.sleep(self.latency_seconds)
+
+    def add(self, messages: Any, user_id: str, **kwargs: Any) -> List[Dict[str, Any]]:
+        self._wait()
+        text = messages if isinstance(messages, str) else " ".join(m["content"] for m in messages)
+        now = datetime.now(timezone.utc).isoformat()
+        memory = {"id": str(uuid.uuid4()), "memory": text, "user_id": user_id, "created_at": now, "updated_at": now}
+        with self._lock:
+            self._memories[memory["id"]] = memory
+        return [{"id": memory["id"], "memory": text, "event": "ADD"}]
+
+    def search(self, query: str, filters: Optional[Dict[str, Any]] = None, user_id: Optional[str] = None, limit: int = 5, **kwargs: Any) -> List[Dict[str, Any]]:
+        self._wait()
+        if user_id is None and filters:
+            user_id = next((f["user_id"] for f in filters.get("AND", []) if "user_id" in f), None)
+        query_words = set(_WORD_RE.findall(query.lower()))
+        with self._lock:
+            candidates = [m for m in self._memories.values() if user_id is None or m["user_id"] == user_id]
+        scored = []
+        for memory in candidates:
+            overlap = len(query_words & set(_WORD_RE.findall(memory["memory"].lower())))
+            if overlap:
+                scored.append((overlap / max(1, len(query_words)), memory))
+        scored.sort(key=lambda item: item[0], reverse=True)
+        return [{**memory, "score": score} for score, memory in scored[:limit]]
+
+    def get_all(self, user_id: str, **kwargs: Any) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [dict(m) for m in self._memories.values() if m["user_id"] == user_id]
+
+    def delete(self, memory_id: str) -> Dict[str, str]:
+        with self._lock:
+            self._memories.pop(memory_id, None)
+        return {"message": "Memory deleted successfully!"}
+
+    def delete_all(self, user_id: str) -> Dict[str, str]:
+        with self._lock:
+            for memory_id in [i for i, m in self._memories.items() if m["user_id"] == user_id]:
+                del self._memories[memory_id]
+        return {"message": "Memories deleted successfully!"}
@@ -0,0 +1,108 @@
+import asyncio
+import inspect
+from typing import Any, Callable, List, Optional, Set, Tuple
+
+from core.config import settings
+from database import crud, models
+from database.database import async_session
+from utils.helper import generate_thread_titles
+
+
+class PostResponsePipeline:
+    """Runs non-critical work (thread titles, memory extraction, bookkeeping) after the answer is returned.
+
+    Titles are queued and generated in batches across threads; any other work is
+    scheduled as a fire-and-forget task. Failures are logged and never reach the user.
+    """
+
+    def __init__(self, *, title_batch_size: int, title_batch_wait_seconds: float):
+        self.title_batch_size = title_batch_size
+        self.title_batch_wait_seconds = title_batch_wait_seconds
+        self._title_queue: Optional[asyncio.Queue] = None
+        self._title_worker: Optional[asyncio.Task] = None
+        self._tasks: Set[asyncio.Task] = set()
+
+    # --- Lifecycle ---
+    def _ensure_started(self) -> None:
+        if self._title_worker is None or self._title_worker.done():
+            self._title_queue = asyncio.Queue()
+            self._title_worker = asyncio.create_task(self._run_title_worker())
+
+    async def start(self) -> None:
+        self._ensure_started()
+
+    async def stop(self) -> None:
+        """Flush queued titles and wait for in-flight tasks."""
+        if self._title_worker is not None and not self._title_worker.done():
+            await self._title_queue.put(None)
+            await self._title_worker
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    # --- Scheduling ---
+    def schedule(self, func: Callable[..., Any], *args: Any, **kwargs: Any) -> None:
+        """Run `func` in the background; sync callables are moved off the event loop."""
+        if inspect.iscoroutinefunction(func):
+            coroutine = func(*args, **kwargs)
+        else:
+            coroutine = asyncio.to_thread(func, *args, **kwargs)
+        task = asyncio.create_task(self._run_task(getattr(func, "__name__", repr(func)), coroutine))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    def schedule_title(self, thread_id: str, message: str) -> None:
+        self._ensure_started()
+        self._title_queue.put_nowait((thread_id, message))
+
+    @staticmethod
+    async def _run_task(name: str, coroutine) -> None:
+        try:
+            await coroutine
+        except Exception as e:
+            print(f"Post-response task '{name}' failed: {e}")
+
+    # --- Thread titles ---
+    async def _run_title_worker(self) -> None:
+        loop = asyncio.get_running_loop()
+        stopping = False
+        while not stopping:
+            item = await self._title_queue.get()
+            if item is None:
+                break
+            batch: List[Tuple[str, str]] = [item]
+
+            # Collect more requests until the batch is full or the wait window closes
+            deadline = loop.time() + self.title_batch_wait_seconds
+            while len(batch) < self.title_batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._title_queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+
+            await self._run_task("generate_thread_titles", self._generate_titles(batch))
+
+    async def _generate_titles(self, batch: List[Tuple[str, str]]) -> None:
+        titles = await generate_thread_titles([message for _, message in batch])
+        await self._save_titles([(thread_id, title) for (thread_id, _), title in zip(batch, titles)])
+
+    @staticmethod
+    async def _save_titles(thread_titles: List[Tuple[str, str]]) -> None:
+        async with async_session() as db:
+            for thread_id, title in thread_titles:
+                db_thread = await crud.get_thread_by_id(db, thread_id=thread_id)
+                # Don't overwrite a title the user set in the meantime
+                if title and db_thread and db_thread.title == "New Chat":
+                    await crud.update_thread(db, thread_id=thread_id, thread_update=models.ThreadUpdate(title=title))
+
+
+post_response_pipeline = PostResponsePipeline(
+    title_batch_size=settings.TITLE_BATCH_SIZE,
+    title_batch_wait_seconds=settings.TITLE_BATCH_WAIT_SECONDS,
+)
@@ -0,0 +1,50 @@
+"""CPU-bound ingestion work (parsing and splitting documents) off the event loop.
+
+Parsing holds the GIL, so worker threads parse one document at a time however many
+files are in flight. With `INGEST_PROCESS_WORKERS` > 0 that work runs in a pool of
+worker processes instead. The pool is created on first use and shut down with the app.
+Workers are spawned, not forked, because the app already runs threads and an event loop.
+
+A worker that dies (e.g. out of memory on a huge file) breaks the whole pool. The file
+that was running fails, and the next file gets a new pool.
+"""
+import asyncio
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import lru_cache
+from typing import Any, Callable, TypeVar
+
+from core.config import settings
+
+T = TypeVar("T")
+
+
+@lru_cache(maxsize=1)
+def get_process_pool() -> ProcessPoolExecutor:
+    return ProcessPoolExecutor(
+        max_workers=settings.INGEST_PROCESS_WORKERS,
+        mp_context=multiprocessing.get_context("spawn"),
+    )
+
+
+async def run_cpu_bound(func: Callable[..., T], *args: Any) -> T:
+    """Run `func(*args)` in the process pool, or in a worker thread if the pool is disabled.
+
+    `func` and its arguments must be picklable (module-level function, plain data).
+    """
+    if settings.INGEST_PROCESS_WORKERS <= 0:
+        return await asyncio.to_thread(func, *args)
+    pool = get_process_pool()
+    try:
+        return await asyncio.get_running_loop().run_in_executor(pool, func, *args)
+    except BrokenProcessPool:
+        if get_process_pool.cache_info().currsize and get_process_pool() is pool:
+            get_process_pool.cache_clear()
+        raise
+
+
+def shutdown_process_pool() -> None:
+    if get_process_pool.cache_info().currsize:
+        get_process_pool().shutdown(wait=True, cancel_futures=True)
+        get_process_pool.cache_clear()
@@ -0,0 +1,310 @@
+"""Opt-in per-request profiling: a CPU profile and a task timeline for one request.
+
+A request is profiled when it carries `X-Profile-Token: <PROFILING_ADMIN_TOKEN>`, or
+when it is picked by `PROFILING_SAMPLE_RATE` (only paths under `PROFILING_SAMPLED_PATHS`).
+Three files are written to `PROFILING_OUTPUT_DIR`, named after the `X-Profile-Id`
+response header:
+
+- `<id>.prof`: cProfile stats (`python -m pstats`, snakeviz), loop thread and worker
+  threads merged;
+- `<id>.trace.json`: Chrome trace events (chrome://tracing, ui.perfetto.dev) with the
+  graph nodes, LLM and tool calls (one track each, labelled with their asyncio task),
+  worker-thread jobs and database statements;
+- `<id>.txt`: the top functions by cumulative time.
+
+The event loop is shared, so the loop-thread profile also sees other requests' coroutines
+running meanwhile, and only one request at a time gets it. Sync graph nodes run in the
+loop's default executor, which is profiled per job for the request that submitted it.
+
+Nothing here is installed unless profiling is configured (`profiling_enabled()`), so
+there is no overhead at all when it is off.
+"""
+import asyncio
+import cProfile
+import hmac
+import io
+import json
+import os
+import pstats
+import random
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+from sqlalchemy import event
+from starlette.datastructures import MutableHeaders
+
+from core.config import settings
+from core.metrics import statement_type
+
+PROFILE_TOKEN_HEADER = b"x-profile-token"
+PROFILE_ID_HEADER = "X-Profile-Id"
+
+current_profile: ContextVar[Optional["RequestProfile"]] = ContextVar("current_profile", default=None)
+
+_loop_profiler_lock = threading.Lock()  # cProfile allows one active profiler per thread
+
+
+def profiling_enabled() -> bool:
+    return settings.PROFILING_SAMPLE_RATE > 0 or bool(settings.PROFILING_ADMIN_TOKEN)
+
+
+def _task_name() -> Optional[str]:
+    try:
+        task = asyncio.current_task()
+    except RuntimeError:  # Not on the event loop thread
+        return None
+    return task.get_name() if task is not None else None
+
+
+class RequestProfile:
+    """CPU profiles and timeline events collected for one request, from any thread."""
+
+    def __init__(self, method: str, path: str, reason: str):
+        self.id = uuid.uuid4().hex[:12]
+        self.method = method
+        self.path = path
+        self.reason = reason
+        self.started_at = datetime.now(timezone.utc)
+        self._started = time.perf_counter()
+        self._lock = threading.Lock()
+        self._events: List[Dict[str, Any]] = []
+        self._threads: Dict[int, str] = {}
+        self._profilers: List[cProfile.Profile] = []
+        self._loop_profiler: Optional[cProfile.Profile] = None
+
+    def _timestamp(self, at: Optional[float] = None) -> float:
+        return ((time.perf_counter() if at is None else at) - self._started) * 1e6  # Trace events use microseconds
+
+    def _add(self, trace_event: Dict[str, Any]) -> None:
+        thread = threading.current_thread()
+        trace_event.setdefault("pid", 1)
+        trace_event.setdefault("tid", thread.ident)
+        with self._lock:
+            self._threads[thread.ident] = thread.name
+            self._events.append(trace_event)
+
+    def span(self, name: str, category: str, started: float, args: Optional[Dict[str, Any]] = None) -> None:
+        """Record `[started, now]` on the current thread's track."""
+        self._add({
+            "name": name, "cat": category, "ph": "X",
+            "ts": self._timestamp(started), "dur": (time.perf_counter() - started) * 1e6, "args": args or {},
+        })
+
+    def begin(self, run_id: UUID, name: str, category: str, args: Dict[str, Any]) -> None:
+        """Open an async span: concurrent runs get their own tracks instead of nesting on a thread."""
+        self._add({"name": name, "cat": category, "ph": "b", "id": str(run_id), "ts": self._timestamp(), "args": args})
+
+    def end(self, run_id: UUID, name: str, category: str, args: Dict[str, Any]) -> None:
+        self._add({"name": name, "cat": category, "ph": "e", "id": str(run_id), "ts": self._timestamp(), "args": args})
+
+    # --- CPU profiles ---
+    def start_loop_profiler(self) -> None:
+        if sys.getprofile() is not None or not _loop_profiler_lock.acquire(blocking=False):
+            return  # Another request (or a debugger) owns this thread's profiler: timeline only
+        self._loop_profiler = cProfile.Profile()
+        self._loop_profiler.enable()
+
+    def stop_loop_profiler(self) -> None:
+        if self._loop_profiler is None:
+            return
+        self._loop_profiler.disable()
+        with self._lock:
+            self._profilers.append(self._loop_profiler)
+        _loop_profiler_lock.release()
+
+    def run_profiled(self, fn, *args, **kwargs):
+        """Run a worker-thread job under its own profiler and record it on the timeline."""
+        profiler = cProfile.Profile() if sys.getprofile() is None else None
+        started = time.perf_counter()
+        if profiler is not None:
+            profiler.enable()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            if profiler is not None:
+                profiler.disable()
+                with self._lock:
+                    self._profilers.append(profiler)
+            self.span("executor job", "thread", started)
+
+    # --- Output ---
+    def _merged_stats(self) -> Optional[pstats.Stats]:
+        stats = None
+        for profiler in self._profilers:
+            try:
+                if stats is None:
+                    stats = pstats.Stats(profiler)
+                else:
+                    stats.add(profiler)
+            except TypeError:  # Profiler that recorded nothing
+                continue
+        return stats
+
+    def save(self, directory: str) -> None:
+        os.makedirs(directory, exist_ok=True)
+        prefix = os.path.join(directory, f"{self.started_at:%Y%m%d-%H%M%S}-{self.id}")
+        duration = time.perf_counter() - self._started
+        header = f"{self.method} {self.path} ({self.reason}), {duration * 1000:.1f} ms, {self.started_at.isoformat()}"
+
+        with self._lock:
+            trace_events = list(self._events)
+            threads = dict(self._threads)
+        trace_events += [
+            {"name": "thread_name", "ph": "M", "pid": 1, "tid": tid, "args": {"name": name}}
+            for tid, name in threads.items()
+        ]
+        with open(f"{prefix}.trace.json", "w", encoding="utf-8") as f:
+            json.dump({
+                "traceEvents": trace_events,
+                "displayTimeUnit": "ms",
+                "otherData": {"request": f"{self.method} {self.path}", "reason": self.reason, "profile_id": self.id},
+            }, f)
+
+        stats = self._merged_stats()
+        summary = io.StringIO()
+        summary.write(header + "\n")
+        if stats is None:
+            summary.write("No CPU profile captured (the loop-thread profiler was busy).\n")
+        else:
+            stats.dump_stats(f"{prefix}.prof")
+            stats.stream = summary
+            stats.sort_stats("cumulative").print_stats(40)
+        with open(f"{prefix}.txt", "w", encoding="utf-8") as f:
+            f.write(summary.getvalue())
+        print(f"INFO:     Profile for {header} saved to {prefix}.*")
+
+
+class ProfilingCallbackHandler(BaseCallbackHandler):
+    """Timeline spans for the graph nodes, LLM calls and tool calls of one profiled request."""
+
+    run_inline = True
+
+    def __init__(self, profile: RequestProfile):
+        self.profile = profile
+        self._runs: Dict[UUID, tuple] = {}
+
+    def _begin(self, run_id: UUID, name: str, category: str, metadata: Optional[Dict[str, Any]]) -> None:
+        self._runs[run_id] = (name, category)
+        self.profile.begin(run_id, name, category, {
+            "node": (metadata or {}).get("langgraph_node"),
+            "task": _task_name(),
+            "thread": threading.current_thread().name,
+        })
+
+    def _end(self, run_id: UUID, error: Optional[BaseException] = None) -> None:
+        run = self._runs.pop(run_id, None)
+        if run is not None:
+            args = {"error": type(error).__name__} if error is not None else {}
+            self.profile.end(run_id, *run, args)
+
+    def on_chain_start(self, serialized, inputs, *, run_id: UUID, metadata=None, **kwargs: Any) -> None:
+        node = (metadata or {}).get("langgraph_node")
+        if node is not None and kwargs.get("name") == node:
+            self._begin(run_id, node, "node", metadata)
+
+    def on_chain_end(self, outputs, *, run_id: UUID, **kwargs: Any) -> None:
+        self._end(run_id)
+
+    def on_chain_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        self._end(run_id, error)
+
+    def on_chat_model_start(self, serialized, messages, *, run_id: UUID, metadata=None, **kwargs: Any) -> None:
+        self._begin(run_id, (metadata or {}).get("ls_model_name") or kwargs.get("name") or "chat_model", "llm", metadata)
+
+    def on_llm_start(self, serialized, prompts, *, run_id: UUID, metadata=None, **kwargs: Any) -> None:
+        self._begin(run_id, (metadata or {}).get("ls_model_name") or kwargs.get("name") or "llm", "llm", metadata)
+
+    def on_llm_end(self, response, *, run_id: UUID, **kwargs: Any) -> None:
+        self._end(run_id)
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        self._end(run_id, error)
+
+    def on_tool_start(self, serialized, input_str, *, run_id: UUID, metadata=None, **kwargs: Any) -> None:
+        self._begin(run_id, kwargs.get("name") or (serialized or {}).get("name") or "tool", "tool", metadata)
+
+    def on_tool_end(self, output, *, run_id: UUID, **kwargs: Any) -> None:
+        self._end(run_id)
+
+    def on_tool_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        self._end(run_id, error)
+
+
+class ProfilingExecutor(ThreadPoolExecutor):
+    """Default loop executor that profiles the jobs submitted on behalf of a profiled request."""
+
+    def submit(self, fn, /, *args, **kwargs):
+        profile = current_profile.get()  # Read on the submitting (loop) thread
+        if profile is None:
+            return super().submit(fn, *args, **kwargs)
+        return super().submit(profile.run_profiled, fn, *args, **kwargs)
+
+
+def install_profiling_executor() -> None:
+    asyncio.get_running_loop().set_default_executor(ProfilingExecutor(thread_name_prefix="profiled-worker"))
+
+
+def profile_engine(engine) -> None:
+    """Put the statements executed for a profiled request on its timeline."""
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        if current_profile.get() is not None:
+            conn.info["profile_query_started_at"] = time.perf_counter()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info.pop("profile_query_started_at", None)
+        profile = current_profile.get()
+        if started is not None and profile is not None:
+            profile.span(statement_type(statement), "db", started, {"statement": statement[:200]})
+
+
+class ProfilingMiddleware:
+    """ASGI middleware deciding which requests get profiled and saving their profiles."""
+
+    def __init__(self, app):
+        self.app = app
+
+    def _reason(self, scope) -> Optional[str]:
+        token = settings.PROFILING_ADMIN_TOKEN
+        if token:
+            header = dict(scope["headers"]).get(PROFILE_TOKEN_HEADER)
+            if header is not None and hmac.compare_digest(header, token.encode()):
+                return "admin"
+        if settings.PROFILING_SAMPLE_RATE > 0 and scope["path"].startswith(tuple(settings.PROFILING_SAMPLED_PATHS)):
+            if random.random() < settings.PROFILING_SAMPLE_RATE:
+                return "sampled"
+        return None
+
+    async def __call__(self, scope, receive, send):
+        reason = self._reason(scope) if scope["type"] == "http" else None
+        if reason is None:
+            await self.app(scope, receive, send)
+            return
+
+        profile = RequestProfile(scope["method"], scope["path"], reason)
+
+        async def send_with_profile_id(message):
+            if message["type"] == "http.response.start":
+                MutableHeaders(scope=message).append(PROFILE_ID_HEADER, profile.id)
+            await send(message)
+
+        token = current_profile.set(profile)
+        profile.start_loop_profiler()
+        try:
+            await self.app(scope, receive, send_with_profile_id)
+        finally:
+            profile.stop_loop_profiler()
+            current_profile.reset(token)
+            try:
+                await asyncio.to_thread(profile.save, settings.PROFILING_OUTPUT_DIR)
+            except OSError as e:
+                print(f"WARNING:  Could not save profile {profile.id}: {e}")
@@ -0,0 +1,67 @@
+import asyncio
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional, Set
+
+from core.config import settings
+
+
+class Subscription:
+    """Events of one topic for one listener, oldest first.
+
+    The queue is bounded so a stalled client can't grow memory without limit. When it
+    is full the oldest event is dropped and `lagged` is set. The listener should then
+    reload the current state instead of trusting the events it still has.
+    """
+
+    def __init__(self, max_events: int):
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=max_events)
+        self.lagged = False
+
+    def _put(self, event: Dict[str, Any]) -> None:
+        if self.queue.full():
+            self.queue.get_nowait()
+            self.lagged = True
+        self.queue.put_nowait(event)
+
+    async def get(self, timeout: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """Next event, or None if nothing arrived within `timeout` seconds."""
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout=timeout)
+        except asyncio.TimeoutError:
+            return None
+
+
+class ProgressBroker:
+    """In-process pub/sub of progress events, keyed by topic (e.g. an upload job id).
+
+    Publishing is fire-and-forget and never waits on listeners. Topics nobody listens
+    to cost nothing. The broker keeps no history: a new listener loads the current state
+    from the database and then follows the events. Events only reach listeners in this
+    process, so a deployment with several workers needs sticky routing of the event
+    stream to the worker that runs the job. Publish from the event loop.
+    """
+
+    def __init__(self, *, max_events_per_subscriber: int):
+        self.max_events_per_subscriber = max_events_per_subscriber
+        self._subscriptions: Dict[str, Set[Subscription]] = {}
+
+    @contextmanager
+    def subscribe(self, topic: str) -> Iterator[Subscription]:
+        subscription = Subscription(self.max_events_per_subscriber)
+        self._subscriptions.setdefault(topic, set()).add(subscription)
+        try:
+            yield subscription
+        finally:
+            subscribers = self._subscriptions.get(topic)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscriptions[topic]
+
+    def publish(self, topic: str, event: Dict[str, Any]) -> None:
+        for subscription in tuple(self._subscriptions.get(topic, ())):
+            subscription._put(event)
+
+
+upload_progress = ProgressBroker(max_events_per_subscriber=settings.UPLOAD_EVENTS_QUEUE_SIZE)
+batch_progress = ProgressBroker(max_events_per_subscriber=settings.UPLOAD_EVENTS_QUEUE_SIZE)
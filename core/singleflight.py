@@ -0,0 +1,106 @@
+import asyncio
+import threading
+from concurrent.futures import Future
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, TypeVar
+
+from core.metrics import SINGLEFLIGHT_CALLS
+
+T = TypeVar("T")
+
+
+class _Flight:
+    def __init__(self):
+        self.future: Future = Future()
+        self.waiters = 0
+        self.task: Optional[asyncio.Task] = None
+
+
+class SingleFlight:
+    """Coalesces identical concurrent calls so only one of them reaches the backend.
+
+    The first caller for a key (the leader) executes the call; callers arriving while
+    it is in flight wait for and share its outcome. Nothing is kept once the call
+    completes, so the next call for the key executes again.
+
+    - Errors: the leader's exception is raised to every caller that shared the flight.
+    - Cancellation (async): a cancelled caller only stops waiting. The shared call is
+      cancelled once every caller waiting on it has been cancelled.
+    - `do` blocks the calling thread; use it from sync code (worker threads), and `ado`
+      from the event loop. Both kinds of callers can share the same flight.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._lock = threading.Lock()
+        self._flights: Dict[Hashable, _Flight] = {}
+
+    def _join(self, key: Hashable) -> tuple[_Flight, bool]:
+        """Return the flight for `key` and whether the caller is its leader (lock must be held)."""
+        flight = self._flights.get(key)
+        leader = flight is None
+        if leader:
+            flight = self._flights[key] = _Flight()
+        flight.waiters += 1
+        SINGLEFLIGHT_CALLS.labels(group=self.name, result="leader" if leader else "coalesced").inc()
+        return flight, leader
+
+    def _finish(self, key: Hashable, flight: _Flight, result: Any = None, exception: Optional[BaseException] = None) -> None:
+        with self._lock:
+            # Forget the flight before publishing, so later callers start a fresh call
+            if self._flights.get(key) is flight:
+                del self._flights[key]
+        if isinstance(exception, asyncio.CancelledError):
+            flight.future.cancel()
+        elif exception is not None:
+            flight.future.set_exception(exception)
+        else:
+            flight.future.set_result(result)
+
+    def do(self, key: Hashable, fn: Callable[[], T]) -> T:
+        with self._lock:
+            flight, leader = self._join(key)
+        if not leader:
+            return flight.future.result()
+
+        try:
+            result = fn()
+        except BaseException as e:
+            self._finish(key, flight, exception=e)
+            raise
+        self._finish(key, flight, result=result)
+        return result
+
+    async def ado(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> T:
+        with self._lock:
+            flight, leader = self._join(key)
+            if leader:
+                flight.task = asyncio.ensure_future(self._run(key, flight, fn))
+
+        try:
+            # Shielded so that cancelling this caller doesn't cancel the shared future
+            return await asyncio.shield(asyncio.wrap_future(flight.future))
+        except asyncio.CancelledError:
+            with self._lock:
+                flight.waiters -= 1
+                abandoned = flight.waiters == 0 and flight.task is not None and not flight.future.done()
+                if abandoned and self._flights.get(key) is flight:
+                    del self._flights[key]
+            if abandoned:
+                flight.task.cancel()
+            raise
+
+    async def _run(self, key: Hashable, flight: _Flight, fn: Callable[[], Awaitable[Any]]) -> None:
+        try:
+            result = await fn()
+        except BaseException as e:
+            self._finish(key, flight, exception=e)
+            if not isinstance(e, (Exception, asyncio.CancelledError)):
+                raise
+        else:
+            self._finish(key, flight, result=result)
+
+    @property
+    def in_flight(self) -> int:
+        """Keys with a call in flight."""
+        with self._lock:
+            return len(self._flights)
@@ -5,12 +5,13 @@ from typing import List
 def split_documents(
     documents: List[Document], 
     chunk_size: int = 1000,
+    overlap_ratio: float = 0.15,
 ) -> List[Document]:
     """Splits a list of Langchain Documents into smaller chunks."""
     text_splitter = RecursiveCharacterTextSplitter(
         chunk_size=chunk_size,
         separators=["\n\n", "\n", ".", ",", " "],
-        chunk_overlap=chunk_size * 0.15,  # 15% overlap
+        chunk_overlap=int(chunk_size * overlap_ratio),
         length_function=len,
     )
     chunks = text_splitter.split_documents(documents)
@@ -2,27 +2,67 @@ import os
 from dotenv import load_dotenv
 _ = load_dotenv()
 
-from pinecone import Pinecone
-from langchain_pinecone import PineconeVectorStore
 from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import InMemoryVectorStore, VectorStore
 
 import asyncio
-from typing import List
+from functools import lru_cache
+from typing import Callable, List, Optional, Set
 from tenacity import retry, wait_exponential, stop_after_attempt, before_log
 
 from .config import settings
 from .embeddings import get_embedding_model
+from .embedding_batcher import EmbeddingBatcher
+from .metrics import VECTOR_STORE_DURATION, timed
 
-pc = Pinecone(api_key=settings.PINECONE_API_KEY)
+def _store_embeddings() -> Embeddings:
+    embeddings = get_embedding_model()
+    if not settings.EMBEDDING_BATCHING:
+        return embeddings
+    return EmbeddingBatcher(
+        embeddings,
+        batch_size=settings.EMBEDDING_BATCH_SIZE,
+        max_wait_seconds=settings.EMBEDDING_BATCH_WAIT_SECONDS,
+        max_concurrent_batches=settings.EMBEDDING_MAX_CONCURRENT_BATCHES,
+    )
 
-index_name = settings.PINECONE_INDEX_NAME
-index = pc.Index(index_name)
+@lru_cache(maxsize=1)
+def get_vector_store() -> VectorStore:
+    """The shared vector store, created on first use (the Pinecone client is only imported then)."""
+    if settings.OFFLINE_MODE:
+        # Process-local store: documents uploaded while the app runs are searchable right away
+        return InMemoryVectorStore(embedding=_store_embeddings())
 
-pc_store = PineconeVectorStore(
-    index=index, 
-    namespace=settings.NAMESPACE, 
-    embedding=get_embedding_model()
-    )
+    from langchain_pinecone import PineconeVectorStore
+
+    return PineconeVectorStore(
+        index=get_pinecone_index(), 
+        namespace=settings.NAMESPACE, 
+        embedding=_store_embeddings()
+        )
+
+@lru_cache(maxsize=1)
+def get_pinecone_index():
+    from pinecone import Pinecone
+
+    pc = Pinecone(api_key=settings.PINECONE_API_KEY)
+    return pc.Index(settings.PINECONE_INDEX_NAME)
+
+async def find_existing_ids(ids: List[str], batch_size: int = 100) -> Set[str]:
+    """The ids among `ids` that the vector store already holds (chunks get content-addressed ids, see core/dedup.py)."""
+    store = get_vector_store()
+    existing: Set[str] = set()
+    for i in range(0, len(ids), batch_size):
+        batch = ids[i : i + batch_size]
+        with timed(VECTOR_STORE_DURATION, operation="fetch"):
+            if isinstance(store, InMemoryVectorStore):
+                existing.update(document.id for document in await store.aget_by_ids(batch))
+            else:
+                # PineconeVectorStore has no get_by_ids; fetch returns the vectors that exist
+                response = await asyncio.to_thread(get_pinecone_index().fetch, ids=batch, namespace=settings.NAMESPACE)
+                existing.update(response.vectors)
+    return existing
 
 @retry(
     wait=wait_exponential(multiplier=1, min=4, max=20),
@@ -31,23 +71,26 @@ pc_store = PineconeVectorStore(
     reraise=True
 )
 async def _add_documents_batch_with_retry(
-    vector_store: PineconeVectorStore, 
+    vector_store: VectorStore, 
     batch: List[Document], 
     index_name: str
 ) -> List[str]:
     """Helper function to add a single batch of documents with retries."""
     print(f"Attempting to add batch of {len(batch)} documents to Pinecone index '{index_name}'...")
-    ids = await vector_store.aadd_documents(batch)
+    with timed(VECTOR_STORE_DURATION, operation="upsert"):
+        ids = await vector_store.aadd_documents(batch)
     print(f"Successfully added batch of {len(ids)} documents.")
     return ids
 
 async def add_documents_to_vector_store(
     documents: List[Document], 
     index_name: str = settings.PINECONE_INDEX_NAME,
-    batch_size: int = 100 # Observed limit 100-150, so use 100 for safety
+    batch_size: int = 100, # Observed limit 100-150, so use 100 for safety
+    on_progress: Optional[Callable[[int, int], None]] = None,
 ):
     """
     Adds documents to the vector store in batches with retries and delays.
+    `on_progress(indexed, total)` is called after every batch.
     """
     if not documents:
         print("No documents to add to vector store.")
@@ -58,9 +101,12 @@ async def add_documents_to_vector_store(
     for i in range(0, len(documents), batch_size):
         batch = documents[i : i + batch_size]
         try:
-            indexed_ids = await _add_documents_batch_with_retry(pc_store, batch, index_name)
+            indexed_ids = await _add_documents_batch_with_retry(get_vector_store(), batch, index_name)
             all_indexed_ids.extend(indexed_ids)
-            await asyncio.sleep(2) # Small delay between batches to respect rate limits
+            if on_progress is not None:
+                on_progress(len(all_indexed_ids), len(documents))
+            if not settings.OFFLINE_MODE:
+                await asyncio.sleep(2) # Small delay between batches to respect rate limits
         except Exception as e:
             print(f"Fatal error after retries for batch starting at index {i}: {e}")
             raise
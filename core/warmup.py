@@ -0,0 +1,132 @@
+"""Startup warm-up: create the external clients and open pooled connections before traffic.
+
+Every client is created lazily by its accessor, so importing the app does no network
+setup. The lifespan starts the warm-up in the background instead: the steps below run
+concurrently, each bounded by `WARMUP_STEP_TIMEOUT_SECONDS`, so a slow service delays
+readiness but never startup. `GET /api/ready` answers 503 until the warm-up is over.
+
+A failed step is logged and reported, but does not keep the app unready: its client is
+created again on first use, exactly as without the warm-up.
+"""
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from sqlalchemy import text
+
+from core.config import settings
+
+
+# --- Steps ---
+async def _database() -> None:
+    """Fill both connection pools, so the first requests don't pay for connection setup."""
+    from database.database import async_engine, engine
+
+    async def open_connection() -> None:
+        async with async_engine.connect() as connection:
+            await connection.execute(text("SELECT 1"))
+
+    def open_sync_connection() -> None:
+        with engine.connect() as connection:
+            connection.execute(text("SELECT 1"))
+
+    # Held at the same time, so the pool ends up with that many idle connections
+    connections = min(settings.WARMUP_DB_CONNECTIONS, async_engine.pool.size())
+    await asyncio.gather(*(open_connection() for _ in range(connections)), asyncio.to_thread(open_sync_connection))
+
+
+async def _vector_store() -> None:
+    """Create the store and run one search: connects to the index and to the embedding API."""
+    from core.vectorstore import get_vector_store
+
+    store = await asyncio.to_thread(get_vector_store)
+    await store.asimilarity_search("warm-up", k=1)
+
+
+async def _memory() -> None:
+    from core.mem0_client import get_memory_client
+
+    await asyncio.to_thread(get_memory_client)
+
+
+async def _llms() -> None:
+    from workflow.llms import MODEL_ACCESSORS
+
+    await asyncio.to_thread(lambda: [get_model() for get_model in MODEL_ACCESSORS])
+
+
+async def _graph() -> None:
+    from workflow.graph import get_graph
+
+    await asyncio.to_thread(get_graph)
+
+
+STEPS: Dict[str, Callable[[], Awaitable[None]]] = {
+    "database": _database,
+    "vector_store": _vector_store,
+    "memory": _memory,
+    "llms": _llms,
+    "graph": _graph,
+}
+
+
+class WarmUp:
+    """Runs the warm-up steps concurrently in the background and keeps their outcome."""
+
+    def __init__(self, steps: Dict[str, Callable[[], Awaitable[None]]], *, step_timeout_seconds: float):
+        self.steps = steps
+        self.step_timeout_seconds = step_timeout_seconds
+        self.results: Dict[str, Dict[str, Any]] = {}
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self._task: Optional[asyncio.Task] = None
+
+    # --- Lifecycle ---
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self.started_at = time.perf_counter()
+            self.finished_at = None
+            self.results = {name: {"status": "pending"} for name in self.steps}
+            self._task = asyncio.create_task(self.run())
+
+    async def stop(self) -> None:
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+
+    async def run(self) -> None:
+        await asyncio.gather(*(self._run_step(name, step) for name, step in self.steps.items()))
+        self.finished_at = time.perf_counter()
+        failed = [name for name, result in self.results.items() if result["status"] != "ok"]
+        print(
+            f"INFO:     Warm-up finished in {self.finished_at - self.started_at:.2f}s"
+            + (f" ({', '.join(failed)} failed, created on first use)" if failed else "")
+        )
+
+    async def _run_step(self, name: str, step: Callable[[], Awaitable[None]]) -> None:
+        started = time.perf_counter()
+        try:
+            await asyncio.wait_for(step(), timeout=self.step_timeout_seconds)
+            self.results[name] = {"status": "ok"}
+        except asyncio.TimeoutError:
+            self.results[name] = {"status": "timeout"}
+            print(f"WARNING:  Warm-up step '{name}' timed out after {self.step_timeout_seconds}s")
+        except Exception as e:
+            self.results[name] = {"status": "failed", "error": str(e)}
+            print(f"WARNING:  Warm-up step '{name}' failed: {e}")
+        self.results[name]["seconds"] = round(time.perf_counter() - started, 3)
+
+    # --- Reporting ---
+    @property
+    def ready(self) -> bool:
+        return self.finished_at is not None
+
+    def status(self) -> Dict[str, Any]:
+        if self.started_at is None:
+            elapsed = None
+        else:
+            elapsed = round((self.finished_at or time.perf_counter()) - self.started_at, 3)
+        return {"ready": self.ready, "seconds": elapsed, "steps": self.results}
+
+
+warm_up = WarmUp(STEPS, step_timeout_seconds=settings.WARMUP_STEP_TIMEOUT_SECONDS)
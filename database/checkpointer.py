@@ -0,0 +1,355 @@
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    WRITES_IDX_MAP,
+    BaseCheckpointSaver,
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+    get_checkpoint_id,
+    get_checkpoint_metadata,
+)
+from langgraph.checkpoint.serde.types import TASKS
+from sqlalchemy import desc
+from sqlalchemy.engine import Engine
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlmodel import Session, select, delete
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from core.config import settings
+from .models import GraphCheckpoint, GraphCheckpointWrite
+
+
+class SQLModelCheckpointSaver(BaseCheckpointSaver[int]):
+    """LangGraph checkpointer stored in the application database.
+
+    Works on any engine supported by SQLModel (Postgres in production, SQLite locally).
+    Checkpoints are serialized with the graph serializer (msgpack) and only the
+    `keep_last` most recent checkpoints of each thread are retained. The async API
+    (used by the app) runs on `async_engine`; the sync API on `engine`.
+    """
+
+    def __init__(
+        self,
+        engine: Engine,
+        async_engine: AsyncEngine,
+        *,
+        keep_last: int = settings.CHECKPOINTS_TO_KEEP,
+        serde=None,
+    ):
+        super().__init__(serde=serde)
+        self.engine = engine
+        self.async_engine = async_engine
+        self.keep_last = keep_last
+
+    # --- Statements and (de)serialization, shared by the sync and async API ---
+    @staticmethod
+    def _get_statement(config: RunnableConfig):
+        statement = select(GraphCheckpoint).where(
+            GraphCheckpoint.thread_id == config["configurable"]["thread_id"],
+            GraphCheckpoint.checkpoint_ns == config["configurable"].get("checkpoint_ns", ""),
+        )
+        if checkpoint_id := get_checkpoint_id(config):
+            return statement.where(GraphCheckpoint.checkpoint_id == checkpoint_id)
+        return statement.order_by(desc(GraphCheckpoint.checkpoint_id)).limit(1)
+
+    @staticmethod
+    def _list_statement(
+        config: Optional[RunnableConfig],
+        filter: Optional[Dict[str, Any]],
+        before: Optional[RunnableConfig],
+        limit: Optional[int],
+    ):
+        statement = select(GraphCheckpoint)
+        if config:
+            statement = statement.where(GraphCheckpoint.thread_id == config["configurable"]["thread_id"])
+            if (checkpoint_ns := config["configurable"].get("checkpoint_ns")) is not None:
+                statement = statement.where(GraphCheckpoint.checkpoint_ns == checkpoint_ns)
+            if checkpoint_id := get_checkpoint_id(config):
+                statement = statement.where(GraphCheckpoint.checkpoint_id == checkpoint_id)
+        if before and (before_id := get_checkpoint_id(before)):
+            statement = statement.where(GraphCheckpoint.checkpoint_id < before_id)
+        statement = statement.order_by(desc(GraphCheckpoint.checkpoint_id))
+        # Metadata filters are applied after deserialization, so the limit cannot be pushed down
+        if limit is not None and not filter:
+            statement = statement.limit(limit)
+        return statement
+
+    @staticmethod
+    def _writes_statement(row: GraphCheckpoint):
+        return (
+            select(GraphCheckpointWrite)
+            .where(
+                GraphCheckpointWrite.thread_id == row.thread_id,
+                GraphCheckpointWrite.checkpoint_ns == row.checkpoint_ns,
+                GraphCheckpointWrite.checkpoint_id == row.checkpoint_id,
+            )
+            .order_by(GraphCheckpointWrite.task_id, GraphCheckpointWrite.idx)
+        )
+
+    @staticmethod
+    def _sends_statement(row: GraphCheckpoint):
+        return (
+            select(GraphCheckpointWrite)
+            .where(
+                GraphCheckpointWrite.thread_id == row.thread_id,
+                GraphCheckpointWrite.checkpoint_ns == row.checkpoint_ns,
+                GraphCheckpointWrite.checkpoint_id == row.parent_checkpoint_id,
+                GraphCheckpointWrite.channel == TASKS,
+            )
+            .order_by(GraphCheckpointWrite.task_path, GraphCheckpointWrite.task_id, GraphCheckpointWrite.idx)
+        )
+
+    @staticmethod
+    def _prune_cutoff_statement(thread_id: str, checkpoint_ns: str, keep_last: int):
+        return (
+            select(GraphCheckpoint.checkpoint_id)
+            .where(
+                GraphCheckpoint.thread_id == thread_id,
+                GraphCheckpoint.checkpoint_ns == checkpoint_ns,
+            )
+            .order_by(desc(GraphCheckpoint.checkpoint_id))
+            .offset(keep_last - 1)
+            .limit(1)
+        )
+
+    @staticmethod
+    def _prune_statements(thread_id: str, checkpoint_ns: str, cutoff: str) -> list:
+        """Delete everything older than the cutoff checkpoint of a thread."""
+        return [
+            delete(model).where(
+                model.thread_id == thread_id,
+                model.checkpoint_ns == checkpoint_ns,
+                model.checkpoint_id < cutoff,
+            )
+            for model in (GraphCheckpoint, GraphCheckpointWrite)
+        ]
+
+    @staticmethod
+    def _delete_thread_statements(thread_id: str) -> list:
+        return [
+            delete(GraphCheckpoint).where(GraphCheckpoint.thread_id == thread_id),
+            delete(GraphCheckpointWrite).where(GraphCheckpointWrite.thread_id == thread_id),
+        ]
+
+    def _to_tuple(
+        self, row: GraphCheckpoint, writes: Sequence[GraphCheckpointWrite], sends: Sequence[GraphCheckpointWrite]
+    ) -> CheckpointTuple:
+        pending_sends = [self.serde.loads_typed((w.type, w.value)) for w in sends]
+        checkpoint: Checkpoint = self.serde.loads_typed((row.type, row.checkpoint))
+        return CheckpointTuple(
+            config={
+                "configurable": {
+                    "thread_id": row.thread_id,
+                    "checkpoint_ns": row.checkpoint_ns,
+                    "checkpoint_id": row.checkpoint_id,
+                }
+            },
+            checkpoint={**checkpoint, "pending_sends": pending_sends},
+            metadata=self.serde.loads_typed((row.metadata_type, row.checkpoint_metadata)),
+            parent_config=(
+                {
+                    "configurable": {
+                        "thread_id": row.thread_id,
+                        "checkpoint_ns": row.checkpoint_ns,
+                        "checkpoint_id": row.parent_checkpoint_id,
+                    }
+                }
+                if row.parent_checkpoint_id
+                else None
+            ),
+            pending_writes=[
+                (w.task_id, w.channel, self.serde.loads_typed((w.type, w.value))) for w in writes
+            ],
+        )
+
+    @staticmethod
+    def _matches(checkpoint_tuple: CheckpointTuple, filter: Optional[Dict[str, Any]]) -> bool:
+        return not filter or all(checkpoint_tuple.metadata.get(key) == value for key, value in filter.items())
+
+    def _checkpoint_row(self, config: RunnableConfig, checkpoint: Checkpoint, metadata: CheckpointMetadata) -> GraphCheckpoint:
+        checkpoint_to_store = checkpoint.copy()
+        checkpoint_to_store.pop("pending_sends", None)  # Rebuilt from the parent writes on load
+        type_, serialized_checkpoint = self.serde.dumps_typed(checkpoint_to_store)
+        metadata_type, serialized_metadata = self.serde.dumps_typed(get_checkpoint_metadata(config, metadata))
+        return GraphCheckpoint(
+            thread_id=config["configurable"]["thread_id"],
+            checkpoint_ns=config["configurable"].get("checkpoint_ns", ""),
+            checkpoint_id=checkpoint["id"],
+            parent_checkpoint_id=config["configurable"].get("checkpoint_id"),
+            type=type_,
+            checkpoint=serialized_checkpoint,
+            metadata_type=metadata_type,
+            checkpoint_metadata=serialized_metadata,
+        )
+
+    @staticmethod
+    def _saved_config(row: GraphCheckpoint) -> RunnableConfig:
+        return {
+            "configurable": {
+                "thread_id": row.thread_id,
+                "checkpoint_ns": row.checkpoint_ns,
+                "checkpoint_id": row.checkpoint_id,
+            }
+        }
+
+    def _write_rows(
+        self, config: RunnableConfig, writes: Sequence[Tuple[str, Any]], task_id: str, task_path: str
+    ) -> List[GraphCheckpointWrite]:
+        rows = []
+        for idx, (channel, value) in enumerate(writes):
+            type_, serialized_value = self.serde.dumps_typed(value)
+            rows.append(
+                GraphCheckpointWrite(
+                    thread_id=config["configurable"]["thread_id"],
+                    checkpoint_ns=config["configurable"].get("checkpoint_ns", ""),
+                    checkpoint_id=config["configurable"]["checkpoint_id"],
+                    task_id=task_id,
+                    idx=WRITES_IDX_MAP.get(channel, idx),
+                    channel=channel,
+                    type=type_,
+                    value=serialized_value,
+                    task_path=task_path,
+                )
+            )
+        return rows
+
+    # --- Sync API ---
+    def _load_tuple(self, db: Session, row: GraphCheckpoint) -> CheckpointTuple:
+        writes = db.exec(self._writes_statement(row)).all()
+        sends = db.exec(self._sends_statement(row)).all() if row.parent_checkpoint_id else []
+        return self._to_tuple(row, writes, sends)
+
+    def get_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        with Session(self.engine) as db:
+            row = db.exec(self._get_statement(config)).first()
+            if not row:
+                return None
+            return self._load_tuple(db, row)
+
+    def list(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[Dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> Iterator[CheckpointTuple]:
+        with Session(self.engine) as db:
+            returned = 0
+            for row in db.exec(self._list_statement(config, filter, before, limit)).all():
+                if limit is not None and returned >= limit:
+                    break
+                checkpoint_tuple = self._load_tuple(db, row)
+                if not self._matches(checkpoint_tuple, filter):
+                    continue
+                returned += 1
+                yield checkpoint_tuple
+
+    def put(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        row = self._checkpoint_row(config, checkpoint, metadata)
+        saved_config = self._saved_config(row)
+        with Session(self.engine) as db:
+            db.merge(row)
+            db.flush()
+            cutoff = db.exec(self._prune_cutoff_statement(row.thread_id, row.checkpoint_ns, self.keep_last)).first()
+            if cutoff is not None:
+                for statement in self._prune_statements(row.thread_id, row.checkpoint_ns, cutoff):
+                    db.exec(statement)
+            db.commit()
+        return saved_config
+
+    def put_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[Tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        with Session(self.engine) as db:
+            for row in self._write_rows(config, writes, task_id, task_path):
+                db.merge(row)
+            db.commit()
+
+    def delete_thread(self, thread_id: str) -> None:
+        with Session(self.engine) as db:
+            for statement in self._delete_thread_statements(thread_id):
+                db.exec(statement)
+            db.commit()
+
+    # --- Async API (native async sessions, nothing blocks the event loop) ---
+    async def _aload_tuple(self, db: AsyncSession, row: GraphCheckpoint) -> CheckpointTuple:
+        writes = (await db.exec(self._writes_statement(row))).all()
+        sends = (await db.exec(self._sends_statement(row))).all() if row.parent_checkpoint_id else []
+        return self._to_tuple(row, writes, sends)
+
+    async def aget_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        async with AsyncSession(self.async_engine) as db:
+            row = (await db.exec(self._get_statement(config))).first()
+            if not row:
+                return None
+            return await self._aload_tuple(db, row)
+
+    async def alist(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[Dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> AsyncIterator[CheckpointTuple]:
+        async with AsyncSession(self.async_engine) as db:
+            returned = 0
+            for row in (await db.exec(self._list_statement(config, filter, before, limit))).all():
+                if limit is not None and returned >= limit:
+                    break
+                checkpoint_tuple = await self._aload_tuple(db, row)
+                if not self._matches(checkpoint_tuple, filter):
+                    continue
+                returned += 1
+                yield checkpoint_tuple
+
+    async def aput(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        row = self._checkpoint_row(config, checkpoint, metadata)
+        saved_config = self._saved_config(row)
+        async with AsyncSession(self.async_engine) as db:
+            await db.merge(row)
+            await db.flush()
+            cutoff = (await db.exec(self._prune_cutoff_statement(row.thread_id, row.checkpoint_ns, self.keep_last))).first()
+            if cutoff is not None:
+                for statement in self._prune_statements(row.thread_id, row.checkpoint_ns, cutoff):
+                    await db.exec(statement)
+            await db.commit()
+        return saved_config
+
+    async def aput_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[Tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        async with AsyncSession(self.async_engine) as db:
+            for row in self._write_rows(config, writes, task_id, task_path):
+                await db.merge(row)
+            await db.commit()
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        async with AsyncSession(self.async_engine) as db:
+            for statement in self._delete_thread_statements(thread_id):
+                await db.exec(statement)
+            await db.commit()
@@ -1,23 +1,44 @@
+import base64
+import json
 from datetime import datetime, timezone
-from typing import List, Optional
-from sqlmodel import Session, select, delete
-from sqlalchemy import desc
+from typing import Dict, List, Optional, Tuple
+from sqlmodel import select, delete
+from sqlmodel.ext.asyncio.session import AsyncSession
+from sqlalchemy import and_, desc, exists, func, insert, tuple_, update
+from sqlalchemy.orm import selectinload
 from . import models
 from .models import FileProcessingStatusEnum
+from utils.tokens import count_content_tokens
+from core.metrics import UPLOAD_FILE_STATES
+from core.config import settings
+
+# --- Keyset pagination ---
+# A cursor is the (timestamp, id) sort key of the last row of a page, so the next page is
+# a range scan on the composite index from that key on, however deep the page is.
+def encode_cursor(timestamp: datetime, row_id) -> str:
+    payload = json.dumps([timestamp.isoformat(), row_id]).encode()
+    return base64.urlsafe_b64encode(payload).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> Tuple[datetime, object]:
+    try:
+        timestamp, row_id = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        return datetime.fromisoformat(timestamp), row_id
+    except (ValueError, TypeError) as e:
+        raise ValueError("Invalid pagination cursor.") from e
 
 # --- User CRUD ---
-def get_user_by_user_id(db: Session, user_id: str) -> Optional[models.User]:
-    return db.get(models.User, user_id)
+async def get_user_by_user_id(db: AsyncSession, user_id: str) -> Optional[models.User]:
+    return await db.get(models.User, user_id)
 
-def create_user(db: Session, user_create_data: models.UserCreate) -> models.User: # Takes UserCreate model
+async def create_user(db: AsyncSession, user_create_data: models.UserCreate) -> models.User: # Takes UserCreate model
     # Check if user_id already exists
-    existing_user = db.get(models.User, user_create_data.user_id)
+    existing_user = await db.get(models.User, user_create_data.user_id)
     if existing_user:
         raise ValueError(f"User with user_id '{user_create_data.user_id}' already exists.")
 
     # If email is provided, check for its uniqueness too if it's a constraint
     if user_create_data.email:
-        user_with_email = db.exec(select(models.User).where(models.User.email == user_create_data.email)).first()
+        user_with_email = (await db.exec(select(models.User).where(models.User.email == user_create_data.email))).first()
         if user_with_email:
             raise ValueError(f"Email '{user_create_data.email}' is already in use.")
             
@@ -28,31 +49,65 @@ def create_user(db: Session, user_create_data: models.UserCreate) -> models.User
 
     )
     db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
+    await db.commit()
+    await db.refresh(db_user)
     return db_user
 
 # --- Thread CRUD ---
-def create_thread_for_user(db: Session, user_id: str, title: Optional[str] = "New Chat") -> models.Thread: # user_id is str
+async def create_thread_for_user(db: AsyncSession, user_id: str, title: Optional[str] = "New Chat") -> models.Thread: # user_id is str
     db_thread = models.Thread(user_id=user_id, title=title or "New Chat")
     db.add(db_thread)
-    db.commit()
-    db.refresh(db_thread)
+    await db.commit()
+    await db.refresh(db_thread)
     return db_thread
 
-def get_thread_by_id(db: Session, thread_id: str) -> Optional[models.Thread]:
-    return db.get(models.Thread, thread_id) # Efficient PK lookup
+async def get_thread_by_id(db: AsyncSession, thread_id: str) -> Optional[models.Thread]:
+    return await db.get(models.Thread, thread_id) # Efficient PK lookup
 
-def get_threads_for_user(db: Session, user_id: str) -> List[models.Thread]: # user_id is str
-    statement = (
-        select(models.Thread)
-        .where(models.Thread.user_id == user_id)
-        .order_by(desc(models.Thread.updated_at))
-    )
-    return db.exec(statement).all()
+async def get_threads_for_user(
+    db: AsyncSession,
+    user_id: str,
+    limit: int,
+    cursor: Optional[str] = None,
+    with_preview: bool = False,
+) -> Tuple[List[models.Thread], Optional[str]]:
+    """A page of the user's threads, most recently updated first, and the cursor of the next page.
+
+    With `with_preview` each thread carries the start of its last message, read by a
+    correlated subquery in the same statement. Raises ValueError on a malformed cursor.
+    """
+    sort_key = tuple_(models.Thread.updated_at, models.Thread.id)
+    columns = [models.Thread]
+    if with_preview:
+        last_message = (
+            select(func.substr(models.Message.content, 1, settings.THREAD_PREVIEW_CHARS))
+            .where(models.Message.thread_id == models.Thread.id)
+            .order_by(desc(models.Message.timestamp), desc(models.Message.id))
+            .limit(1)
+            .scalar_subquery()
+        )
+        columns.append(last_message)
+    statement = select(*columns).where(models.Thread.user_id == user_id)
+    if cursor is not None:
+        statement = statement.where(sort_key < tuple_(*decode_cursor(cursor)))
+    # One extra row tells whether there is a next page
+    statement = statement.order_by(desc(models.Thread.updated_at), desc(models.Thread.id)).limit(limit + 1)
 
-def update_thread(db: Session, thread_id: str, thread_update: models.ThreadUpdate) -> Optional[models.Thread]:
-    db_thread = db.get(models.Thread, thread_id)
+    threads = []
+    for row in (await db.exec(statement)).all():
+        if with_preview:
+            thread, preview = row
+            thread = models.ThreadRead.model_validate(thread, update={"last_message_preview": preview})
+        else:
+            thread = row
+        threads.append(thread)
+    if len(threads) <= limit:
+        return threads, None
+    threads = threads[:limit]
+    return threads, encode_cursor(threads[-1].updated_at, threads[-1].id)
+
+async def update_thread(db: AsyncSession, thread_id: str, thread_update: models.ThreadUpdate) -> Optional[models.Thread]:
+    db_thread = await db.get(models.Thread, thread_id)
     if not db_thread:
         return None
     
@@ -62,115 +117,271 @@ def update_thread(db: Session, thread_id: str, thread_update: models.ThreadUpdat
     
     db_thread.updated_at = datetime.now(timezone.utc)
     db.add(db_thread)
-    db.commit()
-    db.refresh(db_thread)
+    await db.commit()
+    await db.refresh(db_thread)
     return db_thread
 
-def delete_thread(db: Session, thread_id: str) -> bool:
-    db_thread = db.get(models.Thread, thread_id)
+async def delete_thread(db: AsyncSession, thread_id: str) -> bool:
+    db_thread = await db.get(models.Thread, thread_id)
     if not db_thread:
         return False
-    db.delete(db_thread)
-    db.commit()
+    await db.delete(db_thread) # Loads the messages to cascade the delete
+    await db.commit()
     return True
 
+async def get_thread_for_turn(
+    db: AsyncSession, thread_id: str
+) -> Optional[Tuple[models.Thread, bool, List[models.Message]]]:
+    """Everything a chat turn reads, in a single query.
+
+    Returns the thread, whether the graph already holds a checkpoint for it and, when it
+    doesn't, the messages not yet folded into the thread summary (to bootstrap the graph
+    state from). None if the thread doesn't exist.
+    """
+    has_checkpoint = exists().where(models.GraphCheckpoint.thread_id == models.Thread.id)
+    statement = (
+        select(models.Thread, has_checkpoint.label("has_checkpoint"), models.Message)
+        .outerjoin(
+            models.Message,
+            and_(
+                models.Message.thread_id == models.Thread.id,
+                models.Message.id > func.coalesce(models.Thread.summarized_until_message_id, 0),
+                ~has_checkpoint,
+            ),
+        )
+        .where(models.Thread.id == thread_id)
+        .order_by(models.Message.timestamp.asc(), models.Message.id.asc())
+    )
+    rows = (await db.exec(statement)).all()
+    if not rows:
+        return None
+    db_thread, checkpointed, _ = rows[0]
+    return db_thread, bool(checkpointed), [message for _, _, message in rows if message is not None]
+
 # --- Message CRUD --- (No change needed here regarding user_id changes)
-def create_message_in_thread(db: Session, thread_id: str, role: str, content: str) -> models.Message:
-    db_thread = db.get(models.Thread, thread_id)
-    if db_thread:
-        db_thread.updated_at = datetime.now(timezone.utc)
-        db.add(db_thread)
-    
-    db_message = models.Message(thread_id=thread_id, role=role, content=content)
-    db.add(db_message)
-    
-    db.commit()
-    if db_thread:
-        db.refresh(db_thread)
-    db.refresh(db_message)
+async def create_message_in_thread(db: AsyncSession, thread_id: str, role: str, content: str) -> models.Message:
+    """Insert a message and bump its thread's token count and timestamp in one transaction.
+
+    The row comes back through INSERT ... RETURNING, so nothing is refreshed afterwards.
+    """
+    token_count = count_content_tokens(role, content)
+    now = datetime.now(timezone.utc)
+    db_message = (await db.exec(
+        insert(models.Message)
+        .values(thread_id=thread_id, role=role, content=content, token_count=token_count, timestamp=now)
+        .returning(models.Message)
+    )).scalar_one()
+    # Incremented in SQL so concurrent writes to the same thread don't lose updates
+    await db.exec(
+        update(models.Thread)
+        .where(models.Thread.id == thread_id)
+        .values(token_count=models.Thread.token_count + token_count, updated_at=now)
+    )
+    await db.commit()
     return db_message
 
-def get_messages_for_thread(db: Session, thread_id: str) -> List[models.Message]:
+async def get_messages_for_thread(
+    db: AsyncSession,
+    thread_id: str,
+    after_message_id: Optional[int] = None,
+    limit: Optional[int] = None,
+) -> List[models.Message]:
     statement = (
         select(models.Message)
         .where(models.Message.thread_id == thread_id)
-        .order_by(models.Message.timestamp.asc())
     )
-    return db.exec(statement).all()
+    if after_message_id is not None:
+        # Only messages that are not yet folded into the thread summary
+        statement = statement.where(models.Message.id > after_message_id)
+    statement = statement.order_by(models.Message.timestamp.asc(), models.Message.id.asc())
+    if limit is not None:
+        statement = statement.limit(limit)
+    return (await db.exec(statement)).all()
 
+async def get_message_page(
+    db: AsyncSession,
+    thread_id: str,
+    limit: int,
+    cursor: Optional[str] = None,
+    newest_first: bool = False,
+) -> Tuple[List[models.Message], Optional[str]]:
+    """A page of the thread's messages in timestamp order, and the cursor of the next page.
+
+    `newest_first` pages backwards from the latest message, for clients that show the end
+    of a long conversation first. Raises ValueError on a malformed cursor.
+    """
+    sort_key = tuple_(models.Message.timestamp, models.Message.id)
+    statement = select(models.Message).where(models.Message.thread_id == thread_id)
+    if cursor is not None:
+        after = tuple_(*decode_cursor(cursor))
+        statement = statement.where(sort_key < after if newest_first else sort_key > after)
+    if newest_first:
+        statement = statement.order_by(desc(models.Message.timestamp), desc(models.Message.id))
+    else:
+        statement = statement.order_by(models.Message.timestamp.asc(), models.Message.id.asc())
+    messages = (await db.exec(statement.limit(limit + 1))).all()
+    if len(messages) <= limit:
+        return messages, None
+    messages = messages[:limit]
+    return messages, encode_cursor(messages[-1].timestamp, messages[-1].id)
+
+async def update_thread_summary(db: AsyncSession, thread_id: str, summary: str, summarized_until_message_id: int) -> Optional[models.Thread]:
+    db_thread = await db.get(models.Thread, thread_id)
+    if not db_thread:
+        return None
 
-async def create_upload_job_in_db(db: Session, filenames: List[str]) -> models.UploadJob:
+    db_thread.summary = summary
+    db_thread.summarized_until_message_id = summarized_until_message_id
+    db_thread.summarized_token_count = (await db.exec(
+        select(func.coalesce(func.sum(models.Message.token_count), 0))
+        .where(models.Message.thread_id == thread_id, models.Message.id <= summarized_until_message_id)
+    )).one()
+    db.add(db_thread)
+    await db.commit()
+    await db.refresh(db_thread)
+    return db_thread
+
+
+async def create_upload_job_in_db(db: AsyncSession, filenames: List[str]) -> models.UploadJob:
     job = models.UploadJob()
     db.add(job)
-    db.commit() # Commit to get job.id
-    db.refresh(job)
+    await db.commit() # Commit to get job.id
+    await db.refresh(job)
 
     for fname in filenames:
         file_attempt = models.FileProcessingAttempt(filename=fname, job_id=job.id)
         db.add(file_attempt)
     
-    db.commit()
-    db.refresh(job) # Refresh to get associated files
+    await db.commit()
+    await db.refresh(job, attribute_names=["files"]) # Refresh to get associated files
     return job
 
+def _overall_status(status_counts: Dict[FileProcessingStatusEnum, int]) -> FileProcessingStatusEnum:
+    """A job's status from the number of its items (files, questions) per status."""
+    if not status_counts: # Should not happen if job exists with items
+        return FileProcessingStatusEnum.FAILED # Or some other error state
+    if set(status_counts) == {FileProcessingStatusEnum.COMPLETED}:
+        return FileProcessingStatusEnum.COMPLETED
+    if status_counts.get(FileProcessingStatusEnum.PENDING) or status_counts.get(FileProcessingStatusEnum.PROCESSING):
+        return FileProcessingStatusEnum.PROCESSING
+    if status_counts.get(FileProcessingStatusEnum.FAILED):
+        # Mark FAILED if any item fails and the others are done
+        return FileProcessingStatusEnum.FAILED
+    return FileProcessingStatusEnum.PENDING
+
 async def update_file_processing_status_in_db(
-    db: Session,
+    db: AsyncSession,
     job_id: str,
     filename: str,
     status: FileProcessingStatusEnum,
     message: Optional[str] = None,
     chunks_indexed: Optional[int] = None,
-):
+    chunks_skipped: Optional[int] = None,
+    tokens_saved: Optional[int] = None,
+) -> Optional[models.UploadJob]:
+    """Store a file's new status and recompute the job's overall status; returns the job."""
     # Find the specific file attempt
     statement = select(models.FileProcessingAttempt).where(
         models.FileProcessingAttempt.job_id == job_id,
         models.FileProcessingAttempt.filename == filename
     )
-    file_attempt = db.exec(statement).first()
+    file_attempt = (await db.exec(statement)).first()
 
     if file_attempt:
+        UPLOAD_FILE_STATES.labels(status=status.value).inc()
         file_attempt.status = status
         file_attempt.message = message
+        if status == FileProcessingStatusEnum.PROCESSING:
+            file_attempt.started_at = datetime.now(timezone.utc)
+        elif status in (FileProcessingStatusEnum.COMPLETED, FileProcessingStatusEnum.FAILED):
+            file_attempt.finished_at = datetime.now(timezone.utc)
         if chunks_indexed is not None:
             file_attempt.chunks_indexed = chunks_indexed
+        if chunks_skipped is not None:
+            file_attempt.chunks_skipped = chunks_skipped
+        if tokens_saved is not None:
+            file_attempt.tokens_saved = tokens_saved
         db.add(file_attempt)
     else:
         print(f"Warning: Could not find FileProcessingAttempt for job_id={job_id}, filename={filename} to update status.")
-        return # Or raise error
+        return None # Or raise error
 
     # Update the parent job's updated_at and overall_status
-    job = db.get(models.UploadJob, job_id) # Use db.get for primary key lookup
+    job = await db.get(models.UploadJob, job_id) # Use db.get for primary key lookup
     if job:
         job.updated_at = datetime.utcnow()
         
-        # Recalculate overall job status
-        # Need to fetch all files for this job again for accurate status
-        all_files_for_job_stmt = select(models.FileProcessingAttempt).where(models.FileProcessingAttempt.job_id == job_id)
-        all_files_status = db.exec(all_files_for_job_stmt).all()
-
-        if not all_files_status: # Should not happen if job exists with files
-            job.overall_status = FileProcessingStatusEnum.FAILED # Or some other error state
-        elif all(f.status == FileProcessingStatusEnum.COMPLETED for f in all_files_status):
-            job.overall_status = FileProcessingStatusEnum.COMPLETED
-        elif any(f.status == FileProcessingStatusEnum.FAILED for f in all_files_status):
-            # If any fail, and no PENDING/PROCESSING, then it's FAILED or PARTIAL
-            # For simplicity, let's mark FAILED if any file fails and others are done.
-             if not any(f.status in [FileProcessingStatusEnum.PENDING, FileProcessingStatusEnum.PROCESSING] for f in all_files_status):
-                job.overall_status = FileProcessingStatusEnum.FAILED
-             else: # Still some pending/processing
-                job.overall_status = FileProcessingStatusEnum.PROCESSING
-        elif any(f.status == FileProcessingStatusEnum.PROCESSING for f in all_files_status) or \
-             any(f.status == FileProcessingStatusEnum.PENDING for f in all_files_status):
-            job.overall_status = FileProcessingStatusEnum.PROCESSING
-        else: # All are PENDING initially, will transition
-            job.overall_status = FileProcessingStatusEnum.PENDING
-            
+        # Recalculate overall job status from the number of files per status (one
+        # aggregate row per status, so jobs of thousands of files stay cheap to update)
+        status_counts_stmt = (
+            select(models.FileProcessingAttempt.status, func.count())
+            .where(models.FileProcessingAttempt.job_id == job_id)
+            .group_by(models.FileProcessingAttempt.status)
+        )
+        status_counts = dict((await db.exec(status_counts_stmt)).all())
+        job.overall_status = _overall_status(status_counts)
         db.add(job)
     
-    db.commit()
-    if file_attempt: db.refresh(file_attempt)
-    if job: db.refresh(job)
+    await db.commit()
+    if file_attempt: await db.refresh(file_attempt)
+    if job: await db.refresh(job)
+    return job
+
+async def get_upload_job_from_db(db: AsyncSession, job_id: str) -> Optional[models.UploadJob]:
+    # Files are loaded eagerly: lazy loading is not available on async sessions
+    return await db.get(models.UploadJob, job_id, options=[selectinload(models.UploadJob.files)])
 
-async def get_upload_job_from_db(db: Session, job_id: str) -> Optional[models.UploadJob]:
 
-    return db.get(models.UploadJob, job_id)
\ No newline at end of file
+# --- Batch Question Jobs ---
+async def create_batch_job_in_db(db: AsyncSession, user_id: str, questions: List[str]) -> models.BatchJob:
+    job = models.BatchJob(user_id=user_id)
+    db.add(job)
+    await db.flush() # Assigns job.id
+    # One multi-row INSERT: batches run to hundreds of questions
+    await db.exec(insert(models.BatchQuestion).values([
+        {"job_id": job.id, "position": position, "question": question, "status": FileProcessingStatusEnum.PENDING}
+        for position, question in enumerate(questions)
+    ]))
+    await db.commit()
+    await db.refresh(job)
+    return job
+
+async def update_batch_question_in_db(
+    db: AsyncSession,
+    job_id: str,
+    position: int,
+    status: FileProcessingStatusEnum,
+    answer: Optional[str] = None,
+    error: Optional[str] = None,
+    retrieval_loops: Optional[int] = None,
+) -> Optional[models.BatchJob]:
+    """Store a question's new status (and answer) and recompute the job's overall status; returns the job."""
+    now = datetime.now(timezone.utc)
+    values = {"status": status, "error": error}
+    if status == FileProcessingStatusEnum.PROCESSING:
+        values["started_at"] = now
+    elif status in (FileProcessingStatusEnum.COMPLETED, FileProcessingStatusEnum.FAILED):
+        values.update(finished_at=now, answer=answer, retrieval_loops=retrieval_loops)
+    await db.exec(
+        update(models.BatchQuestion)
+        .where(models.BatchQuestion.job_id == job_id, models.BatchQuestion.position == position)
+        .values(**values)
+    )
+
+    job = await db.get(models.BatchJob, job_id)
+    if job:
+        status_counts_stmt = (
+            select(models.BatchQuestion.status, func.count())
+            .where(models.BatchQuestion.job_id == job_id)
+            .group_by(models.BatchQuestion.status)
+        )
+        job.overall_status = _overall_status(dict((await db.exec(status_counts_stmt)).all()))
+        job.updated_at = now
+        db.add(job)
+    await db.commit()
+    if job: await db.refresh(job)
+    return job
+
+async def get_batch_job_from_db(db: AsyncSession, job_id: str, with_questions: bool = True) -> Optional[models.BatchJob]:
+    options = [selectinload(models.BatchJob.questions)] if with_questions else []
+    return await db.get(models.BatchJob, job_id, options=options)
@@ -1,14 +1,73 @@
-from sqlmodel import create_engine, Session
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlmodel import create_engine
+from sqlmodel.ext.asyncio.session import AsyncSession
 from core.config import settings
+from core.metrics import instrument_engine
 
+is_sqlite = settings.DATABASE_URL.startswith("sqlite")
+if is_sqlite:
+    # Local / offline database; sessions are used from worker threads as well
+    connect_args = {"check_same_thread": False, "timeout": settings.SQLITE_BUSY_TIMEOUT_SECONDS}
+else:
+    connect_args = settings.DB_CONNECT_ARGS
+
+
+def async_database_url(url: str) -> str:
+    """Same database through its asyncio driver (asyncpg for Postgres, aiosqlite for SQLite)."""
+    scheme, rest = url.split("://", 1)
+    dialect = scheme.split("+", 1)[0]
+    if dialect in ("postgres", "postgresql"):
+        return f"postgresql+asyncpg://{rest}"
+    if dialect == "sqlite":
+        return f"sqlite+aiosqlite://{rest}"
+    return url
+
+
+def async_connect_args(args: dict) -> dict:
+    """asyncpg takes `ssl` where libpq takes `sslmode`."""
+    args = dict(args)
+    if "sslmode" in args:
+        args["ssl"] = args.pop("sslmode")
+    return args
+
+
+# Sync engine: worker-thread work (LLM cache lookups, the sync checkpointer API, table creation)
 engine = create_engine(
     settings.DATABASE_URL,
     echo=False,
-    connect_args=settings.DB_CONNECT_ARGS,
-    pool_size=20, 
-    max_overflow=10,
+    connect_args=connect_args,
+    pool_size=settings.DB_SYNC_POOL_SIZE,
+    max_overflow=settings.DB_SYNC_MAX_OVERFLOW,
 )
+instrument_engine(engine)
+
+# Async engine: request handlers, CRUD and the async checkpointer API, without blocking the event loop
+async_engine = create_async_engine(
+    async_database_url(settings.DATABASE_URL),
+    echo=False,
+    connect_args=async_connect_args(connect_args),
+    pool_size=settings.SQLITE_POOL_SIZE if is_sqlite else settings.DB_POOL_SIZE,
+    max_overflow=0 if is_sqlite else settings.DB_MAX_OVERFLOW,
+    pool_timeout=settings.DB_POOL_TIMEOUT_SECONDS,
+    pool_pre_ping=True,
+)
+instrument_engine(async_engine.sync_engine)
+
+def _set_sqlite_pragmas(dbapi_connection, connection_record) -> None:
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")  # Durable in WAL mode up to the last checkpoint
+    cursor.close()
+
+if is_sqlite:
+    for sqlite_engine in (engine, async_engine.sync_engine):
+        event.listen(sqlite_engine, "connect", _set_sqlite_pragmas)
+
+def async_session() -> AsyncSession:
+    # Loaded attributes stay readable after commit, so handlers can commit early and keep using them
+    return AsyncSession(async_engine, expire_on_commit=False)
 
-def get_db():
-    with Session(engine) as session:
+async def get_async_db():
+    async with async_session() as session:
         yield session
\ No newline at end of file
@@ -3,7 +3,7 @@ from datetime import datetime, timezone
 from typing import List, Optional
 from sqlmodel import Field, Relationship, SQLModel, Column, DateTime, String
 from sqlalchemy.sql import func
-from sqlalchemy import Text
+from sqlalchemy import Index, Text, LargeBinary, inspect, text
 from enum import Enum
 
 # --- User Model ---
@@ -28,10 +28,12 @@ class UserRead(UserBase): # Schema for reading a user
 # --- Thread Model ---
 class ThreadBase(SQLModel):
     title: str = Field(default="New Chat")
-    user_id: str = Field(foreign_key="user.user_id", index=True) # Foreign key to User.user_id (string)
+    user_id: str = Field(foreign_key="user.user_id") # Foreign key to User.user_id (string)
 
 class Thread(ThreadBase, table=True):
     __tablename__ = "threads"
+    # Serves the user's thread list (newest first) and its keyset pages without a sort; also covers lookups by user_id alone
+    __table_args__ = (Index("ix_threads_user_id_updated_at_id", "user_id", "updated_at", "id"),)
     id: str = Field(default_factory=lambda: str(uuid.uuid4()), primary_key=True, index=True)
     created_at: datetime = Field(
         default_factory=lambda: datetime.now(timezone.utc),
@@ -41,6 +43,14 @@ class Thread(ThreadBase, table=True):
         default_factory=lambda: datetime.now(timezone.utc),
         sa_column=Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
     )
+    # Running conversation summary, covering every message up to (and including) the watermark id
+    summary: Optional[str] = Field(default=None, sa_column=Column(Text, nullable=True))
+    summarized_until_message_id: Optional[int] = Field(default=None)
+    # Running total of the (approximate) tokens of every message in the thread, and the part of it
+    # folded into the summary (messages up to the watermark): the rest is the history the graph holds
+    # Server defaults so the columns can be added to an existing table (see _add_missing_columns)
+    token_count: int = Field(default=0, sa_column_kwargs={"server_default": text("0")})
+    summarized_token_count: int = Field(default=0, sa_column_kwargs={"server_default": text("0")})
 
     user: Optional[User] = Relationship(back_populates="threads")
     messages: List["Message"] = Relationship(
@@ -56,6 +66,8 @@ class ThreadRead(ThreadBase):
     id: str
     created_at: datetime
     updated_at: datetime
+    token_count: int = 0
+    last_message_preview: Optional[str] = None  # Only filled in when the list asks for previews
 
 class ThreadUpdate(SQLModel):
     title: Optional[str] = None
@@ -65,11 +77,14 @@ class ThreadUpdate(SQLModel):
 class MessageBase(SQLModel):
     role: str
     content: str
-    thread_id: str = Field(foreign_key="threads.id", index=True)
+    thread_id: str = Field(foreign_key="threads.id")
 
 class Message(MessageBase, table=True):
     __tablename__ = "messages"
+    # Serves a thread's history in order and its keyset pages; also covers lookups by thread_id alone
+    __table_args__ = (Index("ix_messages_thread_id_timestamp_id", "thread_id", "timestamp", "id"),)
     id: Optional[int] = Field(default=None, primary_key=True, index=True) # Auto-incrementing int for messages
+    token_count: Optional[int] = Field(default=None) # Computed once on write; None for rows written before it existed
     timestamp: datetime = Field(
         default_factory=lambda: datetime.now(timezone.utc),
         sa_column=Column(DateTime(timezone=True), server_default=func.now())
@@ -106,20 +121,130 @@ class FileProcessingAttemptBase(SQLModel):
     status: FileProcessingStatusEnum = Field(default=FileProcessingStatusEnum.PENDING, index=True)
     message: Optional[str] = Field(default=None, sa_column=Column(Text, nullable=True))
     chunks_indexed: Optional[int] = Field(default=None)
+    # Kept out of the index: boilerplate and duplicate chunks (see core/dedup.py)
+    chunks_skipped: Optional[int] = Field(default=None)
+    tokens_saved: Optional[int] = Field(default=None)
     job_id: str = Field(foreign_key="upload_jobs.id")
 
 class FileProcessingAttempt(FileProcessingAttemptBase, table=True):
     __tablename__ = "file_processing_attempts"
+    # A file's status lookup and the job's status counts run on every update of a job's file
+    __table_args__ = (Index("ix_file_processing_attempts_job_id_filename", "job_id", "filename"),)
     id: Optional[int] = Field(default=None, primary_key=True, index=True)
+    # Processing window of the file, for the job throughput in the status response
+    started_at: Optional[datetime] = Field(default=None, sa_column=Column(DateTime(timezone=True), nullable=True))
+    finished_at: Optional[datetime] = Field(default=None, sa_column=Column(DateTime(timezone=True), nullable=True))
     
     job: Optional[UploadJob] = Relationship(back_populates="files")
 
+# --- Models for Batch Question Jobs (see workflow/batch.py) ---
+class BatchJob(SQLModel, table=True):
+    __tablename__ = "batch_jobs"
+    id: str = Field(default_factory=lambda: str(uuid.uuid4()), primary_key=True, index=True)
+    user_id: str  # Whose memories the answers draw on
+    overall_status: FileProcessingStatusEnum = Field(default=FileProcessingStatusEnum.PENDING, index=True)
+    created_at: datetime = Field(default_factory=datetime.utcnow, sa_column=Column(DateTime(timezone=True), server_default=func.now()))
+    updated_at: Optional[datetime] = Field(default=None, sa_column=Column(DateTime(timezone=True), onupdate=func.now(), server_default=func.now()))
+
+    questions: List["BatchQuestion"] = Relationship(
+        back_populates="job",
+        sa_relationship_kwargs={"cascade": "all, delete-orphan", "order_by": "BatchQuestion.position"},
+    )
+
+class BatchQuestion(SQLModel, table=True):
+    __tablename__ = "batch_questions"
+    __table_args__ = (Index("ix_batch_questions_job_id_position", "job_id", "position"),)
+    id: Optional[int] = Field(default=None, primary_key=True, index=True)
+    job_id: str = Field(foreign_key="batch_jobs.id")
+    position: int  # Index of the question in the request
+    question: str = Field(sa_column=Column(Text, nullable=False))
+    status: FileProcessingStatusEnum = Field(default=FileProcessingStatusEnum.PENDING, index=True)
+    answer: Optional[str] = Field(default=None, sa_column=Column(Text, nullable=True))
+    error: Optional[str] = Field(default=None, sa_column=Column(Text, nullable=True))
+    retrieval_loops: Optional[int] = Field(default=None)
+    started_at: Optional[datetime] = Field(default=None, sa_column=Column(DateTime(timezone=True), nullable=True))
+    finished_at: Optional[datetime] = Field(default=None, sa_column=Column(DateTime(timezone=True), nullable=True))
+
+    job: Optional[BatchJob] = Relationship(back_populates="questions")
+
+# --- Models for Graph Checkpoints ---
+class GraphCheckpoint(SQLModel, table=True):
+    __tablename__ = "graph_checkpoints"
+    thread_id: str = Field(primary_key=True)
+    checkpoint_ns: str = Field(default="", primary_key=True)
+    checkpoint_id: str = Field(primary_key=True)
+    parent_checkpoint_id: Optional[str] = Field(default=None)
+    type: str
+    checkpoint: bytes = Field(sa_column=Column(LargeBinary, nullable=False))
+    metadata_type: str
+    checkpoint_metadata: bytes = Field(sa_column=Column(LargeBinary, nullable=False))
+    created_at: datetime = Field(
+        default_factory=lambda: datetime.now(timezone.utc),
+        sa_column=Column(DateTime(timezone=True), server_default=func.now())
+    )
+
+class GraphCheckpointWrite(SQLModel, table=True):
+    __tablename__ = "graph_checkpoint_writes"
+    thread_id: str = Field(primary_key=True)
+    checkpoint_ns: str = Field(default="", primary_key=True)
+    checkpoint_id: str = Field(primary_key=True)
+    task_id: str = Field(primary_key=True)
+    idx: int = Field(primary_key=True)
+    channel: str
+    type: str
+    value: bytes = Field(sa_column=Column(LargeBinary, nullable=False))
+    task_path: str = Field(default="")
+
+# --- Models for the LLM Response Cache ---
+class LLMCacheEntry(SQLModel, table=True):
+    __tablename__ = "llm_cache"
+    key: str = Field(primary_key=True)  # sha256 of (llm_string, prompt)
+    model: str = Field(index=True)
+    value: str = Field(sa_column=Column(Text, nullable=False))
+    hits: int = Field(default=0)
+    created_at: datetime = Field(
+        default_factory=lambda: datetime.now(timezone.utc),
+        sa_column=Column(DateTime(timezone=True), nullable=False)
+    )
+    last_accessed_at: datetime = Field(
+        default_factory=lambda: datetime.now(timezone.utc),
+        sa_column=Column(DateTime(timezone=True), nullable=False, index=True)
+    )
+    expires_at: datetime = Field(sa_column=Column(DateTime(timezone=True), nullable=False, index=True))
+
 # Update forward references
 User.model_rebuild()
 Thread.model_rebuild()
 Message.model_rebuild()
 UploadJob.model_rebuild()
 FileProcessingAttempt.model_rebuild()
+BatchJob.model_rebuild()
+BatchQuestion.model_rebuild()
+
+def _add_missing_columns(connection) -> None:
+    """Add columns introduced after a table was created (there are no migrations): nullable
+    ones, and NOT NULL ones with a server default, which fills in the existing rows."""
+    inspector = inspect(connection)
+    preparer = connection.dialect.identifier_preparer
+    ddl_compiler = connection.dialect.ddl_compiler(connection.dialect, None)
+    for table in SQLModel.metadata.sorted_tables:
+        existing = {column["name"] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            default = ddl_compiler.get_column_default_string(column)
+            if column.name in existing or not (column.nullable or default is not None):
+                continue
+            column_spec = f"{preparer.format_column(column)} {column.type.compile(dialect=connection.dialect)}"
+            if default is not None:
+                column_spec += f" DEFAULT {default}"
+            if not column.nullable:
+                column_spec += " NOT NULL"
+            connection.execute(text(f"ALTER TABLE {preparer.format_table(table)} ADD COLUMN {column_spec}"))
 
 def create_db_and_tables(engine_to_use):
-    SQLModel.metadata.create_all(engine_to_use)
\ No newline at end of file
+    SQLModel.metadata.create_all(engine_to_use)
+    # create_all skips tables that already exist, so columns and indexes added later are created here
+    with engine_to_use.begin() as connection:
+        _add_missing_columns(connection)
+        for table in SQLModel.metadata.sorted_tables:
+            for index in table.indexes:
+                index.create(connection, checkfirst=True)
\ No newline at end of file
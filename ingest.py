@@ -0,0 +1,155 @@
+"""Bulk ingestion: index directories and archives of documents without going through the API.
+
+Every PDF, DOCX, HTML, Markdown and plain text file under the given paths is indexed as
+one upload job. Directories are walked recursively, and zip/tar archives are read member
+by member without being extracted. The job is tracked in the database like an upload, so
+`GET /api/upload/status/{job_id}` reports on it as well. Files are named by their path
+relative to the directory, or prefixed by the archive's name. Documents are parsed and
+split in `--workers` processes (see core/process_pool.py) and go through the same
+pipeline as uploads: concurrent files, cross-file embedding batches, vector store upserts.
+
+Usage:
+    python ingest.py /data/rrhh
+    python ingest.py onboarding.zip manuals/ --workers 8
+"""
+import argparse
+import asyncio
+import functools
+import os
+import sys
+import time
+from typing import List, Tuple
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("paths", nargs="+", help="Directories, zip/tar archives or single documents")
+    parser.add_argument(
+        "--workers", type=int, default=os.cpu_count() or 1,
+        help="Processes that parse and split documents; 0 parses in threads (default: one per CPU)",
+    )
+    parser.add_argument(
+        "--concurrency", type=int,
+        help="Files parsed at the same time (default: twice the workers, at least UPLOAD_JOB_CONCURRENCY)",
+    )
+    return parser.parse_args()
+
+
+def _read_file(path: str) -> bytes:
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def collect_files(paths: List[str], max_file_bytes: int) -> Tuple[list, List[str], list]:
+    """The job's files (read lazily), the skipped paths and the opened archives (to close at the end)."""
+    from core.archive import DocumentArchive, is_archive, is_hidden_path
+    from core.ingestion import JobFile
+    from core.loader import is_supported_document
+
+    files, skipped, archives, names = [], [], [], set()
+
+    def add(name: str, size: int, read, sequential: bool = False) -> None:
+        if name in names:
+            skipped.append(name)
+            return
+        names.add(name)
+        files.append(JobFile(filename=name, size=size, read=read, sequential=sequential))
+
+    for path in paths:
+        path = os.path.abspath(path)
+        if os.path.isdir(path):
+            parent = os.path.dirname(path)
+            for directory, subdirectories, filenames in os.walk(path):
+                subdirectories[:] = sorted(d for d in subdirectories if not is_hidden_path(d))
+                for filename in sorted(filenames):
+                    full_path = os.path.join(directory, filename)
+                    name = os.path.relpath(full_path, parent).replace(os.sep, "/")
+                    size = os.path.getsize(full_path)
+                    if is_hidden_path(filename) or not is_supported_document(filename) or size > max_file_bytes:
+                        skipped.append(name)
+                        continue
+                    add(name, size, functools.partial(asyncio.to_thread, _read_file, full_path))
+        elif is_archive(path):
+            archive = DocumentArchive(path, max_member_bytes=max_file_bytes)
+            archives.append(archive)
+            prefix = os.path.basename(path)
+            skipped.extend(f"{prefix}/{name}" for name in archive.skipped)
+            for member in archive.members:
+                add(
+                    f"{prefix}/{member.name}", member.size,
+                    functools.partial(asyncio.to_thread, archive.read, member.name), sequential=archive.sequential,
+                )
+        elif os.path.isfile(path) and is_supported_document(path) and os.path.getsize(path) <= max_file_bytes:
+            add(os.path.basename(path), os.path.getsize(path), functools.partial(asyncio.to_thread, _read_file, path))
+        else:
+            skipped.append(path)
+    return files, skipped, archives
+
+
+async def run(args: argparse.Namespace) -> int:
+    from core.config import settings
+    from core.ingestion import process_upload_job
+    from core.process_pool import shutdown_process_pool
+    from core.progress import upload_progress
+    from database import crud
+    from database.database import async_engine, async_session, engine
+    from database.models import FileProcessingStatusEnum, create_db_and_tables
+
+    create_db_and_tables(engine)
+    files, skipped, archives = collect_files(args.paths, settings.INGEST_MAX_FILE_BYTES)
+    try:
+        if not files:
+            print(f"No supported documents found ({len(skipped)} file(s) skipped).")
+            return 1
+        async with async_session() as db:
+            job = await crud.create_upload_job_in_db(db, [job_file.filename for job_file in files])
+        print(f"Job {job.id}: {len(files)} file(s) to index, {len(skipped)} skipped, {settings.INGEST_PROCESS_WORKERS} worker process(es).")
+
+        started = time.perf_counter()
+        finished = 0
+        with upload_progress.subscribe(job.id) as subscription:
+            task = asyncio.create_task(process_upload_job(job.id, files))
+            while not task.done() or not subscription.queue.empty():
+                event = await subscription.get(timeout=0.5)
+                if event is None or event["type"] != "file" or event["status"] not in ("completed", "failed"):
+                    continue
+                finished += 1
+                detail = f" ({event['message']})" if event["status"] == "failed" else ""
+                print(f"[{finished}/{len(files)}] {event['status']}: {event['filename']}{detail}")
+            await task
+        elapsed = time.perf_counter() - started
+
+        async with async_session() as db:
+            job = await crud.get_upload_job_from_db(db, job.id)
+        completed = [f for f in job.files if f.status == FileProcessingStatusEnum.COMPLETED]
+        chunks = sum(f.chunks_indexed or 0 for f in completed)
+        print(
+            f"Job {job.id} {job.overall_status.value}: {len(completed)}/{len(files)} file(s) indexed, {chunks} chunks "
+            f"in {elapsed:.1f}s ({len(completed) / elapsed * 60:.0f} files/min, {chunks / elapsed:.1f} chunks/s)."
+        )
+        skipped_chunks = sum(f.chunks_skipped or 0 for f in completed)
+        print(
+            f"Skipped {skipped_chunks} boilerplate or duplicate chunks "
+            f"({sum(f.tokens_saved or 0 for f in completed)} tokens not embedded)."
+        )
+        return 0 if len(completed) == len(files) else 1
+    finally:
+        for archive in archives:
+            archive.close()
+        shutdown_process_pool()
+        await async_engine.dispose()
+
+
+def main() -> None:
+    args = parse_args()
+    from core.config import settings
+
+    # Set before core.ingestion is imported, which sizes the process-wide upload slots
+    settings.INGEST_PROCESS_WORKERS = max(args.workers, 0)
+    concurrency = args.concurrency or max(2 * args.workers, settings.UPLOAD_JOB_CONCURRENCY)
+    settings.UPLOAD_JOB_CONCURRENCY = settings.UPLOAD_GLOBAL_CONCURRENCY = concurrency
+    sys.exit(asyncio.run(run(args)))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,19 +1,35 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Response, status
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
 
 from core.config import settings
-from database.database import engine
+from database.database import engine, async_engine
 from database.models import create_db_and_tables
-from api.routers import chat, memory, upload
+from core.post_response import post_response_pipeline
+from core.process_pool import shutdown_process_pool
+from core.profiling import ProfilingMiddleware, install_profiling_executor, profile_engine, profiling_enabled
+from core.warmup import warm_up
+from api.routers import batch, chat, memory, upload
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     print(f"INFO:     Starting up {settings.APP_NAME} v{settings.APP_VERSION}...")
     create_db_and_tables(engine)
     print("INFO:     Database tables checked/created.")
+    if profiling_enabled():
+        install_profiling_executor()
+        print(f"INFO:     Request profiling enabled, profiles are saved to {settings.PROFILING_OUTPUT_DIR}/")
+    await post_response_pipeline.start()
+    if settings.WARMUP_ENABLED:
+        # In the background: a slow service delays readiness (see /api/ready), not startup
+        warm_up.start()
     yield
     print(f"INFO:     Shutting down {settings.APP_NAME}...")
+    await warm_up.stop()
+    await post_response_pipeline.stop()
+    shutdown_process_pool()
+    await async_engine.dispose()
 
 app = FastAPI(
     title=settings.APP_NAME,
@@ -28,14 +44,34 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[chat.NEXT_CURSOR_HEADER, "Retry-After", "X-Job-Id"],  # Browsers hide other response headers from scripts
 )
 
+if profiling_enabled():
+    app.add_middleware(ProfilingMiddleware)
+    profile_engine(engine)
+    profile_engine(async_engine.sync_engine)
+
 @app.get("/api/health", tags=["Health"])
 async def health_check():
     return {"status": "ok", "message": f"{settings.APP_NAME} is running!"}
 
+@app.get("/api/ready", tags=["Health"])
+async def readiness_check(response: Response):
+    """503 until the startup warm-up (clients, connection pools, compiled graph) is over."""
+    if not settings.WARMUP_ENABLED:
+        return {"ready": True, "seconds": None, "steps": {}}
+    if not warm_up.ready:
+        response.status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    return warm_up.status()
+
+@app.get("/metrics", tags=["Health"], include_in_schema=False)
+async def prometheus_metrics():
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
+
 # Include API routers with a common prefix
 app.include_router(chat.router, prefix="/api")
 app.include_router(memory.router, prefix="/api", tags=["Memories"])
 app.include_router(upload.router, prefix="/api", tags=["Document Management (Internal)"]) # Updated tag
+app.include_router(batch.router, prefix="/api", tags=["Batch Questions (Internal)"])
 
@@ -0,0 +1,13 @@
+"""Tests run in offline mode (see core/offline.py), against a temporary SQLite database.
+
+The settings are read when core.config is first imported, so the environment is set here,
+before any test module imports the application.
+"""
+import os
+import tempfile
+
+os.environ.update({
+    "OFFLINE_MODE": "true",
+    "DATABASE_URL": f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='rag_tests_'), 'tests.db')}",
+    "WARMUP_ENABLED": "false",
+})
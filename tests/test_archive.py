@@ -0,0 +1,43 @@
+import io
+import os
+import random
+import tarfile
+
+from core.archive import DocumentArchive
+
+
+def make_tar(path: str, members: int) -> dict:
+    rng = random.Random(0)
+    contents = {}
+    with tarfile.open(path, "w:gz") as tar:
+        for i in range(members):
+            # Incompressible, so each member is a sizeable part of the stream
+            data = rng.randbytes(rng.randint(1, 64) * 1024)
+            info = tarfile.TarInfo(f"./docs/{i:03}.txt")
+            info.size = len(data)
+            tar.addfile(info, io.BytesIO(data))
+            contents[info.name] = data
+    return contents
+
+
+def test_compressed_tar_is_decompressed_once_in_any_read_order(tmp_path, monkeypatch):
+    path = os.path.join(tmp_path, "docs.tar.gz")
+    contents = make_tar(path, members=300)
+    offsets = []
+    extractfile = tarfile.TarFile.extractfile
+
+    def recording_extractfile(self, member):
+        offsets.append(member.offset_data)
+        return extractfile(self, member)
+
+    monkeypatch.setattr(tarfile.TarFile, "extractfile", recording_extractfile)
+    with DocumentArchive(path, max_member_bytes=1024 * 1024) as archive:
+        assert archive.sequential
+        assert [member.name for member in archive.members] == list(contents)
+        # Smallest first, as upload jobs order the files of a zip or a directory
+        for member in sorted(archive.members, key=lambda m: m.size):
+            assert archive.read(member.name) == contents[member.name]
+
+    # Each member extracted once, front to back: the gzip stream is never rewound
+    assert offsets == sorted(offsets)
+    assert len(offsets) == len(contents)
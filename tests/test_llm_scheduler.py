@@ -0,0 +1,181 @@
+"""The LLM scheduler against a local fake model that enforces provider quotas.
+
+The fake model rejects calls (rate-limit error with a retry-after) whenever more calls
+are in flight than its concurrency quota, or its token budget for the current window is
+exceeded. A burst of mixed-priority calls goes through the scheduler: the provider must
+never have to reject a call, and answer calls must be served ahead of title calls.
+"""
+import asyncio
+import statistics
+import threading
+import time
+from collections import defaultdict, deque
+from typing import Any, List, Optional
+
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage
+from langchain_core.messages.utils import count_tokens_approximately
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+from core.llm_scheduler import LLMScheduler, ModelQuota, Priority, get_retry_after, priority_override
+
+PROVIDER_CONCURRENCY = 4
+PROVIDER_TOKENS = 20_000
+WINDOW_SECONDS = 1.0
+
+
+class ProviderRateLimitError(Exception):
+    status_code = 429
+
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class QuotaEnforcingFakeModel(BaseChatModel):
+    """Chat model stand-in that behaves like a provider with hard quotas."""
+
+    model: str = "fake-quota-model"
+    latency_seconds: float = 0.05
+    max_concurrency: int = 4
+    tokens_per_window: int = 20_000
+    window_seconds: float = 1.0
+
+    def model_post_init(self, __context: Any) -> None:
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._window: deque = deque()
+        self._rejections = 0
+        self._calls = 0
+
+    @property
+    def rejections(self) -> int:
+        return self._rejections
+
+    @property
+    def calls(self) -> int:
+        return self._calls
+
+    @property
+    def _llm_type(self) -> str:
+        return "quota-enforcing-fake"
+
+    def _admit(self, tokens: int) -> None:
+        now = time.monotonic()
+        with self._lock:
+            while self._window and self._window[0][0] <= now - self.window_seconds:
+                self._window.popleft()
+            used = sum(t for _, t in self._window)
+            if self._in_flight >= self.max_concurrency or used + tokens > self.tokens_per_window:
+                self._rejections += 1
+                raise ProviderRateLimitError("429 RESOURCE_EXHAUSTED", retry_after=self.window_seconds / 4)
+            self._in_flight += 1
+            self._window.append((now, tokens))
+            self._calls += 1
+
+    def _done(self) -> None:
+        with self._lock:
+            self._in_flight -= 1
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager=None, **kwargs: Any) -> ChatResult:
+        self._admit(count_tokens_approximately(messages))
+        try:
+            time.sleep(self.latency_seconds)
+        finally:
+            self._done()
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content="ok"))])
+
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager=None, **kwargs: Any) -> ChatResult:
+        self._admit(count_tokens_approximately(messages))
+        try:
+            await asyncio.sleep(self.latency_seconds)
+        finally:
+            self._done()
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content="ok"))])
+
+
+def run_burst(calls: int = 200, sync_calls: int = 20, prompt_words: int = 200):
+    """Pushes a burst through the scheduler; returns the fake model and the latencies per priority."""
+    fake = QuotaEnforcingFakeModel(
+        max_concurrency=PROVIDER_CONCURRENCY,
+        tokens_per_window=PROVIDER_TOKENS,
+        window_seconds=WINDOW_SECONDS,
+        latency_seconds=0.02,
+    )
+    scheduler = LLMScheduler(
+        default_quota=ModelQuota(max_concurrency=PROVIDER_CONCURRENCY, tokens_per_minute=PROVIDER_TOKENS),
+        queue_timeouts={priority: 120.0 for priority in Priority},
+        token_window_seconds=WINDOW_SECONDS,
+    )
+    models = {priority: scheduler.wrap(fake, priority) for priority in Priority}
+    prompt = [HumanMessage(content="word " * prompt_words)]
+    latencies = defaultdict(list)
+
+    async def call(priority: Priority) -> None:
+        started = time.perf_counter()
+        await models[priority].ainvoke(prompt)
+        latencies[priority].append(time.perf_counter() - started)
+
+    def sync_call(priority: Priority) -> None:
+        started = time.perf_counter()
+        models[priority].invoke(prompt)
+        latencies[priority].append(time.perf_counter() - started)
+
+    async def burst() -> None:
+        priorities = list(Priority)
+        # The lowest classes are enqueued first on purpose: answers must still overtake them
+        coroutines = [call(priorities[-1 - (i % len(priorities))]) for i in range(calls)]
+        coroutines += [asyncio.to_thread(sync_call, Priority.AUXILIARY) for _ in range(sync_calls)]
+        await asyncio.gather(*coroutines)
+
+    asyncio.run(burst())
+    return fake, latencies
+
+
+def test_scheduler_keeps_calls_within_provider_quotas():
+    fake, latencies = run_burst()
+    assert fake.calls == 220
+    assert fake.rejections == 0
+    assert statistics.median(latencies[Priority.ANSWER]) < statistics.median(latencies[Priority.TITLE])
+
+
+def test_priority_override_queues_calls_behind_chat_calls():
+    fake = QuotaEnforcingFakeModel(max_concurrency=1, latency_seconds=0.05)
+    scheduler = LLMScheduler(default_quota=ModelQuota(max_concurrency=1, tokens_per_minute=PROVIDER_TOKENS))
+    model = scheduler.wrap(fake, Priority.ANSWER)
+    served: List[str] = []
+
+    async def call(name: str, override: Optional[Priority] = None) -> None:
+        # Each task runs in its own copy of the context, like a batch job's
+        priority_override.set(override)
+        await model.ainvoke("question")
+        served.append(name)
+
+    async def scenario() -> None:
+        holder = asyncio.create_task(call("holder"))
+        await asyncio.sleep(0.01)  # Takes the only slot
+        batch = asyncio.create_task(call("batch", Priority.BATCH))
+        await asyncio.sleep(0.01)
+        chat = asyncio.create_task(call("chat"))
+        await asyncio.gather(holder, batch, chat)
+
+    asyncio.run(scenario())
+    assert served == ["holder", "chat", "batch"]
+
+
+def test_rate_limits_are_detected_by_status_and_type_not_message():
+    class TooManyRequests(Exception):
+        pass
+
+    class ResponseError(Exception):
+        def __init__(self, message: str, status_code: int):
+            super().__init__(message)
+            self.response = type("Response", (), {"status_code": status_code})()
+
+    assert get_retry_after(ProviderRateLimitError("slow down", retry_after=2)) == 2.0
+    assert get_retry_after(TooManyRequests("quota exceeded, retry in 7s")) == 7.0
+    assert get_retry_after(ResponseError("too many requests", 429)) == 0.0
+    assert get_retry_after(Exception("429 RESOURCE_EXHAUSTED")) == 0.0
+    # A 429 that is not a status: a token count, a request id
+    assert get_retry_after(Exception("prompt is 1429 tokens over the limit")) is None
+    assert get_retry_after(ResponseError("request 429abc failed", 500)) is None
@@ -0,0 +1,109 @@
+"""Database round trips of a chat turn, so the count can't silently creep back up.
+
+Turns go through `POST /api/threads/{id}/messages` (the app in-process). The statements
+and commits each turn issues on both engines are counted, split by who issued them:
+
+- `handler`: the endpoint's own persistence (threads, messages);
+- `checkpointer`: graph checkpoint reads and writes;
+- `llm_cache`: persistent LLM cache lookups and writes.
+
+The first turn of a thread bootstraps its graph state from the messages, the following
+ones start from the checkpoint. Post-response work (titles, memory extraction, summaries)
+runs after the answer and is not counted.
+"""
+import asyncio
+import re
+from collections import Counter
+from contextvars import ContextVar
+from typing import Dict, List, Optional
+
+import httpx
+import pytest
+from sqlalchemy import event
+
+# Thread read, user message insert + token count update + commit, same for the answer
+HANDLER_STATEMENTS_PER_TURN = 7
+
+_HANDLER_TABLES = re.compile(r"\b(?:threads|messages|users)\b")
+_turn_queries: ContextVar[Optional[Counter]] = ContextVar("turn_queries", default=None)
+
+QUESTIONS = [
+    "¿Cuántos días de vacaciones me corresponden al año?",
+    "¿Y si entré a mitad de año?",
+    "¿Puedo acumular los días que no use?",
+]
+
+
+def statement_origin(statement: str) -> str:
+    # The handler's thread read embeds a checkpoint EXISTS, so its own tables are checked first
+    if _HANDLER_TABLES.search(statement):
+        return "handler"
+    if "graph_checkpoint" in statement:
+        return "checkpointer"
+    if "llm_cache" in statement:
+        return "llm_cache"
+    return "handler"
+
+
+def count_queries(engine) -> None:
+    """Count the statements and commits issued through `engine` while a turn is being measured."""
+    @event.listens_for(engine, "before_cursor_execute")
+    def _statement(conn, cursor, statement, parameters, context, executemany):
+        counter = _turn_queries.get()
+        if counter is not None:
+            origin = statement_origin(statement)
+            conn.info["turn_origin"] = origin
+            counter[origin] += 1
+
+    @event.listens_for(engine, "commit")
+    def _commit(conn):
+        counter = _turn_queries.get()
+        if counter is not None:
+            counter[conn.info.pop("turn_origin", "handler")] += 1
+
+
+async def run_turns(turns: int) -> List[Dict[str, int]]:
+    import main
+    from database.database import async_engine, engine
+
+    count_queries(engine)
+    count_queries(async_engine.sync_engine)
+
+    counts = []
+    try:
+        async with main.app.router.lifespan_context(main.app):
+            transport = httpx.ASGITransport(app=main.app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://turn-queries", timeout=60) as client:
+                (await client.post("/api/users", json={"user_id": "turn-queries"})).raise_for_status()
+                thread = (await client.post("/api/threads", json={"user_id": "turn-queries"})).raise_for_status().json()
+                for turn in range(turns):
+                    counter = Counter()
+                    token = _turn_queries.set(counter)
+                    try:
+                        response = await client.post(
+                            f"/api/threads/{thread['id']}/messages",
+                            json={"user_id": "turn-queries", "content": QUESTIONS[turn % len(QUESTIONS)]},
+                        )
+                    finally:
+                        _turn_queries.reset(token)
+                    response.raise_for_status()
+                    counts.append(dict(counter))
+    finally:
+        await async_engine.dispose()
+    return counts
+
+
+@pytest.fixture(scope="module")
+def turn_counts() -> List[Dict[str, int]]:
+    return asyncio.run(run_turns(len(QUESTIONS)))
+
+
+def test_bootstrap_turn_handler_statements(turn_counts):
+    assert turn_counts[0]["handler"] == HANDLER_STATEMENTS_PER_TURN
+
+
+def test_checkpointed_turn_handler_statements(turn_counts):
+    # The history comes from the checkpoint: the thread read joins no messages
+    for counts in turn_counts[1:]:
+        assert counts["handler"] == HANDLER_STATEMENTS_PER_TURN
+        assert counts["checkpointer"] > 0
@@ -1,8 +1,12 @@
+import asyncio
+from typing import List
+
 from langchain_core.documents import Document
-from langchain_google_genai import ChatGoogleGenerativeAI
+from langchain_core.messages import HumanMessage
 
 from pydantic import BaseModel, Field
-from core.config import settings
+from core.llm_cache import ainvoke_structured
+from workflow.llms import get_title_model
 
 # Function to format documents as a string of document Objects
 def format_docs(docs: list[Document]) -> str:
@@ -20,16 +24,40 @@ class Title(BaseModel):
 
 
 async def generate_thead_title(message: str) -> str:
-    title = await (
-        ChatGoogleGenerativeAI(
-            model=settings.THREAD_TITLE_GENERATOR_MODEL,
-            api_key=settings.GOOGLE_API_KEY,
-            temperature=0.2,
-        )
-        .with_structured_output(Title)
-        .ainvoke(
-            "Generate a 4-5 words title based on the following user message. \nUser Message: "
-            + message
-        )
+    title = await ainvoke_structured(
+        get_title_model(),
+        Title,
+        [
+            HumanMessage(
+                content="Generate a 4-5 words title based on the following user message. \nUser Message: "
+                + message
+            )
+        ],
+    )
+    return title.title
+
+
+class Titles(BaseModel):
+    titles: List[str] = Field(..., description="One title per user message, in the same order as the messages.")
+
+
+async def generate_thread_titles(messages: List[str]) -> List[str]:
+    """Generate titles for several threads with a single model call."""
+    if len(messages) == 1:
+        return [await generate_thead_title(messages[0])]
+
+    numbered_messages = "\n".join(f"{i}. {message}" for i, message in enumerate(messages, start=1))
+    result = await ainvoke_structured(
+        get_title_model(),
+        Titles,
+        [
+            HumanMessage(
+                content="Generate a 4-5 words title for each of the following user messages, in the same order. \nUser Messages:\n"
+                + numbered_messages
+            )
+        ],
     )
-    return title.title
\ No newline at end of file
+    if len(result.titles) != len(messages):
+        # The model merged or skipped some messages: fall back to one call per message
+        return list(await asyncio.gather(*(generate_thead_title(message) for message in messages)))
+    return result.titles
\ No newline at end of file
@@ -0,0 +1,38 @@
+from typing import Sequence
+
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage
+from langchain_core.messages.utils import count_tokens_approximately
+
+# Key under which a message's token count is cached in its `response_metadata`
+TOKEN_COUNT_KEY = "token_count"
+
+
+def count_content_tokens(role: str, content: str) -> int:
+    """Token count of a stored message, as it will be counted once loaded into the graph."""
+    message_class = HumanMessage if role == "user" else AIMessage
+    return count_tokens_approximately([message_class(content=content)])
+
+
+def count_message_tokens(message: BaseMessage) -> int:
+    """Approximate token count of a single message, computed once and cached on the message."""
+    count = message.response_metadata.get(TOKEN_COUNT_KEY)
+    if count is None:
+        count = count_tokens_approximately([message])
+        message.response_metadata[TOKEN_COUNT_KEY] = count
+    return count
+
+
+def count_tokens_cached(messages: Sequence[BaseMessage]) -> int:
+    """Drop-in replacement for `count_tokens_approximately` that reuses cached per-message counts.
+
+    Approximate counts are rounded per message, so the sum equals counting the whole list.
+    """
+    return sum(
+        count_message_tokens(message) if isinstance(message, BaseMessage) else count_tokens_approximately([message])
+        for message in messages
+    )
+
+
+def count_text_tokens(text: str) -> int:
+    """Approximate token count of plain text (e.g. a document chunk), same heuristic as the message counts."""
+    return count_tokens_approximately([HumanMessage(content=text)], extra_tokens_per_message=0)
@@ -0,0 +1,174 @@
+"""Batch question answering: many independent questions through the graph, as one job.
+
+Used by `POST /api/batch/questions` (api/routers/batch.py) and the `batch_questions.py`
+CLI for audits, FAQ regeneration and evaluations. A question is answered outside any
+thread: the graph runs without history or checkpoint, and nothing is stored but the
+answer, on the job's row for the question. Memories of the job's user are searched, but
+no new ones are extracted. Up to BATCH_QA_CONCURRENCY questions of a job run at a time,
+and up to BATCH_QA_GLOBAL_CONCURRENCY across jobs. The questions of a job share their
+retrievals (see SharedRetrievals in workflow/tools.py). Status changes are stored in the
+database and published to the job's listeners (see core/progress.py).
+
+Batch jobs don't go through the chat admission controller. Instead, all of their model
+calls are scheduled as Priority.BATCH, behind every chat call waiting for the same model
+(see core/llm_scheduler.py). Chat turns then only wait on the batch calls already in
+flight, from at most BATCH_QA_GLOBAL_CONCURRENCY questions, and on the tokens they used.
+Under sustained chat load a batch question waits instead, and fails if one of its calls
+has queued longer than LLM_QUEUE_TIMEOUT_SECONDS["batch"].
+"""
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncContextManager, AsyncIterator, Dict, List, Optional, Set, Tuple
+
+from langchain_core.messages import AIMessage, HumanMessage
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from core.config import settings
+from core.llm_scheduler import Priority, priority_override
+from core.metrics import RETRIEVAL_LOOPS
+from core.progress import batch_progress
+from database import crud as db_crud
+from database.database import async_session
+from database.models import BatchQuestion, FileProcessingStatusEnum
+from workflow.graph import get_stateless_graph
+from workflow.instrumentation import node_timings
+from workflow.tools import SharedRetrievals, shared_retrievals
+
+# Shared by every batch job of the process; each job also has its own limit (see process_batch_job)
+_global_batch_slots = asyncio.Semaphore(settings.BATCH_QA_GLOBAL_CONCURRENCY)
+# Jobs started by `start_batch_job`, referenced until they finish
+_running_jobs: Set[asyncio.Task] = set()
+
+
+async def answer_question(user_id: str, question: str) -> Tuple[str, int]:
+    """Runs one question through the graph; returns the answer and the number of query rewrites."""
+    graph_input = {
+        "user_id": user_id,
+        "messages": [HumanMessage(content=question)],
+        "running_summary": None,
+        "retrieval_loop_count": 0,
+    }
+    final_graph_state = await get_stateless_graph().ainvoke(graph_input, {"callbacks": [node_timings]})
+    ai_response_message = final_graph_state["messages"][-1]
+    if not isinstance(ai_response_message, AIMessage):
+        raise ValueError("RAG pipeline did not return an AI message.")
+    retrieval_loops = final_graph_state.get("retrieval_loop_count", 0)
+    RETRIEVAL_LOOPS.observe(retrieval_loops)
+    return ai_response_message.content, retrieval_loops
+
+def question_event(
+    position: int,
+    question: str,
+    question_status: FileProcessingStatusEnum,
+    answer: Optional[str] = None,
+    error: Optional[str] = None,
+    retrieval_loops: Optional[int] = None,
+    seconds: Optional[float] = None,
+) -> Dict[str, Any]:
+    """A question's status event; also the line of a finished question in the JSONL results."""
+    return {
+        "type": "question", "position": position, "question": question, "status": question_status.value,
+        "answer": answer, "error": error, "retrieval_loops": retrieval_loops, "seconds": seconds,
+    }
+
+def stored_question_event(row: BatchQuestion) -> Dict[str, Any]:
+    """The status event of a question as stored in the database."""
+    seconds = None
+    if row.started_at is not None and row.finished_at is not None:
+        seconds = round((row.finished_at - row.started_at).total_seconds(), 3)
+    return question_event(row.position, row.question, row.status, row.answer, row.error, row.retrieval_loops, seconds)
+
+async def update_question_status(
+    db: AsyncSession,
+    job_id: str,
+    position: int,
+    question: str,
+    question_status: FileProcessingStatusEnum,
+    answer: Optional[str] = None,
+    error: Optional[str] = None,
+    retrieval_loops: Optional[int] = None,
+    seconds: Optional[float] = None,
+) -> None:
+    """Store a question's new status and publish it (and the job's overall status) to the job's listeners."""
+    job = await db_crud.update_batch_question_in_db(
+        db, job_id, position, question_status, answer=answer, error=error, retrieval_loops=retrieval_loops
+    )
+    batch_progress.publish(
+        job_id, question_event(position, question, question_status, answer, error, retrieval_loops, seconds)
+    )
+    if job is not None:
+        batch_progress.publish(job_id, {"type": "job", "overall_status": job.overall_status.value})
+
+async def answer_job_question(job_id: str, user_id: str, position: int, question: str, slot: AsyncContextManager) -> bool:
+    """Answers one question of a job and stores the outcome; returns whether it was answered."""
+    async with async_session() as db:
+        started = time.perf_counter()
+        try:
+            async with slot:
+                await update_question_status(db, job_id, position, question, FileProcessingStatusEnum.PROCESSING)
+                started = time.perf_counter()
+                answer, retrieval_loops = await answer_question(user_id, question)
+            await update_question_status(
+                db, job_id, position, question, FileProcessingStatusEnum.COMPLETED,
+                answer=answer, retrieval_loops=retrieval_loops, seconds=round(time.perf_counter() - started, 3),
+            )
+            return True
+        except Exception as e:
+            print(f"Batch job {job_id}: question {position} failed: {e}")
+            # A failed flush leaves the session unusable until it is rolled back
+            await db.rollback()
+            await update_question_status(
+                db, job_id, position, question, FileProcessingStatusEnum.FAILED,
+                error=str(e), seconds=round(time.perf_counter() - started, 3),
+            )
+            return False
+
+async def process_batch_job(job_id: str, user_id: str, questions: List[str]) -> Dict[str, Any]:
+    """
+    Answers the questions of a job concurrently and returns its summary, which is also
+    published as the job's last event. The questions are embedded in one request up
+    front: speculative retrieval searches for each question as asked.
+    """
+    shared = SharedRetrievals()
+    # Set in this task's context, which the questions' tasks inherit
+    shared_retrievals.set(shared)
+    priority_override.set(Priority.BATCH)
+    job_slots = asyncio.Semaphore(settings.BATCH_QA_CONCURRENCY)
+
+    @asynccontextmanager
+    async def question_slot() -> AsyncIterator[None]:
+        async with job_slots, _global_batch_slots:
+            yield
+
+    started = time.perf_counter()
+    answered: List[bool] = []
+    try:
+        if settings.SPECULATIVE_RETRIEVAL:
+            try:
+                await shared.embed(questions)
+            except Exception as e:
+                print(f"Batch job {job_id}: could not embed the questions up front, embedding them one by one: {e}")
+        answered = await asyncio.gather(*(
+            answer_job_question(job_id, user_id, position, question, question_slot())
+            for position, question in enumerate(questions)
+        ))
+    finally:
+        summary = {
+            "type": "summary",
+            "job_id": job_id,
+            "questions": len(questions),
+            "completed": sum(answered),
+            "failed": len(questions) - sum(answered),
+            "seconds": round(time.perf_counter() - started, 3),
+            "retrieval": shared.stats(),
+        }
+        batch_progress.publish(job_id, summary)
+    return summary
+
+def start_batch_job(job_id: str, user_id: str, questions: List[str]) -> asyncio.Task:
+    """Runs the job in the background; it keeps going if the client that started it goes away."""
+    task = asyncio.create_task(process_batch_job(job_id, user_id, questions))
+    _running_jobs.add(task)
+    task.add_done_callback(_running_jobs.discard)
+    return task
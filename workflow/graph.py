@@ -2,6 +2,8 @@ from functools import lru_cache
 
 from langgraph.graph import START, StateGraph
 
+from database.database import engine, async_engine
+from database.checkpointer import SQLModelCheckpointSaver
 from workflow.state import WorkflowState
 from workflow.nodes import (
     answer_or_retrieve,
@@ -34,5 +36,15 @@ def create_graph() -> StateGraph:
 
     return graph
 
-# Compiled the graph
-graph = create_graph().compile()
\ No newline at end of file
+# Graph state is checkpointed per thread in the application database
+checkpointer = SQLModelCheckpointSaver(engine, async_engine)
+
+@lru_cache(maxsize=1)
+def get_graph():
+    """The compiled graph, built on first use (or during the startup warm-up)."""
+    return create_graph().compile(checkpointer=checkpointer)
+
+@lru_cache(maxsize=1)
+def get_stateless_graph():
+    """The compiled graph without a checkpointer, for one-off questions outside a thread (see workflow/batch.py)."""
+    return create_graph().compile()
\ No newline at end of file
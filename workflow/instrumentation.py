@@ -0,0 +1,64 @@
+import math
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+from core.metrics import GRAPH_NODE_DURATION
+
+
+def percentile(sorted_values: list, q: float) -> float:
+    """Nearest-rank percentile of an already sorted list (0.0 if empty)."""
+    if not sorted_values:
+        return 0.0
+    index = max(0, math.ceil(q / 100 * len(sorted_values)) - 1)
+    return sorted_values[index]
+
+
+class NodeTimingHandler(BaseCallbackHandler):
+    """Callback handler recording the wall-clock time spent in each graph node.
+
+    Pass it in the graph config (`{"callbacks": [node_timings]}`). Durations go to the
+    `rag_graph_node_duration_seconds` histogram (see core/metrics.py).
+    """
+
+    run_inline = True  # Cheap bookkeeping, no need for a thread hop in async runs
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._starts: Dict[UUID, Tuple[str, float]] = {}
+
+    def on_chain_start(
+        self,
+        serialized: Optional[Dict[str, Any]],
+        inputs: Any,
+        *,
+        run_id: UUID,
+        metadata: Optional[Dict[str, Any]] = None,
+        **kwargs: Any,
+    ) -> None:
+        node = (metadata or {}).get("langgraph_node")
+        # Runs nested inside a node share its metadata; only the node run itself has its name
+        if node is not None and kwargs.get("name") == node:
+            with self._lock:
+                self._starts[run_id] = (node, time.perf_counter())
+
+    def _finish(self, run_id: UUID) -> None:
+        with self._lock:
+            started = self._starts.pop(run_id, None)
+        if started is None:
+            return
+        node, start = started
+        GRAPH_NODE_DURATION.labels(node=node).observe(time.perf_counter() - start)
+
+    def on_chain_end(self, outputs: Any, *, run_id: UUID, **kwargs: Any) -> None:
+        self._finish(run_id)
+
+    def on_chain_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        # Failed nodes are timed too (Command-based routing also surfaces as control-flow exceptions in some versions)
+        self._finish(run_id)
+
+
+node_timings = NodeTimingHandler()
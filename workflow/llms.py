@@ -1,25 +1,78 @@
-from langchain_google_genai import ChatGoogleGenerativeAI
+from functools import lru_cache
+
+from langchain_core.language_models import BaseChatModel
 
 from core.config import settings
+from core.llm_cache import llm_cache
+from core.llm_scheduler import llm_scheduler, Priority
+from core.offline import FakeChatModel
+
+
+def chat_model(model: str, **kwargs) -> BaseChatModel:
+    """Gemini chat model, or its deterministic stand-in in offline mode."""
+    if settings.OFFLINE_MODE:
+        return FakeChatModel(
+            model=model,
+            latency_seconds=settings.OFFLINE_LLM_LATENCY_SECONDS,
+            tool_call_probability=settings.OFFLINE_TOOL_CALL_PROBABILITY,
+            **kwargs
+        )
+    # Imported here: the Gemini client library takes about half a second to import
+    from langchain_google_genai import ChatGoogleGenerativeAI
+
+    return ChatGoogleGenerativeAI(model=model, api_key=settings.GOOGLE_API_KEY, **kwargs)
+
+# Every client goes through the shared scheduler (per-model quotas, priorities, rate-limit backoff).
+# Clients are created on first use, so importing the workflow costs no client setup.
+
+@lru_cache(maxsize=1)
+def get_summarization_model():
+    return llm_scheduler.wrap(
+        chat_model(settings.SUMMARY_MODEL),
+        Priority.ROUTER,  # On the critical path, before the router call
+    )
+
+@lru_cache(maxsize=1)
+def get_main_model():
+    """Used for the final answer; the router call lowers it with `.with_priority(Priority.ROUTER)`."""
+    return llm_scheduler.wrap(
+        chat_model(settings.PRIMARY_MODEL),
+        Priority.ANSWER,
+    )
+
+# Auxiliary models below see highly repetitive prompts, so they are served from the persistent LLM cache
 
-summarization_model = ChatGoogleGenerativeAI(
-    model=settings.SUMMARY_MODEL, 
-    api_key=settings.GOOGLE_API_KEY
+@lru_cache(maxsize=1)
+def get_scoring_model():
+    return llm_scheduler.wrap(
+        chat_model(
+            settings.SCORE_DOCUMENTS_MODEL,
+            temperature=0.5,
+            cache=llm_cache
+        ),
+        Priority.AUXILIARY,
     )
 
-main_model = ChatGoogleGenerativeAI(
-    model=settings.PRIMARY_MODEL,
-    api_key=settings.GOOGLE_API_KEY
+@lru_cache(maxsize=1)
+def get_rewriter_model():
+    return llm_scheduler.wrap(
+        chat_model(
+            settings.REWRITE_QUERY_MODEL,
+            temperature=0.5,
+            cache=llm_cache
+        ),
+        Priority.AUXILIARY,
     )
 
-scoring_model = ChatGoogleGenerativeAI(
-    model=settings.SCORE_DOCUMENTS_MODEL,
-    api_key=settings.GOOGLE_API_KEY,
-    temperature=0.5
+@lru_cache(maxsize=1)
+def get_title_model():
+    return llm_scheduler.wrap(
+        chat_model(
+            settings.THREAD_TITLE_GENERATOR_MODEL,
+            temperature=0.2,
+            cache=llm_cache
+        ),
+        Priority.TITLE,
     )
 
-rewriter_model = ChatGoogleGenerativeAI(
-    model=settings.REWRITE_QUERY_MODEL,
-    api_key=settings.GOOGLE_API_KEY,
-    temperature=0.5
-)
\ No newline at end of file
+MODEL_ACCESSORS = (get_summarization_model, get_main_model, get_scoring_model, get_rewriter_model, get_title_model)
@@ -2,23 +2,27 @@ from typing import Literal
 from pydantic import BaseModel, Field
 
 from langchain_core.runnables import RunnableConfig
-from langchain_core.messages.utils import count_tokens_approximately
 from langchain_core.messages import SystemMessage, HumanMessage, RemoveMessage
 
-from langmem.short_term import SummarizationNode
+from langmem.short_term import RunningSummary, summarize_messages
 from langgraph.types import Command
 
 from .state import WorkflowState
-from .llms import summarization_model, main_model, scoring_model, rewriter_model
+from .llms import get_summarization_model, get_main_model, get_scoring_model, get_rewriter_model
 from .tools import tools, tools_by_name
+from .speculation import SpeculativeRetrieval
 from .prompts import (
     QUERY_ROUTER_MODEL_PROMPT,
     EXPERT_RESPONSE_MODEL_PROMPT,
     REWRITE_PROMPT,
     SCORE_PROMPT,
 )
-from core.mem0_client import mem0_client as memory
+from core.mem0_client import get_memory_client
+from core.llm_cache import invoke_structured
+from core.llm_scheduler import Priority
+from core.metrics import DOCUMENT_SCORES
 from core.config import settings
+from utils.tokens import count_tokens_cached
 
 ###########################
 # Handle User Memories
@@ -33,12 +37,11 @@ def handle_memories(
     message = state["messages"][-1].content
 
     memories = []
-    
-    # Insert memories from user's last message
-    memory.add(message, user_id=user_id, version="v2")
-    
+
+    # New memories are extracted from the message after the response is returned (post-response pipeline)
+
     # Search user memories based on the last message
-    results = memory.search(
+    results = get_memory_client().search(
         query=message,
         version="v2",
         filters={
@@ -58,21 +61,65 @@ def handle_memories(
 ###########################
 # Summarize Messages
 ###########################
-summarization_node = SummarizationNode(  
-    token_counter=count_tokens_approximately,
-    model=summarization_model,
-    max_tokens=settings.MAX_TOKENS,
-    max_tokens_before_summary=settings.MESSAGES_SUMMARY_TRIGGER,
-    max_summary_tokens=settings.MAX_SUMMARY_TOKENS, 
-    input_messages_key="messages",
-    output_messages_key="messages",
-    name="summarize_messages"
-)
+def summarization_node(
+    state: WorkflowState, config: RunnableConfig
+) -> dict:
+    """Fold the oldest messages into the running summary once the history grows too long.
+
+    Summarized messages are removed from the state; the summary itself lives in
+    `running_summary` so it can be persisted on the thread and injected into prompts.
+    """
+    messages = state["messages"]
+    running_summary = state.get("running_summary")
+
+    # Below the trigger there is nothing to do. A thread's turn passes its running total,
+    # so the history isn't counted at all; otherwise counts are cached per message. The
+    # total can be ahead of the state (the summary is stored after the response), in
+    # which case langmem counts the history itself and finds nothing to summarize.
+    history_token_count = state.get("history_token_count")
+    if history_token_count is None:
+        history_token_count = count_tokens_cached(messages)
+    if history_token_count < settings.MESSAGES_SUMMARY_TRIGGER:
+        return {}
+
+    result = summarize_messages(
+        messages,
+        running_summary=running_summary,
+        model=get_summarization_model(),
+        max_tokens=settings.MAX_TOKENS,
+        max_tokens_before_summary=settings.MESSAGES_SUMMARY_TRIGGER,
+        max_summary_tokens=settings.MAX_SUMMARY_TOKENS,
+        token_counter=count_tokens_cached,
+    )
+    if result.running_summary is None or result.running_summary is running_summary:
+        # Nothing new was summarized
+        return {}
+
+    kept_ids = {message.id for message in result.messages}
+    summarized_messages = [m for m in messages if m.id not in kept_ids]
+    # Summarized messages leave the state, so only the latest batch of ids needs to be
+    # tracked; this keeps the checkpointed summary constant in size.
+    new_running_summary = RunningSummary(
+        summary=result.running_summary.summary,
+        summarized_message_ids={m.id for m in summarized_messages},
+        last_summarized_message_id=result.running_summary.last_summarized_message_id,
+    )
+    return {
+        "messages": [RemoveMessage(id=m.id) for m in summarized_messages],
+        "running_summary": new_running_summary,
+    }
+
+def format_summary(state: WorkflowState) -> list[SystemMessage]:
+    """Return the running summary as a system message, if there is one."""
+    running_summary = state.get("running_summary")
+    if not running_summary:
+        return []
+    return [SystemMessage(content=f"Summary of the conversation so far: {running_summary.summary}")]
 
 ###########################
 # Answer or Retrieve
 ###########################
-def answer_or_retrieve(
+async def answer_or_retrieve(
     state: WorkflowState, config: RunnableConfig
 ) -> Command[Literal["retrieve", "__end__"]]:
     """Decide whether to answer or retrieve documents."""
@@ -85,36 +132,60 @@ def answer_or_retrieve(
     else:
         user_memories = "User Memories: (no memories yet)"
 
-    agent_with_tool = main_model.bind_tools(tools)
-    response = agent_with_tool.invoke(
+    # Speculatively retrieve on the raw user message while the router decides
+    speculation = None
+    if settings.SPECULATIVE_RETRIEVAL and messages and isinstance(messages[-1], HumanMessage):
+        speculation = SpeculativeRetrieval(messages[-1].content)
+
+    agent_with_tool = get_main_model().with_priority(Priority.ROUTER).bind_tools(tools)
+    response = await agent_with_tool.ainvoke(
         [
             SystemMessage(
                 content=QUERY_ROUTER_MODEL_PROMPT.format(memories=user_memories)
             )
-        ] + messages
+        ] + format_summary(state) + messages
     )
 
     if hasattr(response, "tool_calls") and response.tool_calls:
+        update = {"messages": [response]}
+        if speculation:
+            if len(response.tool_calls) == 1:
+                update["speculative_context"] = await speculation.resolve(response.tool_calls[0]["args"])
+            else:
+                speculation.discard()
         return Command(
-            goto="retrieve", update={"messages": [response]}
+            goto="retrieve", update=update
         )
     # End the conversation
+    if speculation:
+        speculation.discard()
     return Command(update={"messages": [response]}, goto="__end__")
 
 ###########################
 # Retrieval Node
 ###########################
+def format_retrieval(result: str) -> str:
+    """One retrieval's documents as they appear in the context."""
+    return f"---\n{result}\n---" if result else ""
+
 def retrieve(
     state: WorkflowState, config: RunnableConfig
 ) -> Command[Literal["score_documents"]]:
     """Retrieve documents based on the last message's tool call."""
 
+    # Reuse the speculative retrieval started alongside the router call
+    speculative_context = state.get("speculative_context")
+    if speculative_context is not None:
+        return Command(
+            update={"context": format_retrieval(speculative_context), "speculative_context": None},
+            goto="score_documents"
+        )
+
     results = ""
     for tool_call in state["messages"][-1].tool_calls:
         tool = tools_by_name[tool_call["name"]]
         result: str = tool.invoke(tool_call["args"])
-        if result:
-            results += f"---\n{result}\n---"
+        results += format_retrieval(result)
 
     return Command(
         update={"context": results},
@@ -139,11 +210,8 @@ def score_documents(
 
     prompt = SCORE_PROMPT.format(question=question, docs=docs)
     
-    response = (
-        scoring_model
-        .with_structured_output(ScoreDocument)
-        .invoke([HumanMessage(content=prompt)])
-    )
+    response = invoke_structured(get_scoring_model(), ScoreDocument, [HumanMessage(content=prompt)])
+    DOCUMENT_SCORES.labels(score=str(response.score)).inc()
 
     if (
         response.score < settings.SCORE_THRESHOLD
@@ -172,11 +240,7 @@ def rewrite_query(
     tool_call = ai_message.tool_calls[-1]
 
     prompt = REWRITE_PROMPT.format(query=tool_call["args"]["query"])
-    response = (
-        rewriter_model
-        .with_structured_output(ModifiedQuery)
-        .invoke([HumanMessage(content=prompt)])
-    )
+    response = invoke_structured(get_rewriter_model(), ModifiedQuery, [HumanMessage(content=prompt)])
 
     # Update the tool call
     updated_message = {
@@ -212,14 +276,14 @@ def generate_answer(
     else:
         user_memories = "User Memories: (no memories yet)"
 
-    response = main_model.invoke(
+    response = get_main_model().invoke(
         [
             SystemMessage(
                 content=EXPERT_RESPONSE_MODEL_PROMPT.format(
                     memories=user_memories, context=context
                 )
             )
-        ] + messages
+        ] + format_summary(state) + messages
     )
 
     # End the conversation
@@ -0,0 +1,74 @@
+import asyncio
+import re
+import time
+import unicodedata
+from typing import Any, Dict, Optional
+
+from core.config import settings
+from core.metrics import SPECULATION_SECONDS_SAVED, SPECULATIVE_RETRIEVALS
+from .tools import DEFAULT_TOP_K, retrieve_documents
+
+
+def _normalize_tokens(text: str) -> set[str]:
+    """Lowercased, accent-free word tokens (3+ chars) used to compare queries."""
+    text = unicodedata.normalize("NFKD", text.lower())
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    return {token for token in re.findall(r"\w+", text) if len(token) >= 3}
+
+
+def query_similarity(a: str, b: str) -> float:
+    """Jaccard similarity between the token sets of two queries."""
+    tokens_a, tokens_b = _normalize_tokens(a), _normalize_tokens(b)
+    if not tokens_a or not tokens_b:
+        return 0.0
+    return len(tokens_a & tokens_b) / len(tokens_a | tokens_b)
+
+
+class SpeculativeRetrieval:
+    """Retrieval on the raw user message, started concurrently with the router model call."""
+
+    def __init__(self, query: str, top_k: int = DEFAULT_TOP_K):
+        self.query = query
+        self.top_k = top_k
+        self.started_at = time.perf_counter()
+        self.finished_at: Optional[float] = None
+        self.task = asyncio.create_task(self._run())
+        # Avoid "exception was never retrieved" warnings for discarded speculations
+        self.task.add_done_callback(lambda t: t.cancelled() or t.exception())
+        SPECULATIVE_RETRIEVALS.labels(outcome="started").inc()
+
+    async def _run(self) -> str:
+        context = await retrieve_documents.ainvoke({"query": self.query, "top_k": self.top_k})
+        self.finished_at = time.perf_counter()
+        return context
+
+    async def resolve(self, tool_args: Dict[str, Any]) -> Optional[str]:
+        """Return the speculative context if the router asked for a similar query with as
+        many documents (the arguments of its retrieval tool call), else None."""
+        router_done_at = time.perf_counter()
+        if (
+            tool_args.get("top_k", DEFAULT_TOP_K) != self.top_k
+            or query_similarity(self.query, tool_args.get("query", "")) < settings.SPECULATION_SIMILARITY_THRESHOLD
+        ):
+            self.task.cancel()
+            SPECULATIVE_RETRIEVALS.labels(outcome="misses").inc()
+            return None
+
+        try:
+            context = await self.task
+        except Exception as e:
+            print(f"Speculative retrieval failed, falling back to regular retrieval: {e}")
+            SPECULATIVE_RETRIEVALS.labels(outcome="errors").inc()
+            return None
+
+        # A serial retrieval would have taken the full duration after the router call;
+        # with speculation we only waited for whatever was left of it.
+        duration = self.finished_at - self.started_at
+        remaining_wait = max(0.0, self.finished_at - router_done_at)
+        SPECULATIVE_RETRIEVALS.labels(outcome="hits").inc()
+        SPECULATION_SECONDS_SAVED.inc(duration - remaining_wait)
+        return context
+
+    def discard(self) -> None:
+        self.task.cancel()
+        SPECULATIVE_RETRIEVALS.labels(outcome="discarded").inc()
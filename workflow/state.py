@@ -1,8 +1,16 @@
+from typing import Optional
+
 from langgraph.graph import MessagesState
+from langmem.short_term import RunningSummary
 
 class WorkflowState(MessagesState):
     """Represents the state of the workflow."""
     user_id: str
     context: str
     memories: list[str]
-    retrieval_loop_count: int = 0
\ No newline at end of file
+    running_summary: Optional[RunningSummary]
+    speculative_context: Optional[str]
+    # Tokens of the thread's messages not folded into the summary, from the thread's running
+    # totals (see summarization_node); not set for questions outside a thread
+    history_token_count: Optional[int]
+    retrieval_loop_count: int = 0
@@ -1,9 +1,107 @@
+import threading
+import unicodedata
+from contextvars import ContextVar
+from typing import Dict, Iterable, List, Optional, Tuple
+
 from langchain_core.tools import tool
-from core.vectorstore import pc_store
+from core.vectorstore import get_vector_store
+from core.singleflight import SingleFlight
+from core.metrics import VECTOR_STORE_DURATION, timed
 from utils.helper import format_docs
 
+# Identical retrievals in flight at the same time (e.g. many users asking about the
+# same announcement) share a single embedding + vector store query
+retrieval_flights = SingleFlight("retrieval")
+
+# Documents per retrieval when the router doesn't ask for a number
+DEFAULT_TOP_K = 5
+
+
+def normalize_query(query: str) -> str:
+    """Case- and whitespace-insensitive form of a query, used as the coalescing key."""
+    return " ".join(unicodedata.normalize("NFC", query).casefold().split())
+
+
+class SharedRetrievals:
+    """Retrievals shared by the questions of a batch (see workflow/batch.py).
+
+    While set as `shared_retrievals`, a query retrieved once is answered from memory for
+    every other question that asks for it, not only while it is in flight. Queries are
+    searched by vector: `embed` computes the embeddings of known queries (the questions
+    themselves, which speculative retrieval searches for) in one request, and other
+    queries are embedded once each.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._vectors: Dict[str, List[float]] = {}
+        self._results: Dict[Tuple[str, int], str] = {}
+        self.retrievals = 0
+        self.searches = 0
+        self.embedding_requests = 0
+        self.queries_embedded = 0
+
+    async def embed(self, queries: Iterable[str]) -> None:
+        texts = {}
+        for query in queries:
+            key = normalize_query(query)
+            if key not in self._vectors:
+                texts.setdefault(key, query)
+        if not texts:
+            return
+        vectors = await get_vector_store().embeddings.aembed_documents(list(texts.values()))
+        with self._lock:
+            self._vectors.update(zip(texts, vectors))
+            self.embedding_requests += 1
+            self.queries_embedded += len(texts)
+
+    def _vector(self, query: str) -> List[float]:
+        key = normalize_query(query)
+        vector = self._vectors.get(key)
+        if vector is None:
+            vector = get_vector_store().embeddings.embed_query(query)
+            with self._lock:
+                self._vectors[key] = vector
+                self.embedding_requests += 1
+                self.queries_embedded += 1
+        return vector
+
+    def retrieve(self, query: str, top_k: int) -> str:
+        key = (normalize_query(query), top_k)
+        with self._lock:
+            self.retrievals += 1
+            if key in self._results:
+                return self._results[key]
+
+        def search() -> str:
+            with self._lock:
+                self.searches += 1
+            vector = self._vector(query)
+            with timed(VECTOR_STORE_DURATION, operation="search"):
+                results = get_vector_store().similarity_search_by_vector(vector, k=top_k)
+            return format_docs(results)
+
+        result = retrieval_flights.do(key, search)
+        with self._lock:
+            self._results[key] = result
+        return result
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "retrievals": self.retrievals,
+                "searches": self.searches,
+                "embedding_requests": self.embedding_requests,
+                "queries_embedded": self.queries_embedded,
+            }
+
+
+# Set for the questions of a batch; None for chat turns
+shared_retrievals: ContextVar[Optional[SharedRetrievals]] = ContextVar("shared_retrievals", default=None)
+
+
 @tool
-def retrieve_documents(query: str, top_k: int = 5) -> str:
+def retrieve_documents(query: str, top_k: int = DEFAULT_TOP_K) -> str:
     """Retrieve documents from the vector store based on a Spanish query.
 
     Args:
@@ -13,9 +111,16 @@ def retrieve_documents(query: str, top_k: int = 5) -> str:
     Returns:
         str: The retrieved documents formatted as a merged string.
     """
-    results = pc_store.similarity_search(query, k=top_k)
-    context = format_docs(results)
-    return context
+    shared = shared_retrievals.get()
+    if shared is not None:
+        return shared.retrieve(query, top_k)
+
+    def search() -> str:
+        with timed(VECTOR_STORE_DURATION, operation="search"):
+            results = get_vector_store().similarity_search(query, k=top_k)
+        return format_docs(results)
+
+    return retrieval_flights.do((normalize_query(query), top_k), search)
 
 tools = [retrieve_documents]
-tools_by_name = {tool.name: tool for tool in tools}
\ No newline at end of file
+tools_by_name = {tool.name: tool for tool in tools}